@@ -1,42 +1,89 @@
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from config import Config
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 
+
+class MigrateCommands(click.Group):
+    # Flask-Migrate imports all of Alembic; only `flask db ...` needs it, so it
+    # is set up the first time that command group is resolved.
+
+    def __init__(self, app):
+        super().__init__("db", help="Perform database migrations.")
+        self.app = app
+
+    def _group(self):
+        if "migrate" not in self.app.extensions:
+            from flask_migrate import Migrate
+            Migrate(self.app, db)
+        return self.app.cli.commands["db"]
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        return self._group().make_context(info_name, args, parent=parent, **extra)
+
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    from models import Category, User
+    import async_db
+    import cache
+    import instrumentation
+    import pooling
+    import replicas
+    from apps.products.catalog import cached_categories
 
     @app.context_processor
     def inject_categories():
         try:
-            categories = Category.query.all()
+            categories = cached_categories()
         except Exception:
             categories = []
         return dict(categories=categories)
 
     db.init_app(app)
+    pooling.init_app(app, db)
+    replicas.init_app(app, db)
+    cache.init_app(app)
+    instrumentation.init_app(app)
+    async_db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
-    Migrate(app, db)
+    app.cli.add_command(MigrateCommands(app))
 
     from apps.auth.auth import auth
     from apps.products.products import product
     app.register_blueprint(auth)
     app.register_blueprint(product)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    from apps.products import (
+        analytics, async_views, catalog_io, fragments, http_cache, images, related, repository, search, snapshot, uploads,
+    )
+    analytics.init_app(app)
+    async_views.init_app(app)
+    catalog_io.init_app(app)
+    fragments.init_app(app)
+    http_cache.init_app(app)
+    images.init_app(app)
+    related.init_app(app)
+    repository.init_app(app)
+    search.init_app(app)
+    snapshot.init_app(app)
+    uploads.init_app(app)
+
+    from apps.auth import passwords, principal
+    passwords.init_app(app)
+    principal.init_app(app)
+    login_manager.user_loader(principal.load_principal)
 
-    with app.app_context():
-        db.create_all()
+    if app.config.get("DB_CREATE_ALL"):
+        with app.app_context():
+            db.create_all()
 
     return app
 
@@ -2,8 +2,7 @@ from flask import Blueprint, render_template, request, url_for, redirect, flash
 from models import User
 from app import db
 from flask_login import login_required, current_user, login_user, logout_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from forms import LoginForm, RegistrationForm, UpdateAccount
+from apps.auth import passwords
 
 
 
@@ -13,11 +12,17 @@ auth = Blueprint("auth", __name__, template_folder="../../templates")
 @auth.route("/")
 @auth.route('/login', methods=["GET", "POST"])
 def login():
+    from forms import LoginForm
     form = LoginForm()
     if form.validate_on_submit():
+        retry_after = passwords.login_retry_after(request.remote_addr, form.email.data)
+        if retry_after:
+            flash(f'Too many login attempts. Try again in {retry_after} seconds.')
+            return render_template("login.html", form=form), 429, {"Retry-After": str(retry_after)}
         user = User.query.filter_by(email=form.email.data).first()
         
-        if user and check_password_hash(user.password, form.password.data):
+        if user and passwords.verify_password(user.password, form.password.data):
+            passwords.upgrade_hash(user, form.password.data)
             login_user(user)
             flash('Logged in successfully!')
             return redirect(url_for('product.dashboard'))
@@ -30,14 +35,19 @@ def login():
 
 @auth.route('/register', methods=['GET', 'POST'])
 def register():
+    from forms import RegistrationForm
     form = RegistrationForm()
     if request.method == 'POST':
         if form.validate_on_submit():
+            retry_after = passwords.register_retry_after(request.remote_addr)
+            if retry_after:
+                flash(f'Too many attempts. Try again in {retry_after} seconds.')
+                return render_template('register.html', form=form), 429, {"Retry-After": str(retry_after)}
             if User.query.filter_by(email=form.email.data).first():
                 flash('User already exists')
                 return redirect(url_for('auth.register'))
             
-            new_user = User(email=form.email.data, username=form.username.data, password=generate_password_hash(form.password.data))
+            new_user = User(email=form.email.data, username=form.username.data, password=passwords.hash_password(form.password.data))
             db.session.add(new_user)
             db.session.commit()       
             flash('Registration successful!')
@@ -55,24 +65,26 @@ def logout():
 @auth.route("/user-account", methods=["GET", "POST"])
 @login_required
 def update_account():
-    form = UpdateAccount(obj=current_user)
+    from forms import UpdateAccount
+    user = current_user.user
+    form = UpdateAccount(obj=user)
     if form.validate_on_submit():
-        current_user.username = form.username.data
-        current_user.email = form.email.data
+        user.username = form.username.data
+        user.email = form.email.data
 
         if form.current_password.data and form.new_password.data and form.confirm_password.data:
-            if not check_password_hash(current_user.password, form.current_password.data):
+            if not passwords.verify_password(user.password, form.current_password.data):
                 flash("Current password is incorrect.")
-                return render_template("user_account.html", form=form, user=current_user)
+                return render_template("user_account.html", form=form, user=user)
 
             if form.new_password.data != form.confirm_password.data:
                 flash("New passwords do not match.")
-                return render_template("user_account.html", form=form, user=current_user)
+                return render_template("user_account.html", form=form, user=user)
 
-            current_user.password = generate_password_hash(form.new_password.data)
+            user.password = passwords.hash_password(form.new_password.data)
 
         db.session.commit()
         flash("Account updated successfully!")
         return redirect(url_for("auth.update_account"))
 
-    return render_template("user_account.html", form=form, user=current_user)
+    return render_template("user_account.html", form=form, user=user)
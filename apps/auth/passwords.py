@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from app import db
+from apps.auth.ratelimit import TokenBucket
+
+
+class HasherBusy(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    # scrypt and PBKDF2 release the GIL, so a small pool bounds how many cores
+    # hashing can take at once; callers beyond the queue limit are turned away
+    # instead of piling up behind it.
+
+    def __init__(self, method, workers, queue, timeout):
+        self.method = method
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(queue)
+        self._prefix = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many password operations in progress")
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The job keeps its slot until it finishes, so the queue limit still holds.
+            raise HasherBusy("Password operation timed out")
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        # Werkzeug stores "method:params$salt$hash"; hashing once tells us the
+        # fully expanded parameters the configured method currently means.
+        if self._prefix is None:
+            self._prefix = self.hash("probe").split("$", 1)[0]
+        return stored.split("$", 1)[0] != self._prefix
+
+
+def get_hasher():
+    return current_app.extensions["passwords"]
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+
+def verify_password(stored, password):
+    return get_hasher().verify(stored, password)
+
+
+def needs_rehash(stored):
+    return get_hasher().needs_rehash(stored)
+
+
+def upgrade_hash(user, password):
+    # Runs right after a successful check, the only time the plain password is known.
+    try:
+        if not needs_rehash(user.password):
+            return
+        user.password = hash_password(password)
+    except HasherBusy:
+        return
+    db.session.commit()
+
+
+def _busy(error):
+    return "The server is busy. Please try again in a moment.", 503, {"Retry-After": "1"}
+
+
+def login_retry_after(ip, email):
+    limits = current_app.extensions["login_limits"]
+    return max(limits["ip"].take(ip), limits["email"].take((email or "").lower()))
+
+
+def register_retry_after(ip):
+    return current_app.extensions["login_limits"]["ip"].take(ip)
+
+
+def init_app(app):
+    app.extensions["passwords"] = PasswordHasher(
+        method=app.config.get("PASSWORD_HASH_METHOD", "scrypt"),
+        workers=app.config.get("PASSWORD_HASH_WORKERS", 2),
+        queue=app.config.get("PASSWORD_HASH_QUEUE", 16),
+        timeout=app.config.get("PASSWORD_HASH_TIMEOUT", 10),
+    )
+    app.register_error_handler(HasherBusy, _busy)
+    app.extensions["login_limits"] = {
+        "ip": TokenBucket(app.config.get("LOGIN_IP_BURST", 20), app.config.get("LOGIN_IP_PER_MINUTE", 10)),
+        "email": TokenBucket(app.config.get("LOGIN_EMAIL_BURST", 5), app.config.get("LOGIN_EMAIL_PER_MINUTE", 3)),
+    }
@@ -0,0 +1,101 @@
+from itertools import chain
+from flask import current_app, session
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from cache import LRUStore, get_cache
+from models import User
+
+
+# Earlier releases cached the principal in the session cookie; dropped on sight.
+SESSION_KEY = "principal"
+# Changing any of these must reach every worker before the next request.
+STAMPED_FIELDS = ("username", "email", "password", "is_admin")
+
+
+class Principal(UserMixin):
+    # What current_user is for a logged-in request: enough for templates and
+    # permission checks without a SELECT. The User row loads on first use of
+    # anything else, or explicitly through .user.
+
+    def __init__(self, id, username, email, is_admin, user=None):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = is_admin
+        self._user = user
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, bool(user.is_admin), user=user)
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+def _version_key(user_id):
+    return f"user:{user_id}"
+
+
+def load_principal(user_id):
+    # Cached in this process, validated against the shared "user:<id>"
+    # version. With per-process versions (CACHE_BACKEND=local) a bump in
+    # another worker, or before a restart, would never be seen, so the cache
+    # is off there and every request loads the user.
+    user_id = int(user_id)
+    session.pop(SESSION_KEY, None)
+    versions = get_cache().versions
+    stamp = versions.get(_version_key(user_id)) if versions.shared else None
+    principals = current_app.extensions["principals"]
+    if stamp is not None:
+        cached = principals.get(user_id)
+        if cached is not None and cached[0] == stamp:
+            return Principal(*cached[1:])
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    if stamp is not None:
+        principals.set(user_id, (stamp, principal.id, principal.username, principal.email, principal.is_admin))
+    return principal
+
+
+def invalidate_principal(user_id):
+    get_cache().versions.bump(_version_key(user_id))
+
+
+@event.listens_for(Session, "before_flush")
+def _track_user_writes(session, flush_context, instances):
+    changed = session.info.setdefault("users_changed", set())
+    for obj in chain(session.dirty, session.deleted):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted or any(state.attrs[field].history.has_changes() for field in STAMPED_FIELDS):
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop("users_changed", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("users_changed", None)
+
+
+def init_app(app):
+    app.extensions["principals"] = LRUStore(
+        app.config.get("PRINCIPAL_CACHE_SIZE", 10000), ttl=app.config.get("PRINCIPAL_CACHE_TTL", 300),
+    )
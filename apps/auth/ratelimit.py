@@ -0,0 +1,31 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    # One bucket per key, refilled continuously. Per process: each worker
+    # enforces its own share, which is enough to blunt a burst. Past max_keys
+    # the least recently used key is dropped; it has had the longest to refill.
+
+    def __init__(self, capacity, per_minute, max_keys=50000):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        # Returns 0 when allowed, otherwise the seconds until a token is free.
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - stamp) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            if allowed:
+                return 0
+            return math.ceil((1 - tokens) / self.rate) if self.rate else 60
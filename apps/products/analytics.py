@@ -0,0 +1,296 @@
+import time
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import Category, Order, OrderItem, Product, SalesRollup, SalesRollupRebuild
+
+
+GRAINS = ("hour", "day")
+DIMENSIONS = ("product", "category", "brand")
+TOTAL = "total"
+DEFAULT_RANGE_DAYS = 30
+MAX_HOURLY_DAYS = 31
+MAX_TOP = 100
+# Postgres advisory lock: checkouts hold it shared from before their order id
+# is drawn until commit; the backfill takes it exclusively to fence them off.
+ROLLUP_LOCK = 2401
+
+
+class ReportError(ValueError):
+    pass
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _insert_for_dialect():
+    name = _dialect()
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(f"Sales rollups are not supported on {name}")
+
+
+def bucket_start(moment, grain):
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if grain == "day" else moment
+
+
+def add_order(rollup, checkout_time, total_price, lines):
+    # Lines need product_id, product_name, category_id, category_name, brand,
+    # price and quantity. A product, category or brand counts an order once
+    # however many of its lines the order has.
+    touched = set()
+    for grain in GRAINS:
+        bucket = bucket_start(checkout_time, grain)
+        total = rollup.setdefault((grain, TOTAL, bucket, ""), ["", 0, 0, 0])
+        total[1] += total_price
+        total[3] += 1
+        for line in lines:
+            total[2] += line.quantity
+            if line.product_id is None:
+                continue
+            for dimension, key, label in (
+                ("product", str(line.product_id), line.product_name),
+                ("category", str(line.category_id), line.category_name or ""),
+                ("brand", line.brand, line.brand),
+            ):
+                entry = rollup.setdefault((grain, dimension, bucket, key), [label, 0, 0, 0])
+                entry[1] += line.price * line.quantity
+                entry[2] += line.quantity
+                touched.add((grain, dimension, bucket, key))
+    for key in touched:
+        rollup[key][3] += 1
+    return rollup
+
+
+def write(rollup, shard=0, table=SalesRollup.__table__):
+    # One cached upsert run as executemany, with rows in key order so
+    # concurrent checkouts touching the same buckets lock them in sequence.
+    if not rollup:
+        return
+    upsert = _insert_for_dialect()
+    rows = [
+        {
+            "grain": grain, "dimension": dimension, "bucket": bucket, "key": key, "shard": shard,
+            "label": label, "revenue": revenue, "units": units, "orders": orders,
+        }
+        for (grain, dimension, bucket, key), (label, revenue, units, orders) in sorted(rollup.items())
+    ]
+    statement = upsert(table)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.grain, table.c.dimension, table.c.bucket, table.c.key, table.c.shard],
+        set_={
+            "label": statement.excluded.label,
+            "revenue": table.c.revenue + statement.excluded.revenue,
+            "units": table.c.units + statement.excluded.units,
+            "orders": table.c.orders + statement.excluded.orders,
+        },
+    ), rows)
+
+
+def lock_rollups(exclusive=False):
+    # SQLite has a single writer, which already orders checkouts and backfills.
+    if _dialect() == "postgresql":
+        function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        db.session.execute(text(f"SELECT {function}(:key)"), {"key": ROLLUP_LOCK})
+
+
+def record_order(order, lines):
+    # Runs inside the checkout transaction, after lock_rollups(), so the
+    # rollups commit or roll back together with the order. Every order hits
+    # its buckets' total row, so orders add to one of SALES_ROLLUP_SHARDS
+    # copies of each row, picked by order id, and concurrent checkouts rarely
+    # wait on the same row lock.
+    shard = order.id % current_app.config.get("SALES_ROLLUP_SHARDS", 8)
+    write(add_order({}, order.checkout_time, order.total_price, lines), shard=shard)
+
+
+def _lines_statement(order_ids):
+    return (
+        select(
+            OrderItem.order_id, OrderItem.product_id, OrderItem.product_name, OrderItem.price, OrderItem.quantity,
+            Product.category_id, Category.name.label("category_name"), Product.brand,
+        )
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(OrderItem.order_id.in_(order_ids))
+    )
+
+
+def _order_batches(statement, batch_size):
+    # (orders, rollup of those orders) per batch, in id order.
+    last_id = 0
+    while True:
+        batch = db.session.execute(statement.where(Order.id > last_id).order_by(Order.id).limit(batch_size)).all()
+        if not batch:
+            return
+        lines = {}
+        for line in db.session.execute(_lines_statement([order.id for order in batch])):
+            lines.setdefault(line.order_id, []).append(line)
+        rollup = {}
+        for order in batch:
+            add_order(rollup, order.checkout_time, order.total_price, lines.get(order.id, ()))
+        yield batch, rollup
+        last_id = batch[-1].id
+
+
+def _swap(statement, upper, since, batch_size):
+    # One transaction. Taking the lock (Postgres) or deleting first (SQLite's
+    # single writer) keeps checkouts out until the commit, so the orders
+    # placed since `upper` can be added to the rebuilt rows before they
+    # replace the live ones their checkouts wrote to.
+    rebuilt = SalesRollupRebuild.__table__
+    lock_rollups(exclusive=True)
+    live = delete(SalesRollup)
+    if since is not None:
+        live = live.where(SalesRollup.bucket >= since)
+    db.session.execute(live)
+    for _, rollup in _order_batches(statement.where(Order.id > upper), batch_size):
+        write(rollup, table=rebuilt)
+    columns = [column.name for column in rebuilt.c]
+    db.session.execute(insert(SalesRollup).from_select(columns, select(*rebuilt.c)))
+    db.session.execute(delete(rebuilt))
+    db.session.commit()
+
+
+def backfill(since=None, batch_size=1000, echo=None):
+    # Rebuilds into sales_rollup_rebuild, a transaction per batch, while
+    # reports keep reading the current rows; the rebuilt range then replaces
+    # them in one transaction. Run one backfill at a time. Products deleted
+    # since only show up in the store totals, and history is filed under each
+    # product's current category and brand.
+    db.session.execute(delete(SalesRollupRebuild))
+    db.session.commit()
+    # Once no checkout is in flight every order up to `upper` is committed,
+    # and later ones draw larger ids, so the batches miss none of them.
+    lock_rollups(exclusive=True)
+    upper = db.session.scalar(select(func.max(Order.id))) or 0
+    db.session.commit()
+
+    statement = select(Order.id, Order.checkout_time, Order.total_price)
+    if since is not None:
+        statement = statement.where(Order.checkout_time >= since)
+    processed = 0
+    for batch, rollup in _order_batches(statement.where(Order.id <= upper), batch_size):
+        write(rollup, table=SalesRollupRebuild.__table__)
+        db.session.commit()
+        processed += len(batch)
+        if echo:
+            echo(f"Rolled up orders through id {batch[-1].id} ({processed} orders)")
+    _swap(statement, upper, since, batch_size)
+    return processed
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        raise ReportError(f"{name} must be YYYY-MM-DD")
+
+
+def _parse_int(value, name, default, upper):
+    try:
+        number = int(value) if value else default
+    except ValueError:
+        raise ReportError(f"{name} must be an integer")
+    return max(1, min(number, upper))
+
+
+def parse_report_args(args):
+    date_to = _parse_date(args.get("date_to"), "date_to") or date.today()
+    date_from = _parse_date(args.get("date_from"), "date_from") or date_to - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if date_from > date_to:
+        raise ReportError("date_from is after date_to")
+    dimension = args.get("dimension", "category")
+    if dimension not in DIMENSIONS:
+        raise ReportError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+    grain = args.get("grain", "day")
+    if grain not in GRAINS:
+        raise ReportError(f"grain must be one of {', '.join(GRAINS)}")
+    if grain == "hour" and (date_to - date_from).days >= MAX_HOURLY_DAYS:
+        raise ReportError(f"Hourly series cover at most {MAX_HOURLY_DAYS} days")
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "dimension": dimension,
+        "grain": grain,
+        "limit": _parse_int(args.get("limit"), "limit", 10, MAX_TOP),
+    }
+
+
+def _measures():
+    return (
+        func.coalesce(func.sum(SalesRollup.revenue), 0),
+        func.coalesce(func.sum(SalesRollup.units), 0),
+        func.coalesce(func.sum(SalesRollup.orders), 0),
+    )
+
+
+def report(date_from, date_to, dimension="category", grain="day", limit=10):
+    # Reads only rollup rows, each query a range over the primary key, so the
+    # cost follows the number of buckets in the range, not the order history.
+    started = time.perf_counter()
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+
+    def in_range(grain, dimension):
+        return (
+            SalesRollup.grain == grain, SalesRollup.dimension == dimension,
+            SalesRollup.bucket >= start, SalesRollup.bucket < end,
+        )
+
+    revenue, units, orders = db.session.execute(select(*_measures()).where(*in_range("day", TOTAL))).one()
+    series = db.session.execute(
+        select(SalesRollup.bucket, *_measures())
+        .where(*in_range(grain, TOTAL))
+        .group_by(SalesRollup.bucket)
+        .order_by(SalesRollup.bucket)
+    ).all()
+    measures = _measures()
+    top = db.session.execute(
+        select(SalesRollup.key, func.max(SalesRollup.label), *measures)
+        .where(*in_range("day", dimension))
+        .group_by(SalesRollup.key)
+        .order_by(measures[0].desc(), SalesRollup.key)
+        .limit(limit)
+    ).all()
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "totals": {"revenue": revenue, "units": units, "orders": orders},
+        "series": [
+            {"bucket": row[0].isoformat(), "revenue": row[1], "units": row[2], "orders": row[3]}
+            for row in series
+        ],
+        "grain": grain,
+        "dimension": dimension,
+        "top": [
+            {"key": row[0], "label": row[1], "revenue": row[2], "units": row[3], "orders": row[4]}
+            for row in top
+        ],
+        "query_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+analytics_cli = AppGroup("analytics", help="Maintain the sales rollup tables.")
+
+
+@analytics_cli.command("backfill")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]),
+              help="Rebuild only buckets from this day on; by default everything is rebuilt.")
+@click.option("--batch-size", default=1000, show_default=True, help="Orders rolled up per transaction.")
+def backfill_command(since, batch_size):
+    started = time.perf_counter()
+    processed = backfill(since, batch_size, echo=click.echo)
+    click.echo(f"Done: {processed} orders rolled up in {time.perf_counter() - started:.1f}s")
+
+
+def init_app(app):
+    app.cli.add_command(analytics_cli)
@@ -0,0 +1,27 @@
+from flask import abort, render_template
+from flask_login import login_required
+from apps.products.http_cache import conditional, product_state
+from apps.products.related import get_related
+from apps.products.repository import get_repository
+from replicas import read_only
+
+
+@login_required
+@read_only
+@conditional(product_state)
+async def display_product(product_id):
+    product = await get_repository().get_async(product_id)
+    if product is None:
+        abort(404)
+    return render_template("display_product.html", product=product, related=get_related().for_product(product_id))
+
+
+ASYNC_VIEWS = {
+    "product.display_product": display_product,
+}
+
+
+def init_app(app):
+    if "async_db" not in app.extensions:
+        return
+    app.view_functions.update(ASYNC_VIEWS)
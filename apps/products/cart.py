@@ -0,0 +1,109 @@
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import Cart, Product
+
+
+OPERATIONS = ("add", "update", "remove")
+
+
+class CartError(ValueError):
+    pass
+
+
+def _insert_for_dialect():
+    name = db.session.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    raise CartError(f"Cart upserts are not supported on {name}")
+
+
+def collapse(operations):
+    # Fold the batch into one final effect per product so each product appears in
+    # at most one statement: ("remove", 0), ("set", q) or ("add", q).
+    effects = {}
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise CartError("Each operation must be an object")
+        kind = operation.get("op")
+        product_id = operation.get("product_id")
+        quantity = operation.get("quantity", 1)
+        if kind not in OPERATIONS:
+            raise CartError(f"Unknown operation {kind!r}")
+        # JSON true/false arrive as bool, which is an int subclass.
+        if any(not isinstance(value, int) or isinstance(value, bool) for value in (product_id, quantity)):
+            raise CartError("product_id and quantity must be integers")
+        if kind != "remove" and quantity < 1:
+            raise CartError("quantity must be at least 1")
+        previous, amount = effects.get(product_id, (None, 0))
+        if kind == "remove":
+            effects[product_id] = ("remove", 0)
+        elif kind == "update":
+            effects[product_id] = ("set", quantity)
+        elif previous in ("set", "remove"):
+            effects[product_id] = ("set", (amount if previous == "set" else 0) + quantity)
+        else:
+            effects[product_id] = ("add", amount + quantity)
+    return effects
+
+
+def _upsert(user_id, quantities, increment):
+    insert = _insert_for_dialect()
+    statement = insert(Cart).values([
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity}
+        for product_id, quantity in quantities.items()
+    ])
+    new_quantity = Cart.quantity + statement.excluded.quantity if increment else statement.excluded.quantity
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[Cart.user_id, Cart.product_id],
+        set_={"quantity": new_quantity},
+    ))
+
+
+def apply_operations(user_id, operations):
+    effects = collapse(operations)
+    removed = [pid for pid, (kind, _) in effects.items() if kind == "remove"]
+    sets = {pid: q for pid, (kind, q) in effects.items() if kind == "set"}
+    adds = {pid: q for pid, (kind, q) in effects.items() if kind == "add"}
+    touched = list(sets) + list(adds)
+    if touched:
+        found = db.session.execute(select(Product.id).where(Product.id.in_(touched))).scalars().all()
+        missing = set(touched) - set(found)
+        if missing:
+            raise CartError(f"Unknown products: {sorted(missing)}")
+    try:
+        if removed:
+            db.session.execute(delete(Cart).where(Cart.user_id == user_id, Cart.product_id.in_(removed)))
+        if sets:
+            _upsert(user_id, sets, increment=False)
+        if adds:
+            _upsert(user_id, adds, increment=True)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def add_item(user_id, product_id, quantity):
+    # Returns False when the product was already in the cart; the unique
+    # (user_id, product_id) constraint does the check instead of a SELECT.
+    insert = _insert_for_dialect()
+    statement = insert(Cart).values(user_id=user_id, product_id=product_id, quantity=quantity)
+    result = db.session.execute(statement.on_conflict_do_nothing(index_elements=[Cart.user_id, Cart.product_id]))
+    db.session.commit()
+    return result.rowcount > 0
+
+
+def totals(user_id):
+    row = db.session.execute(
+        select(
+            func.count(Cart.id),
+            func.coalesce(func.sum(Cart.quantity), 0),
+            func.coalesce(func.sum(Cart.quantity * Product.price), 0),
+        )
+        .join(Product, Product.id == Cart.product_id)
+        .where(Cart.user_id == user_id)
+    ).one()
+    return {"items": row[0], "quantity": row[1], "total": row[2]}
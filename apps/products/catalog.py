@@ -0,0 +1,65 @@
+from collections import namedtuple
+from datetime import datetime
+from itertools import chain
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from cache import get_cache
+from models import Category, Product, ProductImage
+from apps.products.signals import categories_changed, http_purge
+
+
+CategoryRow = namedtuple("CategoryRow", "id name")
+
+
+def _load_categories():
+    rows = db.session.query(Category.id, Category.name).order_by(Category.id)
+    return tuple(CategoryRow(*row) for row in rows)
+
+
+def category_cache():
+    return get_cache().value("categories", current_app.config["CATEGORY_CACHE_TTL"])
+
+
+def cached_categories():
+    return category_cache().get(_load_categories)
+
+
+def invalidate_categories():
+    category_cache().invalidate()
+
+
+# Any committed insert/update/delete of a Category (add_category, admin deletes,
+# shell edits) bumps the shared version so every worker reloads the list.
+@event.listens_for(Session, "before_flush")
+def _track_category_writes(session, flush_context, instances):
+    if any(isinstance(obj, Category) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["categories_changed"] = True
+
+
+# Image uploads, status changes and deletes don't touch the product row, so
+# bump Product.updated_at here to keep it the product's last change.
+@event.listens_for(Session, "before_flush")
+def _touch_products_with_changed_images(session, flush_context, instances):
+    now = datetime.now()
+    with session.no_autoflush:
+        for obj in list(chain(session.new, session.dirty, session.deleted)):
+            if isinstance(obj, ProductImage):
+                product = obj.product
+                if product is not None and product not in session.deleted:
+                    product.updated_at = now
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("categories_changed", False):
+        invalidate_categories()
+        categories_changed.send(current_app._get_current_object())
+        # The nav menu lists categories, so every cached page is stale.
+        http_purge.send(current_app._get_current_object(), paths=["/*"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("categories_changed", None)
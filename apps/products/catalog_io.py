@@ -0,0 +1,441 @@
+import csv
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+from app import db
+from cache import get_cache
+from models import CatalogImportCheckpoint, Category, Product, ProductImage, User
+from apps.products.catalog import invalidate_categories
+from apps.products.http_cache import CATALOG_VERSION
+from apps.products.images import build_derivatives, public_id_from_url
+from apps.products.signals import http_purge
+from apps.products import related, search, snapshot
+
+
+COLUMNS = ("id", "name", "price", "brand", "category", "description", "owner_email", "images")
+IMAGE_SEPARATOR = "|"
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    if path.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if path.endswith(".csv"):
+        return "csv"
+    raise click.UsageError("Cannot tell the format from the file name; pass --format")
+
+
+def read_rows(handle, fmt):
+    # NDJSON lines are yielded undecoded, so parse_row can reject a bad one
+    # without ending the import.
+    if fmt == "csv":
+        yield from csv.DictReader(handle)
+        return
+    for line in handle:
+        if line.strip():
+            yield line
+
+
+def decode_row(row):
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as e:
+            raise RowError(f"not valid JSON: {e}")
+    if not isinstance(row, dict):
+        raise RowError("not a JSON object")
+    return row
+
+
+def text(value):
+    return "" if value is None else str(value).strip()
+
+
+def image_sources(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(IMAGE_SEPARATOR)
+    if not isinstance(value, list) or not all(isinstance(source, str) for source in value):
+        raise RowError("images must be a list of URLs or paths")
+    return [source.strip() for source in value if source.strip()]
+
+
+def parse_price(value):
+    # int() would truncate a JSON 12.5 and accept true as 1.
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        price = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        raise RowError(f"price {value!r} is not a whole number")
+    if not price.is_finite() or price != price.to_integral_value():
+        raise RowError(f"price {value!r} is not a whole number")
+    return int(price)
+
+
+def parse_row(row):
+    row = decode_row(row)
+    name = text(row.get("name"))
+    category = text(row.get("category"))
+    if not name:
+        raise RowError("name is required")
+    if not category:
+        raise RowError("category is required")
+    return {
+        "name": name[:255],
+        "price": parse_price(row.get("price")),
+        "brand": text(row.get("brand"))[:255],
+        "category": category[:255],
+        "description": "" if row.get("description") is None else str(row["description"]),
+        "owner_email": text(row.get("owner_email")).lower() or None,
+        "images": image_sources(row.get("images")),
+    }
+
+
+class Checkpoint:
+    # A catalog_import_checkpoint row saved in each batch's transaction, so
+    # --resume skips exactly the rows that are in the database. Removed once
+    # the import finishes.
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.rows = 0
+        self.products = 0
+        self.images = 0
+
+    def load(self):
+        if self.name is None:
+            return False
+        saved = db.session.get(CatalogImportCheckpoint, self.name)
+        if saved is None:
+            return False
+        if saved.source != self.source:
+            raise click.UsageError(f"Checkpoint {self.name!r} belongs to {saved.source}, not {self.source}")
+        self.rows, self.products, self.images = saved.rows, saved.products, saved.images
+        return True
+
+    def save(self):
+        # Left to the caller's commit.
+        if self.name is None:
+            return
+        db.session.merge(CatalogImportCheckpoint(
+            name=self.name, source=self.source, rows=self.rows, products=self.products, images=self.images,
+        ))
+
+    def clear(self):
+        if self.name is not None:
+            db.session.execute(delete(CatalogImportCheckpoint).where(CatalogImportCheckpoint.name == self.name))
+
+
+class ImageUploader:
+    # Fetches each source (URL or path under image_root) and pushes it through
+    # the storage backend's retrying upload, several at a time.
+
+    def __init__(self, pipeline, workers, image_root):
+        self.pipeline = pipeline
+        self.image_root = image_root
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog-upload")
+
+    def _read(self, source):
+        if source.startswith(("http://", "https://")):
+            with urllib.request.urlopen(source, timeout=30) as response:
+                return response.read()
+        with open(os.path.join(self.image_root, source), "rb") as handle:
+            return handle.read()
+
+    def _upload(self, source):
+        try:
+            url, public_id = self.pipeline.upload(self._read(source), os.path.basename(source))
+            return {"url": url, "public_id": public_id, "status": "ready", "error": None}
+        except Exception as e:
+            return {"url": "", "public_id": "", "status": "failed", "error": str(e)[:255]}
+
+    def upload_all(self, sources):
+        return list(self.executor.map(self._upload, sources))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def hosted_image(source):
+    if len(source) > 255:
+        return {"url": "", "public_id": "", "status": "failed", "error": "URL longer than 255 characters"}
+    return {"url": source, "public_id": public_id_from_url(source), "status": "ready", "error": None}
+
+
+class CatalogImporter:
+
+    def __init__(self, default_owner_id, uploader=None):
+        self.default_owner_id = default_owner_id
+        self.uploader = uploader
+        self.categories = {}
+        self.owners = {}
+        self.touched_categories = set()
+        self.created_categories = 0
+
+    def _resolve_categories(self, names):
+        missing = {name for name in names if name not in self.categories}
+        if not missing:
+            return
+        for category_id, name in db.session.execute(
+                select(Category.id, Category.name).where(Category.name.in_(missing))):
+            self.categories.setdefault(name, category_id)
+        new = sorted(missing - self.categories.keys())
+        if new:
+            ids = db.session.scalars(
+                insert(Category).returning(Category.id, sort_by_parameter_order=True),
+                [{"name": name} for name in new],
+            ).all()
+            self.categories.update(zip(new, ids))
+            self.created_categories += len(ids)
+
+    def _resolve_owners(self, emails):
+        missing = {email for email in emails if email and email not in self.owners}
+        if not missing:
+            return
+        found = dict(db.session.execute(select(func.lower(User.email), User.id).where(func.lower(User.email).in_(missing))).all())
+        for email in missing:
+            self.owners[email] = found.get(email)
+
+    def import_batch(self, rows):
+        # The caller commits, together with its checkpoint. Nothing is written
+        # until the images are uploaded, so no transaction waits on the network.
+        self.touched_categories = set()
+        self.created_categories = 0
+        self._resolve_owners({row["owner_email"] for row in rows})
+        accepted, rejected = [], []
+        for row in rows:
+            owner_id = self.owners.get(row["owner_email"]) if row["owner_email"] else None
+            owner_id = owner_id or self.default_owner_id
+            if owner_id is None:
+                rejected.append((row, f"unknown owner {row['owner_email']!r} and no --owner given"))
+                continue
+            accepted.append((row, owner_id))
+        if not accepted:
+            return 0, 0, rejected
+
+        sources = [source for row, _ in accepted for source in row["images"]]
+        if self.uploader and sources:
+            db.session.commit()
+            uploaded = iter(self.uploader.upload_all(sources))
+        else:
+            uploaded = map(hosted_image, sources)
+        self._resolve_categories({row["category"] for row, _ in accepted})
+        values, images = [], []
+        for row, owner_id in accepted:
+            category_id = self.categories[row["category"]]
+            self.touched_categories.add(category_id)
+            values.append({
+                "name": row["name"], "price": row["price"], "brand": row["brand"],
+                "description": row["description"], "category_id": category_id, "user_id": owner_id,
+            })
+            images.append(row["images"])
+        product_ids = db.session.scalars(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True), values,
+        ).all()
+        image_values = []
+        for product_id, row_images in zip(product_ids, images):
+            for _ in row_images:
+                image = next(uploaded)
+                image_values.append({
+                    **image, "product_id": product_id,
+                    "derivatives": build_derivatives(image["url"]) if image["status"] == "ready" else None,
+                })
+        if image_values:
+            db.session.execute(insert(ProductImage), image_values)
+        return len(product_ids), len(image_values), rejected
+
+
+def export_rows(batch_size=1000):
+    # Keyset batches: one product query and one image query per batch, so memory
+    # stays flat however large the catalog is.
+    categories = dict(db.session.execute(select(Category.id, Category.name)).all())
+    last_id = 0
+    while True:
+        products = db.session.execute(
+            select(Product.id, Product.name, Product.price, Product.brand, Product.category_id,
+                   Product.description, User.email)
+            .outerjoin(User, User.id == Product.user_id)
+            .where(Product.id > last_id)
+            .order_by(Product.id)
+            .limit(batch_size)
+        ).all()
+        if not products:
+            return
+        images = {}
+        for product_id, url in db.session.execute(
+                select(ProductImage.product_id, ProductImage.url)
+                .where(ProductImage.product_id.in_([p.id for p in products]), ProductImage.status == "ready")
+                .order_by(ProductImage.product_id, ProductImage.id)):
+            images.setdefault(product_id, []).append(url)
+        for product_id, name, price, brand, category_id, description, email in products:
+            yield {
+                "id": product_id, "name": name, "price": price, "brand": brand,
+                "category": categories.get(category_id), "description": description,
+                "owner_email": email, "images": images.get(product_id, []),
+            }
+        last_id = products[-1].id
+        db.session.expire_all()
+
+
+def _rate(count, started):
+    elapsed = time.perf_counter() - started
+    return count / elapsed if elapsed else 0.0
+
+
+def _announce_import(app, importer):
+    # After each committed batch. Core inserts skip the ORM events, so tell the
+    # web workers through the shared stores. The SQLite and Postgres search
+    # indexes follow the rows by themselves; in-memory ones rebuild once the
+    # search version moves.
+    versions = get_cache().versions
+    for key in (snapshot.VERSION_KEY, related.VERSION_KEY, search.VERSION_KEY, CATALOG_VERSION):
+        versions.bump(key)
+    if importer.created_categories:
+        invalidate_categories()
+        http_purge.send(app, paths=["/*"])
+    else:
+        http_purge.send(app, paths=["/shop", "/search"]
+                        + [f"/category/{c}" for c in sorted(importer.touched_categories)])
+
+
+catalog_cli = AppGroup("catalog", help="Bulk import and export the product catalog.")
+
+
+@catalog_cli.command("import")
+@click.argument("path")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]))
+@click.option("--owner", help="Email of the user who owns rows without a known owner_email.")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--upload", is_flag=True, help="Upload each image to storage instead of storing its URL.")
+@click.option("--image-root", default=".", show_default=True, help="Base directory for relative image paths.")
+@click.option("--workers", type=int, help="Concurrent uploads [default: IMAGE_UPLOAD_WORKERS].")
+@click.option("--checkpoint", help="Name of the checkpoint kept in the database [default: PATH].")
+@click.option("--resume", is_flag=True, help="Skip the rows recorded in the checkpoint.")
+@click.option("--restart", is_flag=True, help="Drop an unfinished import's checkpoint and start over.")
+def import_command(path, fmt, owner, batch_size, upload, image_root, workers, checkpoint, resume, restart):
+    app = current_app._get_current_object()
+    fmt = detect_format(path, fmt)
+    owner_id = None
+    if owner:
+        owner_id = db.session.scalar(select(User.id).where(func.lower(User.email) == owner.lower()))
+        if owner_id is None:
+            raise click.UsageError(f"No user with email {owner}")
+    source = "-" if path == "-" else os.path.abspath(path)
+    state = Checkpoint(checkpoint or (None if path == "-" else source), source)
+    if resume and restart:
+        raise click.UsageError("Pass --resume or --restart, not both")
+    if restart:
+        state.clear()
+        db.session.commit()
+    elif state.load():
+        if not resume:
+            raise click.UsageError(f"Checkpoint {state.name!r} is from an unfinished import: "
+                                   "pass --resume to continue it, or --restart to start over")
+        click.echo(f"Resuming after row {state.rows}", err=True)
+    elif resume:
+        raise click.UsageError("Nothing to resume: no checkpoint")
+
+    uploader = None
+    if upload:
+        uploader = ImageUploader(app.extensions["uploads"], workers or app.config.get("IMAGE_UPLOAD_WORKERS", 4),
+                                 image_root)
+    importer = CatalogImporter(owner_id, uploader)
+    rejected = 0
+    started = time.perf_counter()
+    imported = 0
+
+    def flush(batch, consumed):
+        nonlocal rejected, imported
+        products, images, failures = importer.import_batch(batch)
+        for row, reason in failures:
+            click.echo(f"Skipped {row.get('name')!r}: {reason}", err=True)
+        rejected += len(failures)
+        imported += products
+        state.rows = consumed
+        state.products += products
+        state.images += images
+        state.save()
+        db.session.commit()
+        if products or importer.created_categories:
+            _announce_import(app, importer)
+        click.echo(f"{state.rows} rows read, {state.products} products, {state.images} images "
+                   f"({_rate(imported, started):.0f} products/s)", err=True)
+
+    handle = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        batch = []
+        consumed = 0
+        for number, row in enumerate(read_rows(handle, fmt), 1):
+            if number <= state.rows:
+                continue
+            consumed = number
+            try:
+                batch.append(parse_row(row))
+            except RowError as e:
+                rejected += 1
+                click.echo(f"Row {number}: {e}", err=True)
+            if len(batch) >= batch_size:
+                flush(batch, consumed)
+                batch = []
+        if batch or consumed > state.rows:
+            flush(batch, consumed)
+        state.clear()
+        db.session.commit()
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+        if uploader:
+            uploader.shutdown()
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Imported {imported} products in {elapsed:.2f}s ({_rate(imported, started):.0f} rows/s); "
+               f"{rejected} rows rejected")
+
+
+@catalog_cli.command("export")
+@click.argument("path")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]))
+@click.option("--batch-size", default=1000, show_default=True)
+def export_command(path, fmt, batch_size):
+    fmt = detect_format(path, fmt) if path != "-" else (fmt or "ndjson")
+    handle = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    started = time.perf_counter()
+    count = 0
+    try:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(handle, fieldnames=COLUMNS)
+            writer.writeheader()
+        for values in export_rows(batch_size):
+            if writer:
+                writer.writerow({**values, "images": IMAGE_SEPARATOR.join(values["images"])})
+            else:
+                handle.write(json.dumps(values) + "\n")
+            count += 1
+            if count % (batch_size * 10) == 0:
+                click.echo(f"{count} products written ({_rate(count, started):.0f} rows/s)", err=True)
+    finally:
+        if handle is not sys.stdout:
+            handle.close()
+    click.echo(f"Exported {count} products in {time.perf_counter() - started:.2f}s "
+               f"({_rate(count, started):.0f} rows/s)", err=True)
+
+
+def init_app(app):
+    app.cli.add_command(catalog_cli)
@@ -0,0 +1,64 @@
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import delete, select, update
+from app import db
+from models import Cart, Checkout, OrderItem, Product, ProductImage
+from apps.products.signals import product_deleted
+from apps.products.uploads import get_cleanup
+
+
+Deletion = namedtuple("Deletion", "deleted missing forbidden")
+
+
+def _cascades_enforced():
+    # Postgres applies the ON DELETE rules itself; SQLite only with the pragma on.
+    connection = db.session.connection()
+    if connection.dialect.name != "sqlite":
+        return True
+    return connection.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+
+
+def _delete_dependents(product_ids):
+    carts = select(Cart.id).where(Cart.product_id.in_(product_ids))
+    db.session.execute(delete(Checkout).where(Checkout.cart_id.in_(carts)))
+    db.session.execute(delete(Cart).where(Cart.product_id.in_(product_ids)))
+    db.session.execute(delete(ProductImage).where(ProductImage.product_id.in_(product_ids)))
+    db.session.execute(update(OrderItem).where(OrderItem.product_id.in_(product_ids)).values(product_id=None))
+
+
+def delete_products(product_ids, user):
+    # One transaction for any number of products; remote assets are queued for
+    # batched cleanup once the rows are gone.
+    requested = set(product_ids)
+    found = db.session.execute(
+        select(Product.id, Product.category_id, Product.user_id).where(Product.id.in_(requested))
+    ).all()
+    allowed = [row for row in found if user.is_admin or row.user_id == user.id]
+    products = [(row.id, row.category_id) for row in allowed]
+    missing = sorted(requested - {row.id for row in found})
+    forbidden = sorted({row.id for row in found} - {row.id for row in allowed})
+    if not products:
+        return Deletion([], missing, forbidden)
+    ids = [product_id for product_id, _ in products]
+    public_ids = db.session.scalars(
+        select(ProductImage.public_id).where(ProductImage.product_id.in_(ids), ProductImage.public_id != "")
+    ).all()
+    if not _cascades_enforced():
+        _delete_dependents(ids)
+    db.session.execute(delete(Product).where(Product.id.in_(ids)), execution_options={"synchronize_session": False})
+    db.session.commit()
+
+    get_cleanup().enqueue(public_ids)
+    app = current_app._get_current_object()
+    for product_id, category_id in products:
+        product_deleted.send(app, product_id=product_id, category_id=category_id)
+    return Deletion(ids, missing, forbidden)
+
+
+def delete_image(image):
+    public_id = image.public_id
+    owner = image.product
+    db.session.delete(image)
+    db.session.commit()
+    get_cleanup().enqueue([public_id])
+    return owner
@@ -0,0 +1,55 @@
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from cache import get_cache
+from apps.products.signals import product_saved, product_deleted
+
+
+def version_key(scope, object_id=None):
+    return scope if object_id is None else f"{scope}:{object_id}"
+
+
+def bump(app, scope, object_id=None):
+    app.extensions["cache"].versions.bump(version_key(scope, object_id))
+
+
+class FragmentCacheExtension(Extension):
+    # {% cache "shop-card", "product", product.id %} ... {% endcache %}
+    # The body is cached under the current version of "product:<id>"; anything
+    # that depends on who is looking must stay outside the block.
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [nodes.List(args)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        if not current_app.config.get("FRAGMENT_CACHE_ENABLED", True):
+            return caller()
+        name, scope, *object_id = parts
+        key = version_key(scope, *object_id)
+        manager = get_cache()
+        version = manager.versions.get(key)
+        if version is None:
+            return caller()
+        return Markup(manager.fragment(f"{name}:{key}:v{version}", lambda: str(caller())))
+
+
+def _on_product_saved(app, product, **extra):
+    bump(app, "product", product.id)
+
+
+def _on_product_deleted(app, product_id, **extra):
+    bump(app, "product", product_id)
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    product_saved.connect(_on_product_saved, app)
+    product_deleted.connect(_on_product_deleted, app)
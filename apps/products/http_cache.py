@@ -0,0 +1,134 @@
+import functools
+import hashlib
+import json
+import logging
+import threading
+import urllib.request
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+from cache import get_cache
+from apps.products.catalog import cached_categories
+from apps.products.fragments import version_key
+from apps.products.related import get_related
+from apps.products.signals import http_purge, product_deleted, product_saved
+
+
+logger = logging.getLogger(__name__)
+
+
+CATALOG_VERSION = "catalog"
+
+
+def _versions(*keys):
+    versions = get_cache().versions
+    return tuple(versions.get(key) for key in keys)
+
+
+# Validators come from the shared version store that every catalog write
+# already bumps, so answering a 304 costs no query. Category pages share the
+# catalog-wide version: a product moving between categories changes both.
+# There is no Last-Modified: no timestamp covers owner renames, deletions or
+# the related products, so only the ETag validates.
+
+def shop_state(**kwargs):
+    return _versions(CATALOG_VERSION, "categories")
+
+
+def category_state(category_id, **kwargs):
+    return _versions(CATALOG_VERSION, "categories")
+
+
+def product_state(product_id, **kwargs):
+    # The related products come from the in-memory index, not the row.
+    return _versions(version_key("product", product_id), "categories") + (get_related().ids(product_id),)
+
+
+def _etag(state):
+    viewer = (current_user.id, current_user.username, current_user.is_admin) if current_user.is_authenticated else None
+    parts = (current_app.config.get("HTTP_CACHE_VERSION"), get_cache().versions.epoch, request.full_path, viewer, state)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _cache_headers(response):
+    if current_user.is_authenticated:
+        # Pages carry the user's nav and owner controls: browsers may keep them
+        # but must revalidate, and shared caches must not.
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    else:
+        config = current_app.config
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.s_maxage = config.get("HTTP_CACHE_EDGE_TTL", 60)
+        response.cache_control.stale_while_revalidate = config.get("HTTP_CACHE_STALE_WHILE_REVALIDATE", 300)
+    response.vary.add("Cookie")
+    return response
+
+
+def conditional(state):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are consumed by rendering, so never 304 them.
+            if (not current_app.config.get("HTTP_CACHE_ENABLED") or request.method not in ("GET", "HEAD")
+                    or session.get("_flashes")):
+                return current_app.ensure_sync(view)(*args, **kwargs)
+            values = state(**kwargs)
+            if None in values:
+                # The version store is unreachable; render without a validator.
+                return current_app.ensure_sync(view)(*args, **kwargs)
+            etag = _etag(tuple(values))
+            if not is_resource_modified(request.environ, etag=etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(current_app.ensure_sync(view)(*args, **kwargs))
+            response.set_etag(etag)
+            return _cache_headers(response)
+        return wrapper
+    return decorator
+
+
+def product_paths(product_id, category_id=None):
+    paths = ["/shop", "/search", f"/display-product/{product_id}"]
+    if category_id is not None:
+        paths.append(f"/category/{category_id}")
+    else:
+        paths.extend(f"/category/{category.id}" for category in cached_categories())
+    return paths
+
+
+def _on_product_saved(app, product, **kwargs):
+    app.extensions["cache"].versions.bump(CATALOG_VERSION)
+    http_purge.send(app, paths=product_paths(product.id, product.category_id))
+
+
+def _on_product_deleted(app, product_id, category_id=None, **kwargs):
+    app.extensions["cache"].versions.bump(CATALOG_VERSION)
+    http_purge.send(app, paths=product_paths(product_id, category_id))
+
+
+def _post_purge(url, token, paths):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    body = json.dumps({"paths": paths}).encode()
+    try:
+        urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers, method="POST"), timeout=5)
+    except Exception:
+        logger.exception("Purge request for %s failed", paths)
+
+
+def _on_http_purge(app, paths, **kwargs):
+    url = app.config.get("HTTP_PURGE_URL")
+    if not url:
+        logger.debug("Purge requested for %s", paths)
+        return
+    # Fire and forget so a slow CDN API never holds up the write request.
+    threading.Thread(target=_post_purge, args=(url, app.config.get("HTTP_PURGE_TOKEN"), paths), daemon=True).start()
+
+
+def init_app(app):
+    product_saved.connect(_on_product_saved, app)
+    product_deleted.connect(_on_product_deleted, app)
+    http_purge.connect(_on_http_purge, app)
@@ -0,0 +1,166 @@
+import os
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+from app import db
+from models import ProductImage
+from apps.products.fragments import bump
+
+
+# width candidates and the CSS sizes hint for each place an image is shown
+SIZES = {
+    "thumb": ((160, 320), "80px"),
+    "card": ((320, 480, 640), "(min-width: 992px) 25vw, (min-width: 768px) 33vw, (min-width: 576px) 50vw, 100vw"),
+    "detail": ((800, 1200, 1600), "(min-width: 992px) 58vw, 100vw"),
+}
+WIDTHS = sorted({width for widths, _ in SIZES.values() for width in widths})
+FORMATS = ("avif", "webp", "original")
+CLOUDINARY_MARKER = "/image/upload/"
+
+
+def transformation(width, fmt):
+    parts = ["c_limit", f"w_{width}", "q_auto"]
+    if fmt != "original":
+        parts.append(f"f_{fmt}")
+    return ",".join(parts)
+
+
+# Built once: imports compute derivatives for tens of thousands of URLs.
+TRANSFORMATIONS = {fmt: {str(width): transformation(width, fmt) for width in WIDTHS} for fmt in FORMATS}
+
+
+def eager_transformations():
+    # Passed to cloudinary.uploader.upload so the CDN renders every derivative at upload time.
+    return [transformation(width, fmt) for width in WIDTHS for fmt in FORMATS]
+
+
+def build_derivatives(url):
+    # Only Cloudinary can resize through the URL; other stores keep the original.
+    if not url or CLOUDINARY_MARKER not in url:
+        return {}
+    head, tail = url.split(CLOUDINARY_MARKER, 1)
+    prefix = f"{head}{CLOUDINARY_MARKER}"
+    return {
+        fmt: {width: f"{prefix}{spec}/{tail}" for width, spec in specs.items()}
+        for fmt, specs in TRANSFORMATIONS.items()
+    }
+
+
+def public_id_from_url(url):
+    # ".../image/upload/v1712/folder/name.jpg" -> "folder/name"; other hosts have none.
+    if not url or CLOUDINARY_MARKER not in url:
+        return ""
+    path = url.split(CLOUDINARY_MARKER, 1)[1]
+    parts = path.split("/")
+    if parts[0].startswith("v") and parts[0][1:].isdigit():
+        parts = parts[1:]
+    return os.path.splitext("/".join(parts))[0]
+
+
+def _srcset(variants, widths):
+    return ", ".join(f"{variants[str(w)]} {w}w" for w in widths if str(w) in variants)
+
+
+def image_url(image, size="detail"):
+    if image is None:
+        return ""
+    variants = (image.derivatives or {}).get("original", {})
+    largest = str(SIZES[size][0][-1])
+    return variants.get(largest, image.url)
+
+
+def responsive_image(image, size="card", alt="", lazy=True, **attrs):
+    if image is None:
+        return Markup("")
+    widths, sizes = SIZES[size]
+    derivatives = image.derivatives or {}
+    extra = "".join(f' {key.rstrip("_").replace("_", "-")}="{escape(value)}"' for key, value in attrs.items())
+    loading = ' loading="lazy"' if lazy else ""
+    if not derivatives:
+        return Markup(f'<img src="{escape(image.url)}" alt="{escape(alt)}"{loading} decoding="async"{extra}>')
+    sources = "".join(
+        f'<source type="image/{fmt}" srcset="{escape(_srcset(derivatives[fmt], widths))}" sizes="{sizes}">'
+        for fmt in ("avif", "webp") if fmt in derivatives
+    )
+    original = derivatives.get("original", {})
+    return Markup(
+        f'<picture>{sources}<img src="{escape(image_url(image, size))}" '
+        f'srcset="{escape(_srcset(original, widths))}" sizes="{sizes}" alt="{escape(alt)}"'
+        f'{loading} decoding="async"{extra}></picture>'
+    )
+
+
+images_cli = AppGroup("images", help="Maintain product image records.")
+
+
+@images_cli.command("backfill")
+@click.option("--batch-size", default=500, show_default=True)
+def backfill_command(batch_size):
+    app = current_app._get_current_object()
+    last_id = 0
+    updated = 0
+    while True:
+        batch = (
+            ProductImage.query
+            .filter(ProductImage.id > last_id, ProductImage.status == "ready")
+            .order_by(ProductImage.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        touched = set()
+        for image in batch:
+            derivatives = build_derivatives(image.url)
+            if derivatives and image.derivatives != derivatives:
+                image.derivatives = derivatives
+                touched.add(image.product_id)
+                updated += 1
+        db.session.commit()
+        for product_id in touched:
+            bump(app, "product", product_id)
+        last_id = batch[-1].id
+        db.session.expunge_all()
+        click.echo(f"Processed images up to id {last_id} ({updated} updated)")
+    click.echo(f"Done: {updated} images updated")
+
+
+@images_cli.command("reconcile")
+@click.option("--min-age-hours", default=24.0, show_default=True,
+              help="Leave assets younger than this alone; they may belong to uploads still in flight.")
+@click.option("--dry-run", is_flag=True, help="Only report what would be deleted.")
+def reconcile_command(min_age_hours, dry_run):
+    from apps.products.uploads import get_storage
+
+    storage = get_storage()
+    known = set(db.session.scalars(db.select(ProductImage.public_id).where(ProductImage.public_id != "")))
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=min_age_hours)
+    seen = set()
+    orphans = []
+    deleted = 0
+    for public_id, created in storage.list_assets():
+        seen.add(public_id)
+        if public_id in known or created > cutoff:
+            continue
+        orphans.append(public_id)
+        if len(orphans) == storage.bulk_limit:
+            deleted += _remove_orphans(storage, orphans, dry_run)
+            orphans = []
+    if orphans:
+        deleted += _remove_orphans(storage, orphans, dry_run)
+    verb = "Would delete" if dry_run else "Deleted"
+    click.echo(f"{verb} {deleted} orphaned assets; {len(known - seen)} image rows point at missing assets")
+
+
+def _remove_orphans(storage, public_ids, dry_run):
+    if not dry_run:
+        storage.destroy_many(public_ids)
+    return len(public_ids)
+
+
+def init_app(app):
+    app.add_template_global(responsive_image)
+    app.add_template_global(image_url)
+    app.cli.add_command(images_cli)
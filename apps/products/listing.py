@@ -0,0 +1,180 @@
+import base64
+import json
+from flask import request, url_for
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import joinedload, selectinload
+from models import Product
+
+
+SORT_KEYS = {
+    "id": (Product.id,),
+    "price": (Product.price, Product.id),
+}
+
+
+def card_options():
+    # Everything a product card touches: images for first_image and the category name.
+    return (selectinload(Product.images), joinedload(Product.category))
+
+
+def listing_query():
+    return Product.query.options(*card_options())
+
+
+def all_products():
+    return listing_query().order_by(Product.id).all()
+
+
+def products_for_user(user_id):
+    return listing_query().filter(Product.user_id == user_id).order_by(Product.id).all()
+
+
+def encode_cursor(direction, sort, values):
+    raw = json.dumps({"d": direction, "s": sort, "k": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, sort, size=None):
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        size = size or len(SORT_KEYS[sort])
+        if data["d"] not in ("next", "prev") or data["s"] != sort or len(data["k"]) != size:
+            return None
+        if not all(isinstance(value, int) for value in data["k"]):
+            return None
+        return data["d"], data["k"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class KeysetPage:
+    # Rows are pulled from the cursor while the template iterates, so a streamed
+    # response can flush the first cards before the last row is fetched.
+
+    def __init__(self, query, cursor=None, sort="id", per_page=24, sort_keys=SORT_KEYS, descending=False):
+        self.sort = sort if sort in sort_keys else "id"
+        self.per_page = per_page
+        self.keys = sort_keys[self.sort]
+        self.descending = descending
+        decoded = decode_cursor(cursor, self.sort, size=len(self.keys))
+        self.direction, self.after = decoded if decoded else ("next", None)
+        self.has_more = False
+        self._query = query
+        self._seen = []
+        self._rows = self._fetch()
+
+    def _fetch(self):
+        query = self._query
+        backwards = self.direction == "prev"
+        toward_lower = backwards != self.descending
+        if self.after is not None:
+            bound = tuple_(*self.keys)
+            query = query.filter(bound < tuple_(*self.after) if toward_lower else bound > tuple_(*self.after))
+        order = [key.desc() for key in self.keys] if toward_lower else list(self.keys)
+        query = query.order_by(None).order_by(*order).limit(self.per_page + 1)
+        if backwards:
+            rows = query.all()
+            self.has_more = len(rows) > self.per_page
+            yield from reversed(rows[:self.per_page])
+            return
+        for count, row in enumerate(query.yield_per(self.per_page), 1):
+            if count > self.per_page:
+                self.has_more = True
+                return
+            yield row
+
+    def _pull(self):
+        row = next(self._rows, None)
+        if row is not None:
+            self._seen.append(row)
+        return row
+
+    def __iter__(self):
+        yield from self._seen
+        while (row := self._pull()) is not None:
+            yield row
+
+    def __bool__(self):
+        return bool(self._seen) or self._pull() is not None
+
+    def _key(self, row):
+        return [getattr(row, key.key) for key in self.keys]
+
+    @property
+    def next_cursor(self):
+        for _ in self:
+            pass
+        more = self.has_more if self.direction == "next" else self.after is not None
+        if more and self._seen:
+            return encode_cursor("next", self.sort, self._key(self._seen[-1]))
+        return None
+
+    @property
+    def prev_cursor(self):
+        for _ in self:
+            pass
+        more = self.after is not None if self.direction == "next" else self.has_more
+        if more and self._seen:
+            return encode_cursor("prev", self.sort, self._key(self._seen[0]))
+        return None
+
+
+class RankedPage:
+    # Search results arrive as an ordered id list, so the cursor is an offset into it.
+
+    def __init__(self, ids, cursor=None, per_page=24):
+        decoded = decode_cursor(cursor, "rank", size=1)
+        offset = min(max(decoded[1][0], 0), len(ids)) if decoded else 0
+        page_ids = ids[offset:offset + per_page]
+        products = {}
+        if page_ids:
+            products = {p.id: p for p in listing_query().filter(Product.id.in_(page_ids))}
+        self.items = [products[i] for i in page_ids if i in products]
+        self.next_cursor = None
+        self.prev_cursor = None
+        if offset + per_page < len(ids):
+            self.next_cursor = encode_cursor("next", "rank", [offset + per_page])
+        if offset > 0:
+            self.prev_cursor = encode_cursor("prev", "rank", [max(offset - per_page, 0)])
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def paginate_ranked(ids, per_page):
+    return RankedPage(ids, cursor=request.args.get("cursor"), per_page=per_page)
+
+
+def paginate(query, per_page):
+    return KeysetPage(
+        query.options(*card_options()),
+        cursor=request.args.get("cursor"),
+        sort=request.args.get("sort", "id"),
+        per_page=per_page,
+    )
+
+
+def page_url(cursor):
+    args = request.args.to_dict()
+    args["cursor"] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def top_products_statement(limit=4, category_ids=None):
+    rank = func.row_number().over(partition_by=Product.category_id, order_by=Product.id).label("rank")
+    ranked = select(Product.id, rank)
+    if category_ids is not None:
+        ranked = ranked.where(Product.category_id.in_(category_ids))
+    ranked = ranked.subquery()
+    return (
+        select(Product)
+        .options(*card_options())
+        .join(ranked, ranked.c.id == Product.id)
+        .filter(ranked.c.rank <= limit)
+        .order_by(Product.category_id, Product.id)
+    )
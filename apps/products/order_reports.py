@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload, selectinload
+from app import db
+from models import Order, OrderItem, User
+from apps.products.listing import KeysetPage
+
+
+ORDER_STATUSES = ("placed", "shipped", "delivered", "cancelled")
+ORDER_SORT_KEYS = {"id": (Order.id,)}
+EXPORT_COLUMNS = (
+    "order_id", "checkout_time", "status", "customer", "email", "address", "contact_no",
+    "product_name", "price", "quantity", "order_total",
+)
+
+
+def parse_filters(args):
+    def parse_date(value):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d") if value else None
+        except ValueError:
+            return None
+
+    status = args.get("status")
+    return {
+        "date_from": parse_date(args.get("date_from")),
+        "date_to": parse_date(args.get("date_to")),
+        "status": status if status in ORDER_STATUSES else None,
+        "customer": (args.get("customer") or "").strip() or None,
+    }
+
+
+def apply_filters(statement, filters):
+    if filters["date_from"]:
+        statement = statement.where(Order.checkout_time >= filters["date_from"])
+    if filters["date_to"]:
+        # date_to is inclusive of the whole day
+        statement = statement.where(Order.checkout_time < filters["date_to"] + timedelta(days=1))
+    if filters["status"]:
+        statement = statement.where(Order.status == filters["status"])
+    if filters["customer"]:
+        customer = filters["customer"]
+        matching_users = select(User.id).where(or_(User.email == customer, User.username.ilike(f"%{customer}%")))
+        statement = statement.where(Order.user_id.in_(matching_users))
+    return statement
+
+
+def order_page(filters, cursor, per_page):
+    query = apply_filters(Order.query, filters).options(selectinload(Order.items), joinedload(Order.user))
+    return KeysetPage(query, cursor=cursor, per_page=per_page, sort_keys=ORDER_SORT_KEYS, descending=True)
+
+
+def summary(filters):
+    day = func.date(Order.checkout_time).label("day")
+    daily = db.session.execute(
+        apply_filters(
+            select(day, func.count(Order.id), func.coalesce(func.sum(Order.total_price), 0)),
+            filters,
+        ).group_by(day).order_by(day.desc()).limit(31)
+    ).all()
+    orders, revenue = db.session.execute(
+        apply_filters(select(func.count(Order.id), func.coalesce(func.sum(Order.total_price), 0)), filters)
+    ).one()
+    return {
+        "orders": orders,
+        "revenue": revenue,
+        "daily": [{"day": str(row[0]), "orders": row[1], "revenue": row[2]} for row in daily],
+    }
+
+
+def export_rows(filters, batch_size=500):
+    # Plain rows through a server-side cursor: nothing is turned into ORM objects
+    # and memory stays flat however many orders match.
+    statement = apply_filters(
+        select(
+            Order.id, Order.checkout_time, Order.status, User.username, User.email, Order.address,
+            Order.contact_no, OrderItem.product_name, OrderItem.price, OrderItem.quantity, Order.total_price,
+        )
+        .outerjoin(User, User.id == Order.user_id)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id, OrderItem.id),
+        filters,
+    ).execution_options(stream_results=True, yield_per=batch_size)
+    for row in db.session.execute(statement):
+        values = dict(zip(EXPORT_COLUMNS, row))
+        values["checkout_time"] = values["checkout_time"].isoformat() if values["checkout_time"] else None
+        yield values
+
+
+def export_csv(filters):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for values in export_rows(filters):
+        writer.writerow(values)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(filters):
+    for values in export_rows(filters):
+        yield json.dumps(values) + "\n"
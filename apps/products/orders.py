@@ -0,0 +1,47 @@
+from sqlalchemy import delete, insert, select
+from app import db
+from models import Cart, Category, Order, OrderItem, Product
+from apps.products import analytics
+
+
+def place_order(user_id, address, contact_no, message=""):
+    # The cart rows stay locked until commit, so a second submission of the same
+    # cart waits and then finds it empty instead of placing a duplicate order.
+    rows = db.session.execute(
+        select(
+            Cart.id, Cart.product_id, Cart.quantity, Product.name.label("product_name"), Product.price,
+            Product.category_id, Category.name.label("category_name"), Product.brand,
+        )
+        .join(Product, Product.id == Cart.product_id)
+        .join(Category, Category.id == Product.category_id)
+        .where(Cart.user_id == user_id)
+        .order_by(Cart.id)
+        .with_for_update(of=Cart)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return None
+    analytics.lock_rollups()
+    order = Order(
+        user_id=user_id,
+        address=address,
+        contact_no=contact_no,
+        message=message or "",
+        total_price=sum(row.price * row.quantity for row in rows),
+    )
+    db.session.add(order)
+    db.session.flush()
+    db.session.execute(insert(OrderItem), [
+        {
+            "order_id": order.id,
+            "product_id": row.product_id,
+            "product_name": row.product_name,
+            "price": row.price,
+            "quantity": row.quantity,
+        }
+        for row in rows
+    ])
+    db.session.execute(delete(Cart).where(Cart.id.in_([row.id for row in rows])))
+    analytics.record_order(order, rows)
+    db.session.commit()
+    return order
@@ -1,59 +1,86 @@
-from flask import Blueprint, render_template, request, url_for, redirect, flash
+from flask import Blueprint, abort, render_template, request, url_for, redirect, flash, current_app, stream_template, stream_with_context
 from flask_login import login_required, current_user
-from forms import AddProduct, EditProduct, OrderDetail
-from models import Category, Cart, Checkout, Product, User, ProductImage
+from models import Category, Cart, Order, Product, User, ProductImage
 from app import db
 from flask import jsonify
-import cloudinary.uploader
+from apps.products import listing, uploads, search as search_index
+from apps.products import analytics, cart as cart_service, deletion, orders, order_reports
+from apps.products.http_cache import category_state, conditional, product_state, shop_state
+from apps.products.catalog import cached_categories
+from apps.products.related import get_related
+from apps.products.repository import get_repository
+from apps.products.snapshot import get_snapshot
+from cache import get_cache
+from pooling import pool_stats
+from replicas import read_only
+from apps.products.signals import product_saved
 
 
 product = Blueprint("product", __name__, template_folder="../../templates")
 
 
+def render_listing(template, **context):
+    if current_app.config.get("STREAM_LISTINGS") or request.args.get("stream", type=int):
+        return current_app.response_class(stream_template(template, **context))
+    return render_template(template, **context)
+
+
+@product.app_template_global()
+def page_url(cursor):
+    return listing.page_url(cursor)
+
+
 @product.route("/dashboard")
 @login_required
+@read_only
 def dashboard():
-    categories = Category.query.all()
-    category_products = []
-    for category in categories:
-        products = Product.query.filter_by(category_id=category.id).limit(4) 
-        if products:
-            category_products.append({
-                "category": category,
-                "products": products
-            })
-    return render_template("dashboard.html", category_products=category_products)
+    return render_template("dashboard.html", category_products=get_snapshot().get())
     
 
 @product.route("/delete-product/<int:product_id>", methods=["POST"])
 @login_required
 def delete_product(product_id):
-    product = Product.query.get(product_id)
-    images = ProductImage.query.filter_by(product_id=product_id)
-    for image in images:
-        delete_image(image.id)
-    if product.user_id == current_user.id or current_user.is_admin:
-        Cart.query.filter_by(product_id=product.id).delete()
-        db.session.delete(product)
-        db.session.commit()
+    result = deletion.delete_products([product_id], current_user)
+    if result.deleted:
         flash("Product deleted successfully")
+    elif result.missing:
+        flash("Product not found.")
     else:
         flash("You are not authorized to delete this product.")
-        return redirect(url_for("product.dashboard"))
     return redirect(url_for("product.dashboard"))
 
 
+@product.route("/delete-products", methods=["POST"])
+@login_required
+def delete_products():
+    result = deletion.delete_products(request.form.getlist("product_ids", type=int), current_user)
+    if result.deleted:
+        flash(f"Deleted {len(result.deleted)} product{'s' if len(result.deleted) != 1 else ''}")
+    else:
+        flash("No products were deleted.")
+    if result.missing:
+        flash(f"{len(result.missing)} selected product{'s were' if len(result.missing) != 1 else ' was'} not found.")
+    if result.forbidden:
+        flash(f"You are not authorized to delete {len(result.forbidden)} of the selected products.")
+    return redirect(url_for("product.user_product", user_id=current_user.id))
+
+
 @product.route("/add-product", methods=["POST", "GET"])
 @login_required
 def add_product():
+    from forms import AddProduct
     form = AddProduct()
-    categories = [(c.id, c.name) for c in Category.query.all()]
+    categories = [(c.id, c.name) for c in cached_categories()]
     categories.append((-1, "Add New Category"))
     form.category.choices = categories
     if form.validate_on_submit():
         if form.category.data == -1:
             flash("Please add a category first before saving the product.")
             return render_template("add_product.html", form=form)
+        payloads = uploads.read_uploads(form.images.data)
+        if not payloads:
+            flash("At least one image is required")
+            return render_template("add_product.html", form=form)
         new_product = Product(
             name=form.name.data,
             price=form.price.data,
@@ -63,27 +90,11 @@ def add_product():
             category_id=form.category.data
         )    
         db.session.add(new_product)
-        db.session.flush()
-        for image_file in form.images.data:
-            if image_file:
-                try:
-                    upload_result = cloudinary.uploader.upload(image_file)
-                    image_url = upload_result['secure_url']
-                    public_id=upload_result['public_id']
-                    new_image = ProductImage(
-                        url=image_url,
-                        public_id=public_id,
-                        product_id=new_product.id
-                    )
-                    db.session.add(new_image)
-                except Exception as e:
-                    flash(f"Error uploading image: {str(e)}")
-                    continue
-        if not new_product.images:
-            flash("At least one image is required")
-            return render_template("add_product.html", form=form)
+        images = uploads.create_pending_images(new_product, payloads)
         db.session.commit()
-        flash("Product added successfully!")
+        uploads.start_uploads(images, payloads)
+        product_saved.send(current_app._get_current_object(), product=new_product)
+        flash("Product added successfully! Images are being uploaded.")
         return redirect(url_for("product.dashboard"))
     return render_template("add_product.html", form=form)
 
@@ -91,11 +102,12 @@ def add_product():
 @product.route("/edit-product/<int:product_id>", methods=["GET", "POST"])
 @login_required
 def edit_product(product_id):
+    from forms import EditProduct
     product = Product.query.get(product_id)
     if product.user_id != current_user.id and not current_user.is_admin:
         flash("Unauthorized")
         return redirect(url_for("product.dashboard"))
-    categories = Category.query.all()    
+    categories = cached_categories()
     form = EditProduct(obj=product)
     form.category.choices = [(c.id, c.name) for c in categories]  
     if request.method == 'GET':
@@ -111,21 +123,11 @@ def edit_product(product_id):
             product.brand = form.brand.data
             product.category_id = form.category.data 
             product.description = form.description.data            
-            if form.images.data and form.images.data[0].filename != '':
-                for image_file in form.images.data:
-                    if image_file.filename != '':
-                        try:
-                            upload_result = cloudinary.uploader.upload(image_file)
-                            new_image = ProductImage(
-                                url=upload_result['secure_url'],
-                                public_id=upload_result['public_id'],
-                                product_id=product.id
-                            )
-                            print( "Image URL is: " ,new_image)
-                            db.session.add(new_image)
-                        except Exception as e:
-                            flash(f"Error uploading image: {str(e)}")          
+            payloads = uploads.read_uploads(form.images.data)
+            images = uploads.create_pending_images(product, payloads)
             db.session.commit()
+            uploads.start_uploads(images, payloads)
+            product_saved.send(current_app._get_current_object(), product=product)
             flash("Product updated successfully!")
             return redirect(url_for("product.dashboard"))
         except Exception as e:
@@ -140,9 +142,35 @@ def edit_product(product_id):
 
 @product.route("/display-product/<int:product_id>")
 @login_required
+@read_only
+@conditional(product_state)
 def display_product(product_id):
-    product = Product.query.get(product_id)
-    return render_template("display_product.html", product=product)
+    product = get_repository().get(product_id)
+    if product is None:
+        abort(404)
+    return render_template("display_product.html", product=product, related=get_related().for_product(product_id))
+
+
+@product.route("/products/<int:product_id>/images/status")
+@login_required
+def image_status(product_id):
+    owner_id = db.session.scalar(db.select(Product.user_id).where(Product.id == product_id))
+    if owner_id is None:
+        abort(404)
+    if owner_id != current_user.id and not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    images = ProductImage.query.filter_by(product_id=product_id).order_by(ProductImage.id).all()
+    pending = sum(1 for image in images if image.status == "pending")
+    if pending:
+        uploads.sweep_stale()
+    return jsonify({
+        "product_id": product_id,
+        "pending": pending,
+        "images": [
+            {"id": image.id, "status": image.status, "url": image.url or None, "error": image.error}
+            for image in images
+        ],
+    })
 
 
 @product.route("/products/delete-image/<int:image_id>", methods=["POST"])
@@ -152,9 +180,8 @@ def delete_image(image_id):
     if image.product.user_id != current_user.id and not current_user.is_admin:
         return "Unauthorized"    
     try:
-        cloudinary.uploader.destroy(image.public_id)
-        db.session.delete(image)
-        db.session.commit()
+        owner = deletion.delete_image(image)
+        product_saved.send(current_app._get_current_object(), product=owner)
         return "Image deleted successfully"
     except Exception as e:
         return f"Error deleting image: {str(e)}"
@@ -174,25 +201,26 @@ def add_category():
 
 
 @product.route("/category/<int:category_id>")
+@read_only
+@conditional(category_state)
 def category_products(category_id):
     category = Category.query.get(category_id)
-    products = Product.query.filter_by(category_id=category_id).all()
-    return render_template("category_products.html", category=category, products=products)
+    products = listing.paginate(
+        Product.query.filter_by(category_id=category_id),
+        per_page=current_app.config["PRODUCTS_PER_PAGE"]
+    )
+    return render_listing("category_products.html", category=category, products=products)
 
 
 @product.route("/cart/<int:product_id>", methods=["POST", "GET"])
 @login_required
 def add_to_cart(product_id):  
     if current_user.is_authenticated or current_user.is_admin:
-        quantity = request.form.get("quantity")
-        item = Cart.query.filter_by(product_id=product_id, user_id=current_user.id).first()
-        if item:
-            flash(f"Item is already added to cart!")
+        quantity = request.form.get("quantity", 1, type=int)
+        if cart_service.add_item(current_user.id, product_id, max(quantity, 1)):
+            flash(f"Item added to cart successfully")
         else:
-            cart_item = Cart(user_id=current_user.id, product_id=product_id, quantity=quantity)
-            db.session.add(cart_item)   
-        db.session.commit()
-        flash(f"Item added to cart successfully")
+            flash(f"Item is already added to cart!")
     return redirect(url_for("product.dashboard"))
     
     
@@ -209,15 +237,28 @@ def cart_items(user_id):
                 item.quantity = new_quantity
                 db.session.commit()
                 return ""  
-        total_sum = 0
         items = Cart.query.filter_by(user_id=user_id).all()
-        for item in items:
-            total_sum += item.quantity * item.product.price
+        total_sum = cart_service.totals(user_id)["total"]
         return render_template("cart.html", items=items, price=total_sum)
     
     return render_template("dashboard.html")
 
 
+@product.route("/api/cart", methods=["GET", "POST"])
+@login_required
+def cart_api():
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        operations = data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"error": "A non-empty operations list is required"}), 400
+        try:
+            cart_service.apply_operations(current_user.id, operations)
+        except cart_service.CartError as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(cart_service.totals(current_user.id))
+
+
 @product.route("/remove-from-cart/<int:item_id>", methods=["POST"])
 @login_required
 def remove_cart_item(item_id ):
@@ -234,29 +275,29 @@ def remove_cart_item(item_id ):
 @product.route("/checkout", methods=["GET", "POST"])
 @login_required
 def checkout():
+    from forms import OrderDetail
     cart_items = Cart.query.filter_by(user_id=current_user.id).all()
     
     if not cart_items:
         flash('Your cart is empty!', 'warning')
         return redirect(url_for('product.dashboard'))
-    total_price = sum(item.product.price * item.quantity for item in cart_items)
+    total_price = cart_service.totals(current_user.id)["total"]
     form = OrderDetail()
     if form.validate_on_submit():
         try:
-            for cart_item in cart_items:
-                checkout = Checkout(
-                    total_price=total_price,
-                    contact_no=form.contact.data,
-                    message=form.message.data or "",
-                    address=form.address.data,
-                    cart_id=cart_item.id 
-                )
-                db.session.add(checkout)
-            Cart.query.filter_by(user_id=current_user.id).delete()
-            db.session.commit()
+            order = orders.place_order(
+                current_user.id,
+                address=form.address.data,
+                contact_no=form.contact.data,
+                message=form.message.data,
+            )
+            if order is None:
+                flash('Your cart is empty!', 'warning')
+                return redirect(url_for('product.dashboard'))
             flash('Your order has been placed successfully!')
-            return redirect(url_for('product.order_confirmation', order_id=checkout.id))  
+            return redirect(url_for('product.order_confirmation', order_id=order.id))  
         except Exception as e:
+            db.session.rollback()
             flash(f'An error occurred: {str(e)}', 'error')
 
     return render_template(
@@ -271,12 +312,12 @@ def checkout():
 @product.route("/user-products/<int:user_id>", methods=["GET"])
 @login_required
 def user_product(user_id):
-    categories = Category.query.all() 
+    categories = cached_categories()
     if current_user.is_admin:
-        products = Product.query.all()
+        products = listing.all_products()
         return render_template("user_product.html", user_products=products, categories=categories) 
     else:
-        products = Product.query.filter_by(user_id=user_id).all()
+        products = listing.products_for_user(user_id)
         return render_template("user_product.html", user_products=products, categories=categories) 
     
     
@@ -291,11 +332,81 @@ def user_account():
 @login_required
 def admin_checkout():
     if current_user.is_admin:
-        checkout_item = Checkout.query.all()
-        return render_template("admin_checkout.html", checkout_item=checkout_item)
+        filters = order_reports.parse_filters(request.args)
+        orders_placed = order_reports.order_page(
+            filters,
+            cursor=request.args.get("cursor"),
+            per_page=current_app.config["ORDERS_PER_PAGE"]
+        )
+        return render_template(
+            "admin_checkout.html",
+            orders=orders_placed,
+            filters=filters,
+            statuses=order_reports.ORDER_STATUSES,
+            summary=order_reports.summary(filters),
+            export_args={k: v for k, v in request.args.items() if k != "cursor"}
+        )
     return render_template("dashboard.html")
     
     
+@product.route("/admin/cache-stats")
+@login_required
+def cache_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(get_cache().stats())
+
+
+@product.route("/admin/pool-stats")
+@login_required
+def db_pool_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    stats = {name or "default": pool_stats(engine) for name, engine in db.engines.items()}
+    if "replicas" in current_app.extensions:
+        stats["replica_health"] = current_app.extensions["replicas"].stats()
+    return jsonify(stats)
+
+
+@product.route("/admin/dashboard-snapshot", methods=["GET", "POST"])
+@login_required
+def dashboard_snapshot():
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    snapshot = get_snapshot()
+    if request.method == "POST":
+        snapshot.refresh()
+    return jsonify(snapshot.stats())
+
+
+@product.route("/admin/analytics")
+@login_required
+@read_only
+def sales_analytics():
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    try:
+        return jsonify(analytics.report(**analytics.parse_report_args(request.args)))
+    except analytics.ReportError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@product.route("/admin-checkout/export.<fmt>")
+@login_required
+def export_orders(fmt):
+    if not current_user.is_admin:
+        return jsonify({"error": "Unauthorized"}), 403
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "Unsupported export format"}), 404
+    filters = order_reports.parse_filters(request.args)
+    rows = order_reports.export_csv(filters) if fmt == "csv" else order_reports.export_ndjson(filters)
+    return current_app.response_class(
+        stream_with_context(rows),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=orders.{fmt}"}
+    )
+
+
 @product.route("/about")
 @login_required
 def about():
@@ -309,23 +420,30 @@ def contact():
 
 
 @product.route("/shop")
+@read_only
+@conditional(shop_state)
 def shop():
-    products = Product.query.all() 
-    return render_template("shop.html", products=products)
+    products = listing.paginate(Product.query, per_page=current_app.config["PRODUCTS_PER_PAGE"])
+    return render_listing("shop.html", products=products)
 
 
 @product.route("/order-confirmation/<int:order_id>")
 @login_required
 def order_confirmation(order_id):
-    checkout = Checkout.query.get(order_id)
-    return render_template("order_confirmation.html", checkout=checkout)
+    order = db.get_or_404(Order, order_id)
+    if order.user_id != current_user.id and not current_user.is_admin:
+        flash("You are not authorized to view this order.")
+        return redirect(url_for("product.dashboard"))
+    return render_template("order_confirmation.html", order=order)
 
 
 @product.route('/search')
+@read_only
 def search():
     query = request.args.get("q")
+    per_page = current_app.config["PRODUCTS_PER_PAGE"]
     if query:
-        results = Product.query.filter(Product.name.ilike(f"%{query}%")).all()
+        results = listing.paginate_ranked(search_index.search_ids(query), per_page=per_page)
     else:
-        results = Product.query.all()
-    return render_template("search_results.html", results=results, query=query)
\ No newline at end of file
+        results = listing.paginate(Product.query, per_page=per_page)
+    return render_listing("search_results.html", results=results, query=query)
\ No newline at end of file
@@ -0,0 +1,310 @@
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app import db
+from models import Product
+from apps.products.catalog import cached_categories
+from apps.products.fragments import version_key
+from apps.products.signals import categories_changed, product_deleted, product_saved
+from apps.products.snapshot import ImageCard
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "related"
+PRICE_BAND = 2.0
+# Rows committed late can carry an updated_at older than the last sync.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class RelatedCard:
+    __slots__ = ("id", "name", "brand", "price", "category_id", "cover", "version", "loaded_at")
+
+    def __init__(self, id, name, brand, price, category_id, cover):
+        self.id = id
+        self.name = name
+        self.brand = brand
+        self.price = price
+        self.category_id = category_id
+        self.cover = cover
+        # The product's shared version when loaded; None for cards from the
+        # full build, which skips the lookups and verifies cards when first shown.
+        self.version = None
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_product(cls, product):
+        cover = product.cover
+        return cls(
+            product.id, product.name, product.brand, product.price, product.category_id,
+            ImageCard(cover.url, cover.derivatives) if cover is not None else None,
+        )
+
+
+class RelatedIndex:
+    # Related products for every product, kept in memory with a card per
+    # product so the detail page renders them without a query. Candidates share
+    # the category or the brand and cost within PRICE_BAND times the price;
+    # sharing both ranks first, then the closest price. Only the `window`
+    # nearest prices in each group are considered, which bounds the
+    # neighbourhood a change has to recompute.
+    #
+    # Nothing here runs on the request path: the first lookup starts a
+    # background build and gets no related products until it is done. Writes
+    # in this process patch the index directly. Other workers' writes arrive
+    # through the shared version and a periodic sync that patches only the
+    # products updated since the last one. Cards about to be shown are checked
+    # against their product's shared version, and past the sync interval they
+    # are reloaded, which also catches deletes.
+
+    def __init__(self, app, per_product, sync_interval, window=None):
+        self.app = app
+        self.per_product = per_product
+        self.sync_interval = sync_interval
+        self.window = window or 3 * per_product
+        self.cards = {}
+        self.groups = {}
+        self.related = {}
+        self.version = None
+        self.ready = False
+        self.synced_at = None
+        self.synced_clock = 0.0
+        self.builds = 0
+        self.syncs = 0
+        self.patched = 0
+        self.last_build_seconds = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="related-index")
+        self._pending = set()
+        self._sync = False
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    @property
+    def versions(self):
+        return self.app.extensions["cache"].versions
+
+    @staticmethod
+    def _group_keys(card):
+        return ("category", card.category_id), ("brand", card.brand.strip().lower())
+
+    def ids(self, product_id):
+        if not self.ready:
+            self.schedule()
+            return ()
+        version = self.versions.get(VERSION_KEY)
+        if (version is not None and version != self.version) or \
+                time.monotonic() - self.synced_clock > self.sync_interval:
+            self.schedule(sync=True)
+        return self.related.get(product_id, ())
+
+    def for_product(self, product_id):
+        versions = self.versions
+        now = time.monotonic()
+        shown, stale = [], []
+        for other in self.ids(product_id):
+            card = self.cards.get(other)
+            if card is None:
+                continue
+            if card.version is None or now - card.loaded_at > self.sync_interval:
+                stale.append(other)
+            elif versions.get(version_key("product", other)) != card.version:
+                # Changed or deleted by another worker.
+                stale.append(other)
+                continue
+            shown.append(card)
+        if stale:
+            self.schedule(stale)
+        return shown
+
+    def _neighbours(self, groups, card, product_id):
+        for key in self._group_keys(card):
+            entries = groups.get(key, ())
+            position = bisect.bisect_left(entries, (card.price, product_id))
+            for entry in entries[max(0, position - self.window):position + self.window + 1]:
+                yield entry
+
+    def _compute(self, cards, groups, product_id):
+        card = cards[product_id]
+        low, high = card.price / PRICE_BAND, card.price * PRICE_BAND
+        shared = {}
+        for price, other in self._neighbours(groups, card, product_id):
+            if other != product_id and low <= price <= high:
+                shared[other] = shared.get(other, 0) + 1
+        ranked = sorted(shared, key=lambda other: (-shared[other], abs(cards[other].price - card.price), other))
+        return tuple(ranked[:self.per_product])
+
+    def _apply(self, product_id, card):
+        # card is None when the product is gone. Callers hold self._lock.
+        cards, groups = self.cards, self.groups
+        previous = cards.get(product_id)
+        if previous is not None and card is not None and previous.price == card.price \
+                and self._group_keys(previous) == self._group_keys(card):
+            cards[product_id] = card
+            return
+        affected = {product_id}
+        if previous is not None:
+            affected.update(other for _, other in self._neighbours(groups, previous, product_id))
+            for key in self._group_keys(previous):
+                groups[key].remove((previous.price, product_id))
+        if card is None:
+            cards.pop(product_id, None)
+            self.related.pop(product_id, None)
+        else:
+            cards[product_id] = card
+            for key in self._group_keys(card):
+                bisect.insort(groups.setdefault(key, []), (card.price, product_id))
+            affected.update(other for _, other in self._neighbours(groups, card, product_id))
+        for other in affected:
+            if other in cards:
+                self.related[other] = self._compute(cards, groups, other)
+
+    def _load(self, statement, versions=None):
+        statement = statement.options(selectinload(Product.images)).execution_options(yield_per=1000)
+        cards = {product.id: RelatedCard.from_product(product) for product in db.session.scalars(statement)}
+        if versions is not None:
+            for product_id, card in cards.items():
+                card.version = versions.get(product_id) if product_id in versions \
+                    else self.versions.get(version_key("product", product_id))
+        return cards
+
+    def build(self):
+        started = time.perf_counter()
+        version = self.versions.get(VERSION_KEY)
+        synced_at = datetime.now()
+        cards = self._load(select(Product))
+        groups = {}
+        for product_id, card in cards.items():
+            for key in self._group_keys(card):
+                groups.setdefault(key, []).append((card.price, product_id))
+        for entries in groups.values():
+            entries.sort()
+        related = {product_id: self._compute(cards, groups, product_id) for product_id in cards}
+        with self._lock:
+            self.cards, self.groups, self.related = cards, groups, related
+            self.version = version
+            self.synced_at = synced_at
+            self.synced_clock = time.monotonic()
+            self.ready = True
+            self.builds += 1
+            self.last_build_seconds = time.perf_counter() - started
+
+    def sync(self):
+        # Products updated since the last sync, through the updated_at index,
+        # plus cards whose category no longer exists (its products went with it).
+        version = self.versions.get(VERSION_KEY)
+        synced_at = datetime.now()
+        cards = self._load(select(Product).where(Product.updated_at >= self.synced_at - SYNC_OVERLAP), {})
+        categories = {category.id for category in cached_categories()}
+        with self._lock:
+            for product_id, card in cards.items():
+                self._apply(product_id, card)
+            orphans = [product_id for product_id, card in self.cards.items() if card.category_id not in categories]
+            for product_id in orphans:
+                self._apply(product_id, None)
+            self.version = version
+            self.synced_at = synced_at
+            self.synced_clock = time.monotonic()
+            self.syncs += 1
+
+    def patch(self, product_ids):
+        # Versions are read first, so a write landing mid-load shows up as a mismatch.
+        versions = {product_id: self.versions.get(version_key("product", product_id)) for product_id in product_ids}
+        cards = self._load(select(Product).where(Product.id.in_(product_ids)), versions)
+        with self._lock:
+            for product_id in product_ids:
+                self._apply(product_id, cards.get(product_id))
+            self.patched += len(product_ids)
+
+    def schedule(self, product_ids=None, sync=False):
+        with self._lock:
+            if product_ids:
+                self._pending.update(product_ids)
+            self._sync = self._sync or sync
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.executor.submit(self._drain)
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                build = not self.ready
+                sync, pending = self._sync, self._pending
+                self._sync, self._pending = False, set()
+                if not build and not sync and not pending:
+                    self._scheduled = False
+                    return
+            try:
+                with self.app.app_context():
+                    if build:
+                        self.build()
+                    else:
+                        if sync:
+                            self.sync()
+                        if pending:
+                            self.patch(pending)
+                    db.session.remove()
+            except Exception:
+                logger.exception("Related products update failed")
+                with self._lock:
+                    self._scheduled = False
+                return
+
+    def product_changed(self, product_id, card=None):
+        # Called in the writing process; card is None when the product was deleted.
+        self.versions.bump(VERSION_KEY)
+        version = self.versions.get(VERSION_KEY)
+        with self._lock:
+            if not self.ready:
+                return
+            self._apply(product_id, card)
+            # Only our own bump moved the version, so this worker is current.
+            if version is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "products": len(self.cards),
+            "version": self.version,
+            "builds": self.builds,
+            "syncs": self.syncs,
+            "patched": self.patched,
+            "last_build_ms": round(self.last_build_seconds * 1000, 2) if self.last_build_seconds else None,
+        }
+
+
+def get_related():
+    return current_app.extensions["related"]
+
+
+def _on_product_saved(app, product, **extra):
+    app.extensions["related"].product_changed(product.id, RelatedCard.from_product(product))
+
+
+def _on_product_deleted(app, product_id, **extra):
+    app.extensions["related"].product_changed(product_id)
+
+
+def _on_categories_changed(app, **extra):
+    # Deleting a category removes its products without product_deleted.
+    index = app.extensions["related"]
+    index.versions.bump(VERSION_KEY)
+    index.schedule(sync=True)
+
+
+def init_app(app):
+    app.extensions["related"] = RelatedIndex(
+        app,
+        per_product=app.config.get("RELATED_PRODUCTS", 4),
+        sync_interval=app.config.get("RELATED_SYNC_INTERVAL", 60),
+    )
+    product_saved.connect(_on_product_saved, app)
+    product_deleted.connect(_on_product_deleted, app)
+    categories_changed.connect(_on_categories_changed, app)
@@ -0,0 +1,150 @@
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, joinedload
+from app import db
+from async_db import get_async_db
+from cache import LRUStore
+from models import Product, User
+from apps.products.catalog import CategoryRow
+from apps.products.fragments import bump, version_key
+from apps.products.snapshot import ImageCard
+from replicas import read_replica
+
+
+# Shown on the product page, so changing them changes every product of the user.
+OWNER_FIELDS = ("username", "email")
+
+
+class Owner:
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+
+class ProductDetail:
+    # Everything display_product.html reads, as plain values that are safe to
+    # share between requests and threads.
+    __slots__ = ("id", "name", "brand", "description", "price", "category", "user", "ready_images")
+
+    def __init__(self, id, name, brand, description, price, category, user, ready_images):
+        self.id = id
+        self.name = name
+        self.brand = brand
+        self.description = description
+        self.price = price
+        self.category = category
+        self.user = user
+        self.ready_images = ready_images
+
+    @classmethod
+    def from_product(cls, product):
+        images = sorted(product.ready_images, key=lambda image: image.id)
+        return cls(
+            product.id, product.name, product.brand, product.description, product.price,
+            CategoryRow(product.category.id, product.category.name),
+            Owner(product.user.id, product.user.username, product.user.email),
+            tuple(ImageCard(image.url, image.derivatives) for image in images),
+        )
+
+
+def detail_statement(product_id):
+    return (
+        select(Product)
+        .options(joinedload(Product.images), joinedload(Product.category), joinedload(Product.user))
+        .where(Product.id == product_id)
+    )
+
+
+async def _load_detail(session, product_id):
+    # The async session closes as soon as this returns, so the record is built here.
+    product = (await session.scalars(detail_statement(product_id))).unique().first()
+    return ProductDetail.from_product(product) if product is not None else None
+
+
+class ProductRepository:
+    # Detail records cached per product and validated against the shared
+    # "product:<id>" version (bumped on every product write and owner rename)
+    # and the category list version, so a hit costs two version lookups and no
+    # query. Entries expire after ttl when the versions are per-process.
+
+    def __init__(self, app, max_entries, ttl=None):
+        self.app = app
+        self.entries = LRUStore(max_entries, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, product_id):
+        versions = self.app.extensions["cache"].versions
+        return versions.get(version_key("product", product_id)), versions.get("categories")
+
+    def _cached(self, product_id, version):
+        cached = self.entries.get(product_id)
+        if cached is not None and None not in version and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        return None
+
+    def _store(self, product_id, version, detail):
+        if detail is not None and None not in version:
+            self.entries.set(product_id, (version, detail))
+        return detail
+
+    def get(self, product_id):
+        version = self._version(product_id)
+        detail = self._cached(product_id, version)
+        if detail is not None:
+            return detail
+        product = db.session.scalars(detail_statement(product_id)).unique().first()
+        return self._store(product_id, version, product and ProductDetail.from_product(product))
+
+    async def get_async(self, product_id):
+        # The same entries as get; a miss loads on the async engine, from a
+        # replica when the request is read-only.
+        version = self._version(product_id)
+        detail = self._cached(product_id, version)
+        if detail is not None:
+            return detail
+        detail = await get_async_db().run(_load_detail, product_id, bind=read_replica(db.engines))
+        return self._store(product_id, version, detail)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+def get_repository():
+    return current_app.extensions["product_repository"]
+
+
+@event.listens_for(Session, "after_flush")
+def _track_owner_changes(session, flush_context):
+    user_ids = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and any(inspect(obj).attrs[field].history.has_changes() for field in OWNER_FIELDS)
+    ]
+    if user_ids:
+        product_ids = session.execute(select(Product.id).where(Product.user_id.in_(user_ids))).scalars()
+        session.info.setdefault("owner_products", set()).update(product_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_owner_products(session):
+    product_ids = session.info.pop("owner_products", ())
+    if product_ids:
+        app = current_app._get_current_object()
+        for product_id in product_ids:
+            bump(app, "product", product_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_owner_products(session):
+    session.info.pop("owner_products", None)
+
+
+def init_app(app):
+    app.extensions["product_repository"] = ProductRepository(
+        app, app.config.get("PRODUCT_CACHE_SIZE", 5000), ttl=app.extensions["cache"].local_ttl,
+    )
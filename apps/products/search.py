@@ -0,0 +1,349 @@
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+from app import db
+from models import Product
+from apps.products.signals import categories_changed, product_saved, product_deleted
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "search"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+FIELD_WEIGHTS = {"name": 3.0, "brand": 2.0, "category": 2.0, "description": 1.0}
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def product_fields(product):
+    return {
+        "name": product.name,
+        "brand": product.brand,
+        "category": product.category.name if product.category else "",
+        "description": product.description,
+    }
+
+
+def iter_catalog(batch_size=1000):
+    query = Product.query.options(joinedload(Product.category)).order_by(Product.id)
+    return query.yield_per(batch_size)
+
+
+class SearchBackend:
+    name = None
+
+    def search(self, query, limit):
+        raise NotImplementedError
+
+    def index(self, product):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+    def categories_changed(self):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class InvertedIndex:
+    # BM25 over weighted fields; every query term also matches indexed terms it prefixes.
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_length = {}
+        self.total_length = 0.0
+        self._terms = []
+        self._terms_dirty = False
+
+    def __len__(self):
+        return len(self.doc_length)
+
+    def add(self, doc_id, fields):
+        self.remove(doc_id)
+        weighted = Counter()
+        for field, value in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for term in tokenize(value):
+                weighted[term] += weight
+        for term, frequency in weighted.items():
+            if term not in self.postings:
+                self._terms_dirty = True
+            self.postings[term][doc_id] = frequency
+        self.doc_terms[doc_id] = tuple(weighted)
+        self.doc_length[doc_id] = sum(weighted.values())
+        self.total_length += self.doc_length[doc_id]
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings[term]
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+                self._terms_dirty = True
+        self.total_length -= self.doc_length.pop(doc_id)
+
+    def expand(self, term):
+        if self._terms_dirty:
+            self._terms = sorted(self.postings)
+            self._terms_dirty = False
+        start = bisect.bisect_left(self._terms, term)
+        matches = []
+        for candidate in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+        return matches
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms or not self.doc_length:
+            return []
+        total_docs = len(self.doc_length)
+        average_length = self.total_length / total_docs
+        scores = defaultdict(float)
+        for term in dict.fromkeys(terms):
+            candidates = self.expand(term)
+            if not candidates:
+                continue
+            # A prefix counts as one query term, so its idf covers every document it reaches.
+            matched = len(set().union(*(self.postings[c] for c in candidates)))
+            idf = math.log(1 + (total_docs - matched + 0.5) / (matched + 0.5))
+            best = {}
+            for candidate in candidates:
+                # Exact hits outrank words that merely share the prefix.
+                boost = 1.0 if candidate == term else 0.8
+                for doc_id, frequency in self.postings[candidate].items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_length[doc_id] / average_length)
+                    score = boost * idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    if score > best.get(doc_id, 0.0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] += score
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [doc_id for doc_id, _ in ranked]
+
+
+class MemoryBackend(SearchBackend):
+    # Each worker keeps its own index. Writes in this process update it in
+    # place; other workers' writes move the shared version, and the index is
+    # then rebuilt in the background while the current one keeps serving.
+    # max_age bounds how stale it gets when the versions store is per-process.
+    # Only the first search waits for a build.
+    name = "memory"
+
+    def __init__(self, app, max_age=300):
+        self.app = app
+        self.max_age = max_age
+        self.built_at = None
+        self.version = None
+        self.rebuilds = 0
+        self._index = InvertedIndex()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self._scheduled = False
+        self._lock = threading.RLock()
+        self._build_lock = threading.RLock()
+
+    @property
+    def versions(self):
+        return self.app.extensions["cache"].versions
+
+    def search(self, query, limit):
+        if self.built_at is None:
+            with self._build_lock:
+                # Requests that queued behind the first build take its result.
+                if self.built_at is None:
+                    self.rebuild()
+        else:
+            version = self.versions.get(VERSION_KEY)
+            if time.monotonic() - self.built_at > self.max_age or (version is not None and version != self.version):
+                self.schedule()
+        with self._lock:
+            return self._index.search(query, limit)
+
+    def _changed(self, apply):
+        self.versions.bump(VERSION_KEY)
+        version = self.versions.get(VERSION_KEY)
+        with self._lock:
+            if self.built_at is None:
+                return
+            apply(self._index)
+            # Only our own bump moved the version, so this worker is current.
+            if version is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+
+    def index(self, product):
+        fields = product_fields(product)
+        self._changed(lambda index: index.add(product.id, fields))
+
+    def remove(self, product_id):
+        self._changed(lambda index: index.remove(product_id))
+
+    def rebuild(self):
+        with self._build_lock, self.app.app_context():
+            # Read before loading, so a write landing mid-build triggers another pass.
+            version = self.versions.get(VERSION_KEY)
+            index = InvertedIndex()
+            for product in iter_catalog():
+                index.add(product.id, product_fields(product))
+            db.session.remove()
+            with self._lock:
+                self._index = index
+                self.version = version
+                self.built_at = time.monotonic()
+                self.rebuilds += 1
+            return len(index)
+
+    def schedule(self):
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.executor.submit(self._drain)
+
+    def _drain(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Search index rebuild failed")
+        finally:
+            with self._lock:
+                self._scheduled = False
+
+    def categories_changed(self):
+        # Category names are indexed with their products.
+        self.versions.bump(VERSION_KEY)
+        if self.built_at is not None:
+            self.schedule()
+
+
+class PostgresBackend(SearchBackend):
+    # The document expression must match ix_product_search_document (GIN) exactly.
+    name = "postgres"
+    document = (
+        "to_tsvector('simple', coalesce(p.name, '') || ' ' || coalesce(p.brand, '') "
+        "|| ' ' || coalesce(p.description, ''))"
+    )
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        tsquery = " | ".join(f"{term}:*" for term in terms)
+        statement = text(f"""
+            SELECT p.id FROM product p JOIN category c ON c.id = p.category_id
+            WHERE {self.document} @@ to_tsquery('simple', :q)
+               OR p.category_id IN (
+                    SELECT id FROM category WHERE to_tsvector('simple', name) @@ to_tsquery('simple', :q))
+            ORDER BY ts_rank({self.document} || to_tsvector('simple', c.name),
+                             to_tsquery('simple', :q)) DESC, p.id
+            LIMIT :limit
+        """)
+        return list(db.session.execute(statement, {"q": tsquery, "limit": limit}).scalars())
+
+
+class SqliteBackend(SearchBackend):
+    # product_fts and the triggers that keep it in step with product and
+    # category come from the migrations, so every write updates the index in
+    # its own transaction, bulk imports and deletes included.
+    name = "sqlite"
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"*' for term in terms)
+        statement = text(
+            "SELECT rowid FROM product_fts WHERE product_fts MATCH :q "
+            "ORDER BY bm25(product_fts, 3.0, 2.0, 2.0, 1.0), rowid LIMIT :limit"
+        )
+        return list(db.session.execute(statement, {"q": match, "limit": limit}).scalars())
+
+    def rebuild(self):
+        # Only needed to repair the table; the triggers keep it current.
+        db.session.execute(text("DELETE FROM product_fts"))
+        count = db.session.execute(text(
+            "INSERT INTO product_fts (rowid, name, brand, category, description) "
+            "SELECT p.id, p.name, p.brand, coalesce(c.name, ''), p.description "
+            "FROM product p LEFT JOIN category c ON c.id = p.category_id"
+        )).rowcount
+        db.session.commit()
+        return count
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "postgres": PostgresBackend,
+    "sqlite": SqliteBackend,
+}
+
+
+def create_backend(app):
+    name = app.config.get("SEARCH_BACKEND", "memory")
+    if name not in BACKENDS:
+        raise RuntimeError(f"Unknown SEARCH_BACKEND {name!r}")
+    if name == "memory":
+        return MemoryBackend(app, max_age=app.config.get("SEARCH_INDEX_MAX_AGE", 300))
+    return BACKENDS[name]()
+
+
+def get_backend():
+    return current_app.extensions["search"]
+
+
+def search_ids(query):
+    return get_backend().search(query, current_app.config.get("SEARCH_MAX_RESULTS", 500))
+
+
+def _on_product_saved(app, product, **extra):
+    app.extensions["search"].index(product)
+
+
+def _on_product_deleted(app, product_id, **extra):
+    app.extensions["search"].remove(product_id)
+
+
+def _on_categories_changed(app, **extra):
+    app.extensions["search"].categories_changed()
+
+
+search_cli = AppGroup("search", help="Manage the product search index.")
+
+
+@search_cli.command("rebuild")
+def rebuild_command():
+    backend = get_backend()
+    started = time.perf_counter()
+    count = backend.rebuild()
+    click.echo(f"Indexed {count} products with the {backend.name} backend "
+               f"in {time.perf_counter() - started:.2f}s")
+
+
+def init_app(app):
+    app.extensions["search"] = create_backend(app)
+    product_saved.connect(_on_product_saved, app)
+    product_deleted.connect(_on_product_deleted, app)
+    categories_changed.connect(_on_categories_changed, app)
+    app.cli.add_command(search_cli)
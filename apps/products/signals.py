@@ -0,0 +1,13 @@
+from blinker import Namespace
+
+
+catalog = Namespace()
+
+# Sent after the write is committed, with the app as sender.
+product_saved = catalog.signal("product-saved")
+product_deleted = catalog.signal("product-deleted")
+categories_changed = catalog.signal("categories-changed")
+
+# Sent after catalog writes with the URL paths whose HTTP-cached copies are now
+# stale; subscribers forward them to the CDN.
+http_purge = catalog.signal("http-purge")
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import db
+from apps.products import listing
+from apps.products.catalog import cached_categories
+from apps.products.signals import categories_changed, product_deleted, product_saved
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "dashboard"
+CARDS_PER_CATEGORY = 4
+
+
+class ImageCard:
+    __slots__ = ("url", "derivatives")
+
+    def __init__(self, url, derivatives):
+        self.url = url
+        self.derivatives = derivatives
+
+
+class ProductCard:
+    __slots__ = ("id", "name", "brand", "description", "price", "user_id", "category_id", "cover")
+
+    def __init__(self, id, name, brand, description, price, user_id, category_id, cover):
+        self.id = id
+        self.name = name
+        self.brand = brand
+        self.description = description
+        self.price = price
+        self.user_id = user_id
+        self.category_id = category_id
+        self.cover = cover
+
+    @classmethod
+    def from_product(cls, product):
+        cover = product.cover
+        return cls(
+            product.id, product.name, product.brand, product.description, product.price,
+            product.user_id, product.category_id,
+            ImageCard(cover.url, cover.derivatives) if cover is not None else None,
+        )
+
+
+class CategoryGroup:
+    __slots__ = ("category", "products")
+
+    def __init__(self, category, products):
+        self.category = category
+        self.products = products
+
+
+class DashboardSnapshot:
+    # The dashboard grid as plain records, swapped in whole so readers never
+    # lock. Writes in this process rebuild just the categories they touch;
+    # other workers notice the shared version move and rebuild everything. Past
+    # the TTL a rebuild runs in the background while the old grid is served,
+    # and past max_stale the request waits for a fresh one.
+
+    def __init__(self, app, ttl, max_stale, per_category=CARDS_PER_CATEGORY):
+        self.app = app
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.per_category = per_category
+        self.groups = None
+        self.version = None
+        self.built_at = 0.0
+        self.built_wall = None
+        self.rebuilds = 0
+        self.last_build_seconds = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dashboard-snapshot")
+        self._pending = set()
+        self._full = False
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()
+
+    @property
+    def versions(self):
+        return self.app.extensions["cache"].versions
+
+    def get(self):
+        groups = self.groups
+        age = time.monotonic() - self.built_at
+        if groups is None or age > self.max_stale:
+            with self._build_lock:
+                # Requests that queued behind the same rebuild take its result.
+                if self.groups is not None and time.monotonic() - self.built_at <= self.max_stale:
+                    return self.groups
+                return self.rebuild()
+        version = self.versions.get(VERSION_KEY)
+        if age > self.ttl or (version is not None and version != self.version):
+            self.schedule()
+        return groups
+
+    def _load(self, category_ids):
+        products = db.session.scalars(listing.top_products_statement(self.per_category, category_ids)).all()
+        cards = {}
+        for product in products:
+            cards.setdefault(product.category_id, []).append(ProductCard.from_product(product))
+        return cards
+
+    def rebuild(self, category_ids=None):
+        with self._build_lock, self.app.app_context():
+            started = time.perf_counter()
+            # Read before loading, so a write landing mid-build still triggers another pass.
+            version = self.versions.get(VERSION_KEY)
+            categories = cached_categories()
+            current = {group.category.id: group for group in self.groups or ()}
+            if category_ids is not None:
+                category_ids = set(category_ids) | {c.id for c in categories if c.id not in current}
+            cards = self._load(category_ids)
+            groups = []
+            for category in categories:
+                if category_ids is None or category.id in category_ids:
+                    groups.append(CategoryGroup(category, tuple(cards.get(category.id, ()))))
+                else:
+                    groups.append(current[category.id])
+            db.session.remove()
+            self.groups = tuple(groups)
+            self.rebuilds += 1
+            self.last_build_seconds = time.perf_counter() - started
+            if category_ids is None:
+                self.version = version
+                self.built_at = time.monotonic()
+                self.built_wall = time.time()
+            return self.groups
+
+    def schedule(self, category_ids=None):
+        with self._lock:
+            if category_ids is None:
+                self._full = True
+            else:
+                self._pending.update(category_ids)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.executor.submit(self._drain)
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                full, pending = self._full, self._pending
+                self._full, self._pending = False, set()
+                if not full and not pending:
+                    self._scheduled = False
+                    return
+            try:
+                self.rebuild(None if full else pending)
+            except Exception:
+                logger.exception("Dashboard snapshot rebuild failed")
+
+    def invalidate(self, category_ids=None):
+        self.versions.bump(VERSION_KEY)
+        version = self.versions.get(VERSION_KEY)
+        with self._lock:
+            # Only our own bump moved the version: the partial rebuild below
+            # brings this worker fully up to date, so no full pass is needed.
+            if category_ids is not None and self.version is not None and version == self.version + 1:
+                self.version = version
+            else:
+                category_ids = None
+        self.schedule(category_ids)
+
+    def refresh(self):
+        # Forced from the admin endpoint: rebuild here now, and move the shared
+        # version so the other workers follow.
+        self.versions.bump(VERSION_KEY)
+        return self.rebuild()
+
+    def product_changed(self, product_id, category_id=None):
+        groups = self.groups
+        if groups is None:
+            return
+        affected = set()
+        for group in groups:
+            ids = [card.id for card in group.products]
+            if product_id in ids:
+                affected.add(group.category.id)
+            elif group.category.id == category_id and (len(ids) < self.per_category or product_id < ids[-1]):
+                affected.add(category_id)
+        if category_id is not None and category_id not in {group.category.id for group in groups}:
+            affected = None
+        if affected is None or affected:
+            self.invalidate(affected)
+
+    def stats(self):
+        groups = self.groups or ()
+        return {
+            "built_at": self.built_wall,
+            "age_seconds": round(time.monotonic() - self.built_at, 3) if self.groups is not None else None,
+            "version": self.version,
+            "categories": len(groups),
+            "products": sum(len(group.products) for group in groups),
+            "rebuilds": self.rebuilds,
+            "last_build_ms": round(self.last_build_seconds * 1000, 2) if self.last_build_seconds else None,
+            "ttl": self.ttl,
+            "max_stale": self.max_stale,
+        }
+
+
+def get_snapshot():
+    return current_app.extensions["dashboard"]
+
+
+def _on_product_saved(app, product, **extra):
+    app.extensions["dashboard"].product_changed(product.id, product.category_id)
+
+
+def _on_product_deleted(app, product_id, **extra):
+    app.extensions["dashboard"].product_changed(product_id)
+
+
+def _on_categories_changed(app, **extra):
+    app.extensions["dashboard"].invalidate()
+
+
+def init_app(app):
+    app.extensions["dashboard"] = DashboardSnapshot(
+        app,
+        ttl=app.config.get("DASHBOARD_SNAPSHOT_TTL", 60),
+        max_stale=app.config.get("DASHBOARD_SNAPSHOT_MAX_STALE", 300),
+    )
+    product_saved.connect(_on_product_saved, app)
+    product_deleted.connect(_on_product_deleted, app)
+    categories_changed.connect(_on_categories_changed, app)
@@ -0,0 +1,348 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from flask import current_app
+from sqlalchemy import or_, update
+from app import db
+from models import ProductImage
+from apps.products.images import build_derivatives, eager_transformations
+from apps.products.signals import product_saved
+from instrumentation import external_call
+
+
+logger = logging.getLogger(__name__)
+
+
+class CloudinaryStorage:
+    name = "cloudinary"
+    # delete_resources takes at most this many public ids per call.
+    bulk_limit = 100
+
+    def __init__(self, timeout, credentials):
+        self.timeout = timeout
+        self.credentials = credentials
+        self._configured = False
+
+    def _sdk(self):
+        # The SDK pulls in requests/urllib3; cold starts that never upload skip it.
+        import cloudinary
+        if not self._configured:
+            cloudinary.config(**self.credentials)
+            self._configured = True
+        return cloudinary
+
+    def uploader(self):
+        self._sdk()
+        import cloudinary.uploader
+        return cloudinary.uploader
+
+    def admin_api(self):
+        self._sdk()
+        import cloudinary.api
+        return cloudinary.api
+
+    def upload(self, data, filename):
+        uploader = self.uploader()
+        with external_call("cloudinary.upload"):
+            result = uploader.upload(
+                BytesIO(data),
+                filename=filename,
+                timeout=self.timeout,
+                eager=[{"raw_transformation": t} for t in eager_transformations()],
+                eager_async=True,
+            )
+        return result["secure_url"], result["public_id"]
+
+    def destroy(self, public_id):
+        uploader = self.uploader()
+        with external_call("cloudinary.destroy"):
+            uploader.destroy(public_id, timeout=self.timeout)
+
+    def destroy_many(self, public_ids):
+        api = self.admin_api()
+        with external_call("cloudinary.delete_resources"):
+            result = api.delete_resources(list(public_ids), timeout=self.timeout)
+        failed = [public_id for public_id, status in result.get("deleted", {}).items()
+                  if status not in ("deleted", "not_found")]
+        if failed:
+            raise RuntimeError(f"Cloudinary kept {len(failed)} assets: {', '.join(failed[:10])}")
+
+    def list_assets(self):
+        api = self.admin_api()
+        cursor = None
+        while True:
+            with external_call("cloudinary.resources"):
+                page = api.resources(type="upload", max_results=500, next_cursor=cursor, timeout=self.timeout)
+            for resource in page.get("resources", []):
+                created = datetime.fromisoformat(resource["created_at"].replace("Z", "+00:00"))
+                yield resource["public_id"], created
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
+
+
+class LocalStorage:
+    # Offline stand-in: files land under static/uploads and are served by Flask.
+    name = "local"
+    bulk_limit = 1000
+
+    def __init__(self, root, url_prefix):
+        self.root = root
+        self.url_prefix = url_prefix
+        os.makedirs(root, exist_ok=True)
+
+    def upload(self, data, filename):
+        extension = os.path.splitext(filename or "")[1].lower() or ".jpg"
+        public_id = f"{uuid.uuid4().hex}{extension}"
+        with open(os.path.join(self.root, public_id), "wb") as handle:
+            handle.write(data)
+        return f"{self.url_prefix}/{public_id}", public_id
+
+    def destroy(self, public_id):
+        try:
+            os.remove(os.path.join(self.root, os.path.basename(public_id)))
+        except FileNotFoundError:
+            pass
+
+    def destroy_many(self, public_ids):
+        for public_id in public_ids:
+            self.destroy(public_id)
+
+    def list_assets(self):
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                yield entry.name, datetime.fromtimestamp(entry.stat().st_mtime, timezone.utc)
+
+
+def fail_stale_uploads(stale_after):
+    # The payload only lives in the memory of the worker that took the upload,
+    # so a row still pending long after every retry would have finished lost
+    # it with that worker; fail it so the owner can add the image again.
+    cutoff = datetime.now() - timedelta(seconds=stale_after)
+    result = db.session.execute(
+        update(ProductImage)
+        .where(ProductImage.status == "pending", or_(ProductImage.created_at.is_(None), ProductImage.created_at < cutoff))
+        .values(status="failed", error="Upload interrupted; please add the image again")
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+class UploadPipeline:
+    # Rows are committed as "pending" first; workers upload concurrently and
+    # finalize each row in their own app context, so no transaction is held open
+    # while Cloudinary is busy. Rows orphaned by a restart are swept at most
+    # every stale_after / 2 seconds. Inline (serverless), the request waits for
+    # the uploads and the sweep, since nothing may run after the response.
+
+    def __init__(self, app, storage, workers, retries, backoff, wait_timeout, stale_after, inline=False):
+        self.app = app
+        self.storage = storage
+        self.inline = inline
+        self.retries = retries
+        self.backoff = backoff
+        self.wait_timeout = wait_timeout
+        self.stale_after = stale_after
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-upload")
+        self._swept_at = None
+        self._lock = threading.Lock()
+
+    def submit(self, uploads):
+        futures = [self.executor.submit(self._run, image_id, data, filename)
+                   for image_id, data, filename in uploads]
+        self.sweep()
+        if self.inline:
+            wait(futures, timeout=self.wait_timeout)
+        return futures
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._swept_at is not None and now - self._swept_at < self.stale_after / 2:
+                return
+            self._swept_at = now
+        if self.inline:
+            self._sweep()
+        else:
+            self.executor.submit(self._sweep)
+
+    def _sweep(self):
+        with self.app.app_context():
+            try:
+                failed = fail_stale_uploads(self.stale_after)
+            except Exception:
+                logger.exception("Sweeping interrupted uploads failed")
+                return
+        if failed:
+            logger.warning("Marked %s interrupted uploads as failed", failed)
+
+    def upload(self, data, filename):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.storage.upload(data, filename)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                logger.warning("Upload of %s failed, retrying (%s/%s)", filename, attempt + 1, self.retries)
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _run(self, image_id, data, filename):
+        # The app context is pushed up front so storage calls are metered too;
+        # no session is opened until the upload has finished.
+        with self.app.app_context():
+            try:
+                url, public_id = self.upload(data, filename)
+                error = None
+            except Exception as e:
+                logger.exception("Upload of %s failed", filename)
+                url, public_id, error = "", "", str(e)
+            image = db.session.get(ProductImage, image_id)
+            if image is None:
+                if public_id:
+                    self.storage.destroy(public_id)
+                return
+            if error:
+                image.status = "failed"
+                image.error = error[:255]
+            else:
+                image.status = "ready"
+                image.url = url
+                image.public_id = public_id
+                image.derivatives = build_derivatives(url)
+            db.session.commit()
+            product_saved.send(self.app, product=image.product)
+
+
+class AssetCleanup:
+    # Remote deletes run after the rows are committed and off the request.
+    # Queued ids are gathered for up to `linger` seconds into batches of the
+    # storage's bulk limit, and batches are deleted concurrently. Ids that still
+    # fail after the retries are left for `flask images reconcile`.
+
+    def __init__(self, storage, workers, linger, retries, backoff):
+        self.storage = storage
+        self.linger = linger
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asset-cleanup")
+        self.queue = queue.Queue()
+        self._collector = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, public_ids):
+        public_ids = [public_id for public_id in public_ids if public_id]
+        if not public_ids:
+            return
+        with self._lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, name="asset-cleanup-queue", daemon=True)
+                self._collector.start()
+        for public_id in public_ids:
+            self.queue.put(public_id)
+
+    def _collect(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.storage.bulk_limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.executor.submit(self._destroy, batch)
+
+    def _destroy(self, batch):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.storage.destroy_many(batch)
+                    return
+                except Exception:
+                    if attempt == self.retries:
+                        logger.exception("Deleting %s assets failed; left for reconcile", len(batch))
+                        return
+                    time.sleep(self.backoff * 2 ** attempt)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def wait(self):
+        self.queue.join()
+
+
+def read_uploads(files):
+    # FileStorage streams die with the request, so payloads are read up front.
+    return [(f.filename, f.read()) for f in files or [] if f and f.filename]
+
+
+def create_pending_images(product, payloads):
+    images = []
+    for filename, _ in payloads:
+        image = ProductImage(url="", public_id="", status="pending", product=product)
+        db.session.add(image)
+        images.append(image)
+    return images
+
+
+def start_uploads(images, payloads):
+    pipeline = current_app.extensions["uploads"]
+    uploads = [(image.id, data, filename) for image, (filename, data) in zip(images, payloads)]
+    return pipeline.submit(uploads)
+
+
+def sweep_stale():
+    current_app.extensions["uploads"].sweep()
+
+
+def get_storage():
+    return current_app.extensions["uploads"].storage
+
+
+def get_cleanup():
+    return current_app.extensions["asset_cleanup"]
+
+
+def create_storage(app):
+    backend = app.config.get("IMAGE_STORAGE", "cloudinary")
+    if backend == "local":
+        root = app.config.get("IMAGE_STORAGE_PATH") or os.path.join(app.static_folder, "uploads")
+        return LocalStorage(root, app.static_url_path + "/uploads")
+    if backend != "cloudinary":
+        raise RuntimeError(f"Unknown IMAGE_STORAGE {backend!r}")
+    return CloudinaryStorage(
+        timeout=app.config.get("IMAGE_UPLOAD_TIMEOUT", 30),
+        credentials={
+            "cloud_name": app.config.get("CLOUDINARY_CLOUD_NAME"),
+            "api_key": app.config.get("CLOUDINARY_API_KEY"),
+            "api_secret": app.config.get("CLOUDINARY_API_SECRET"),
+        },
+    )
+
+
+def init_app(app):
+    app.extensions["uploads"] = UploadPipeline(
+        app,
+        create_storage(app),
+        workers=app.config.get("IMAGE_UPLOAD_WORKERS", 4),
+        retries=app.config.get("IMAGE_UPLOAD_RETRIES", 2),
+        backoff=app.config.get("IMAGE_UPLOAD_BACKOFF", 0.5),
+        wait_timeout=app.config.get("IMAGE_UPLOAD_TIMEOUT", 30),
+        stale_after=app.config.get("IMAGE_UPLOAD_STALE_AFTER", 600),
+        inline=app.config.get("IMAGE_UPLOAD_MODE") == "inline",
+    )
+    app.extensions["asset_cleanup"] = AssetCleanup(
+        app.extensions["uploads"].storage,
+        workers=app.config.get("IMAGE_CLEANUP_WORKERS", 4),
+        linger=app.config.get("IMAGE_CLEANUP_LINGER", 2.0),
+        retries=app.config.get("IMAGE_UPLOAD_RETRIES", 2),
+        backoff=app.config.get("IMAGE_UPLOAD_BACKOFF", 0.5),
+    )
@@ -0,0 +1,54 @@
+import asyncio
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from app import app, db
+
+# uvicorn asgi:application --workers 4
+#
+# The same Flask app from create_app, behind an ASGI server. Set ASYNC_VIEWS=1
+# to also serve the async views on the async engine.
+
+
+class Application:
+    # asgiref runs every WSGI call on one shared thread, which would serialize
+    # the whole process. A ThreadSensitiveContext per request gives each its
+    # own thread instead, and at most ASGI_THREADS run at once.
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.slots = None
+
+    def _start(self):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.flask_app.config.get("ASGI_THREADS", 8))
+
+    def _stop(self):
+        with self.flask_app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        if "async_db" in self.flask_app.extensions:
+            self.flask_app.extensions["async_db"].dispose()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        # Servers started with lifespan off never send startup.
+        self._start()
+        async with self.slots, ThreadSensitiveContext():
+            await self.wsgi(scope, receive, send)
+
+
+application = Application(app)
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from flask import current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from pooling import install_statement_timeout
+
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite", "mysql": "aiomysql"}
+
+
+def async_url(uri):
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver known for {backend!r} databases")
+    url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    if backend == "postgresql" and "sslmode" in url.query:
+        # libpq spells it sslmode, asyncpg spells it ssl; channel_binding has no equivalent.
+        sslmode = url.query["sslmode"]
+        url = url.difference_update_query(["sslmode", "channel_binding"]).update_query_dict({"ssl": sslmode})
+    return url
+
+
+def async_engine_options(config, url):
+    if url.get_backend_name() == "sqlite":
+        return {}
+    if config.get("DB_POOL_PROFILE") == "serverless":
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": config.get("DB_POOL_SIZE", 5),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 5),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 10),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+    }
+
+
+class AsyncDatabase:
+    # Flask runs each async view on a short-lived event loop of its own, and
+    # asyncpg connections belong to the loop that opened them. The engines and
+    # their pools therefore live on one long-running loop per process; views
+    # hand it coroutines and await the result. Engines are keyed like the sync
+    # binds: None for the primary, "replica_<n>" for the replicas.
+
+    def __init__(self, urls, engine_options, statement_timeout_ms=None):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        self.engines = {key: create_async_engine(url, **engine_options(url)) for key, url in urls.items()}
+        for engine in self.engines.values():
+            install_statement_timeout(engine.sync_engine, statement_timeout_ms)
+        self.sessions = async_sessionmaker(expire_on_commit=False)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-db", daemon=True)
+        self._thread.start()
+
+    async def _run(self, fn, bind, args, kwargs):
+        async with self.sessions(bind=self.engines[bind]) as session:
+            return await fn(session, *args, **kwargs)
+
+    def submit(self, fn, *args, bind=None, **kwargs):
+        return asyncio.run_coroutine_threadsafe(self._run(fn, bind, args, kwargs), self.loop)
+
+    async def run(self, fn, *args, bind=None, **kwargs):
+        # Each call gets its own session, so independent queries can be gathered.
+        return await asyncio.wrap_future(self.submit(fn, *args, bind=bind, **kwargs))
+
+    async def _dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+
+    def dispose(self):
+        asyncio.run_coroutine_threadsafe(self._dispose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def get_async_db():
+    return current_app.extensions["async_db"]
+
+
+def init_app(app):
+    if not app.config.get("ASYNC_VIEWS"):
+        return
+    try:
+        import asgiref  # noqa: F401
+    except ImportError:
+        raise RuntimeError("ASYNC_VIEWS needs Flask's async extra: pip install 'flask[async]'")
+    urls = {None: async_url(app.config.get("ASYNC_DATABASE_URI") or app.config["SQLALCHEMY_DATABASE_URI"])}
+    for key, uri in (app.config.get("SQLALCHEMY_BINDS") or {}).items():
+        if key and key.startswith("replica_"):
+            urls[key] = async_url(uri)
+    app.extensions["async_db"] = AsyncDatabase(
+        urls,
+        lambda url: async_engine_options(app.config, url),
+        statement_timeout_ms=app.config.get("DB_STATEMENT_TIMEOUT_MS"),
+    )
@@ -0,0 +1,144 @@
+"""Measure `flask catalog import` / `flask catalog export` throughput in rows per second.
+
+    python benchmarks/catalog_import_benchmark.py --rows 50000 --batch-sizes 500,1000,5000 \\
+        --formats csv,ndjson --output catalog_io.json
+
+A supplier-style file (name, price, brand, category, description, two Cloudinary image
+URLs per row, 40 categories) is generated once per format. For every batch size a
+freshly migrated database receives the whole file through the real CLI command, then
+the catalog is exported back out. Images are stored by URL; --upload-sample N also
+times N rows through --upload against local storage.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix="catalog-bench-")
+DB_PATH = os.path.join(WORKDIR, "catalog.db")
+os.environ["DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["IMAGE_STORAGE"] = "local"
+os.environ["IMAGE_STORAGE_PATH"] = os.path.join(WORKDIR, "uploads")
+os.environ["DB_REPLICA_URIS"] = ""
+os.environ["SEARCH_BACKEND"] = "memory"
+
+from flask_migrate import Migrate, upgrade  # noqa: E402
+from app import app, db  # noqa: E402
+from models import User  # noqa: E402
+
+WORDS = "classic slim leather cotton wireless smart travel vintage sport compact".split()
+NOUNS = "shirt jacket shoes watch headphones lamp mug backpack chair desk kettle speaker".split()
+OWNER = "supplier@bench.io"
+
+Migrate(app, db)
+
+
+def write_catalog(path, fmt, rows, images=None):
+    rng = random.Random(rows)
+    columns = ("name", "price", "brand", "category", "description", "images")
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=columns) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for i in range(rows):
+            urls = images or [f"https://res.cloudinary.com/bench/image/upload/v1/sku{i}_{n}.jpg" for n in range(2)]
+            row = {
+                "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {NOUNS[i % len(NOUNS)]}",
+                "price": rng.randrange(100, 50000),
+                "brand": f"brand{rng.randrange(200)}",
+                "category": f"{NOUNS[i % len(NOUNS)]}-{i % 40 // len(NOUNS)}",
+                "description": " ".join(rng.choices(WORDS, k=20)),
+                "images": "|".join(urls) if writer else urls,
+            }
+            if writer:
+                writer.writerow(row)
+            else:
+                handle.write(json.dumps(row) + "\n")
+
+
+def reset_database():
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    with app.app_context():
+        upgrade()
+        db.session.add(User(username="supplier", email=OWNER, password="x"))
+        db.session.commit()
+
+
+def invoke(*args):
+    runner = app.test_cli_runner()
+    started = time.perf_counter()
+    result = runner.invoke(args=list(args))
+    elapsed = time.perf_counter() - started
+    if result.exit_code != 0:
+        raise RuntimeError(f"{' '.join(args)} failed: {result.output}{result.exception or ''}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch-sizes", default="500,1000,5000")
+    parser.add_argument("--formats", default="csv,ndjson")
+    parser.add_argument("--upload-sample", type=int, default=0, help="rows to time through --upload")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = []
+    for fmt in args.formats.split(","):
+        source = os.path.join(WORKDIR, f"catalog.{fmt}")
+        write_catalog(source, fmt, args.rows)
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            reset_database()
+            imported = invoke("catalog", "import", source, "--owner", OWNER, "--batch-size", str(batch_size))
+            exported = invoke("catalog", "export", os.path.join(WORKDIR, f"export.{fmt}"),
+                              "--batch-size", str(batch_size))
+            results.append({
+                "format": fmt,
+                "batch_size": batch_size,
+                "import_seconds": round(imported, 3),
+                "import_rows_per_second": round(args.rows / imported, 1),
+                "export_seconds": round(exported, 3),
+                "export_rows_per_second": round(args.rows / exported, 1),
+            })
+            print(f"{fmt:>7} batch {batch_size:>6}: import {args.rows / imported:>9.0f} rows/s, "
+                  f"export {args.rows / exported:>9.0f} rows/s")
+
+    if args.upload_sample:
+        image_root = os.path.join(WORKDIR, "images")
+        os.makedirs(image_root, exist_ok=True)
+        for n in range(2):
+            with open(os.path.join(image_root, f"img{n}.jpg"), "wb") as handle:
+                handle.write(os.urandom(200_000))
+        source = os.path.join(WORKDIR, "upload.csv")
+        write_catalog(source, "csv", args.upload_sample, images=["img0.jpg", "img1.jpg"])
+        reset_database()
+        elapsed = invoke("catalog", "import", source, "--owner", OWNER, "--upload", "--image-root", image_root)
+        results.append({
+            "format": "csv", "upload": True, "rows": args.upload_sample,
+            "import_seconds": round(elapsed, 3),
+            "import_rows_per_second": round(args.upload_sample / elapsed, 1),
+        })
+        print(f"    csv upload: {args.upload_sample / elapsed:.0f} rows/s (2 images per row, local storage)")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(), "rows": args.rows},
+                "results": results,
+            }, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Load-test the shopper funnel at several catalog sizes and compare with a baseline.
+
+    python benchmarks/funnel_benchmark.py --sizes 1000,10000 --processes 4 --funnels 25 \\
+        --output results.json --baseline benchmarks/baseline.json
+
+For every size a fresh SQLite database is migrated and seeded (images point at
+Cloudinary-style URLs and uploads go to local storage, so nothing leaves the machine).
+One warm-up funnel runs through the test client, then --processes workers each run
+--funnels complete funnels as their own user:
+
+    login -> dashboard -> search -> display_product -> add_to_cart -> cart_items -> checkout
+
+Throughput and p50/p95/p99 latency are reported per step and written as JSON. With
+--baseline, a step whose p95 is more than --tolerance slower exits with status 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix="funnel-bench-")
+DB_PATH = os.path.join(WORKDIR, "funnel.db")
+os.environ["DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["IMAGE_STORAGE"] = "local"
+os.environ["IMAGE_STORAGE_PATH"] = os.path.join(WORKDIR, "uploads")
+os.environ["DB_REPLICA_URIS"] = ""
+
+from flask_migrate import Migrate, upgrade  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import app, db  # noqa: E402
+from models import Category, Product, ProductImage, User  # noqa: E402
+
+STEPS = ("login", "dashboard", "search", "display_product", "add_to_cart", "cart_items", "checkout")
+PASSWORD = "bench-password"
+WORDS = "classic slim leather cotton wireless smart travel vintage sport compact".split()
+NOUNS = "shirt jacket shoes watch headphones lamp mug backpack chair desk kettle speaker".split()
+
+app.config["WTF_CSRF_ENABLED"] = False
+Migrate(app, db)
+
+
+def reset_database():
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    with app.app_context():
+        upgrade()
+
+
+def seed(products, users, images_per_product=2, batch=5000):
+    rng = random.Random(products)
+    # One hash for everyone: seeding should not spend minutes in the KDF.
+    password = generate_password_hash(PASSWORD)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"username": f"shopper{i}", "email": f"shopper{i}@bench.io", "password": password, "is_admin": False}
+            for i in range(users)
+        ])
+        db.session.execute(Category.__table__.insert(), [{"name": noun} for noun in NOUNS])
+        for start in range(0, products, batch):
+            rows = range(start, min(products, start + batch))
+            db.session.execute(Product.__table__.insert(), [{
+                "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {NOUNS[i % len(NOUNS)]}",
+                "price": rng.randrange(100, 50000),
+                "description": " ".join(rng.choices(WORDS, k=12)),
+                "user_id": rng.randrange(1, users + 1),
+                "brand": f"brand{rng.randrange(200)}",
+                "category_id": i % len(NOUNS) + 1,
+            } for i in rows])
+            db.session.execute(ProductImage.__table__.insert(), [{
+                "url": f"https://res.cloudinary.com/bench/image/upload/v1/p{i + 1}_{n}.jpg",
+                "public_id": f"p{i + 1}_{n}",
+                "product_id": i + 1,
+            } for i in rows for n in range(images_per_product)])
+        db.session.commit()
+
+
+def run_funnel(client, shopper, products, rng, record):
+    product_id = rng.randrange(1, products + 1)
+
+    def step(name, method, url, expect=(200, 302), **kwargs):
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        record(name, time.perf_counter() - started, response.status_code in expect)
+        return response
+
+    step("login", "POST", "/login", data={"email": f"shopper{shopper}@bench.io", "password": PASSWORD})
+    step("dashboard", "GET", "/dashboard")
+    step("search", "GET", f"/search?q={rng.choice(WORDS)}+{rng.choice(NOUNS)}")
+    step("display_product", "GET", f"/display-product/{product_id}")
+    step("add_to_cart", "POST", f"/cart/{product_id}", data={"quantity": rng.randrange(1, 4)})
+    step("cart_items", "GET", f"/cart-items/{shopper + 1}")
+    step("checkout", "POST", "/checkout", data={"address": "1 Bench Street", "contact": "555-0100", "message": ""})
+    client.get("/logout")
+
+
+def worker(args):
+    shopper, funnels, products, seed_value = args
+    # Forked from the parent: never reuse its pooled SQLite connections.
+    with app.app_context():
+        db.engine.dispose(close=False)
+    rng = random.Random(seed_value)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+
+    def record(name, seconds, ok):
+        samples[name].append(seconds)
+        errors[name] += not ok
+
+    client = app.test_client()
+    for _ in range(funnels):
+        run_funnel(client, shopper, products, rng, record)
+    return dict(samples), dict(errors)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, errors, wall):
+    summary = {}
+    for name in STEPS:
+        values = samples.get(name, [])
+        if not values:
+            continue
+        summary[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "rps": round(len(values) / wall, 2),
+            "p50_ms": round(statistics.median(values) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return summary
+
+
+def run_size(size, users, processes, funnels):
+    reset_database()
+    seed(size, users)
+
+    warmup = app.test_client()
+    run_funnel(warmup, 0, size, random.Random(0), lambda *a: None)
+
+    jobs = [(shopper, funnels, size, shopper) for shopper in range(1, processes + 1)]
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    started = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        for worker_samples, worker_errors in pool.map(worker, jobs):
+            for name, values in worker_samples.items():
+                samples[name].extend(values)
+            for name, count in worker_errors.items():
+                errors[name] += count
+    wall = time.perf_counter() - started
+    total = sum(len(values) for values in samples.values())
+    return {"wall_seconds": round(wall, 3), "rps": round(total / wall, 2), "steps": summarize(samples, errors, wall)}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, result in results.items():
+        for name, stats in result["steps"].items():
+            previous = baseline.get("results", {}).get(size, {}).get("steps", {}).get(name)
+            if previous and stats["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{size} products, {name}: p95 {previous['p95_ms']} -> {stats['p95_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--funnels", type=int, default=20, help="funnels per process")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.processes >= args.users:
+        parser.error("--users must be larger than --processes (each process shops as its own user)")
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        result = results[str(size)] = run_size(size, args.users, args.processes, args.funnels)
+        print(f"\n{size} products: {result['rps']} req/s over {result['wall_seconds']} s")
+        print(f"{'step':>16} {'reqs':>6} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, stats in result["steps"].items():
+            print(f"{name:>16} {stats['requests']:>6} {stats['errors']:>6} {stats['rps']:>8} "
+                  f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processes": args.processes,
+            "funnels_per_process": args.funnels,
+            "users": args.users,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Compare the rollup-backed sales report with aggregating the order tables directly.
+
+    python benchmarks/sales_analytics_benchmark.py --orders 10000,100000,500000 --output analytics.json
+
+For each history size a fresh database gets that many orders (three lines each,
+spread over a year, 2000 products in 40 categories and 200 brands), `flask analytics
+backfill` builds the rollups, and the same 30-day "revenue by category" question is
+answered both from the rollups and by grouping order_item rows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix="analytics-bench-")
+DB_PATH = os.path.join(WORKDIR, "analytics.db")
+os.environ["DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["DB_REPLICA_URIS"] = ""
+os.environ["SEARCH_BACKEND"] = "memory"
+
+from flask_migrate import Migrate, upgrade  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from app import app, db  # noqa: E402
+from models import Category, Order, OrderItem, Product, User  # noqa: E402
+from apps.products import analytics  # noqa: E402
+
+PRODUCTS = 2000
+CATEGORIES = 40
+CHUNK = 5000
+
+Migrate(app, db)
+
+
+def seed(orders):
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    rng = random.Random(orders)
+    with app.app_context():
+        upgrade()
+        user = User(username="bench", email="bench@bench.io", password="x")
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(insert(Category), [{"name": f"category {n}"} for n in range(CATEGORIES)])
+        db.session.execute(insert(Product), [
+            {
+                "name": f"product {n}", "price": rng.randrange(100, 5000), "description": "",
+                "user_id": user.id, "brand": f"brand{n % 200}", "category_id": n % CATEGORIES + 1,
+            }
+            for n in range(PRODUCTS)
+        ])
+        prices = dict(db.session.execute(select(Product.id, Product.price)).all())
+        start = datetime.now() - timedelta(days=365)
+        for offset in range(0, orders, CHUNK):
+            count = min(CHUNK, orders - offset)
+            lines = [[(rng.randrange(1, PRODUCTS + 1), rng.randrange(1, 4)) for _ in range(3)] for _ in range(count)]
+            db.session.execute(insert(Order), [
+                {
+                    "id": offset + n + 1, "user_id": user.id, "address": "a", "contact_no": "1", "message": "",
+                    "checkout_time": start + timedelta(seconds=rng.randrange(365 * 86400)),
+                    "total_price": sum(prices[pid] * qty for pid, qty in lines[n]),
+                }
+                for n in range(count)
+            ])
+            db.session.execute(insert(OrderItem), [
+                {"order_id": offset + n + 1, "product_id": pid, "product_name": f"product {pid - 1}",
+                 "price": prices[pid], "quantity": qty}
+                for n in range(count) for pid, qty in lines[n]
+            ])
+            db.session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def direct_report(date_from, date_to):
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    revenue = func.sum(OrderItem.price * OrderItem.quantity)
+    return db.session.execute(
+        select(Product.category_id, revenue, func.sum(OrderItem.quantity), func.count(func.distinct(Order.id)))
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.checkout_time >= start, Order.checkout_time < end)
+        .group_by(Product.category_id)
+        .order_by(revenue.desc())
+        .limit(10)
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    date_to = date.today()
+    date_from = date_to - timedelta(days=29)
+    results = []
+    for orders in (int(n) for n in args.orders.split(",")):
+        seed(orders)
+        with app.app_context():
+            started = time.perf_counter()
+            analytics.backfill(batch_size=2000)
+            backfill_seconds = time.perf_counter() - started
+            rollup_ms = timed(lambda: analytics.report(date_from, date_to, "category", "day", 10), args.repeat)
+            direct_ms = timed(lambda: direct_report(date_from, date_to), max(1, args.repeat // 4))
+        results.append({
+            "orders": orders,
+            "backfill_seconds": round(backfill_seconds, 2),
+            "rollup_report_ms": rollup_ms,
+            "direct_query_ms": direct_ms,
+        })
+        print(f"{orders:>8} orders: backfill {backfill_seconds:7.1f}s, rollup report {rollup_ms:7.2f} ms, "
+              f"direct query {direct_ms:9.2f} ms")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine()},
+                "results": results,
+            }, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
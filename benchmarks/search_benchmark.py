@@ -0,0 +1,110 @@
+"""Compare product search latency: the old ILIKE scan against the search backends.
+
+    python benchmarks/search_benchmark.py --sizes 10000,100000,1000000
+
+Each catalog size is seeded into a fresh SQLite file; results are printed as a table.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp(prefix="search-bench-")
+DB_PATH = os.path.join(WORKDIR, "catalog.db")
+os.environ["DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import text  # noqa: E402
+from app import app, db  # noqa: E402
+from models import Category, Product, User  # noqa: E402
+from apps.products.search import MemoryBackend, SqliteBackend  # noqa: E402
+
+SYLLABLES = "ka lo mi ra te su no vi ze pa do ri fe gu ha".split()
+NOUNS = "shirt jacket shoes watch headphones lamp mug backpack chair desk kettle speaker".split()
+BRANDS = [f"brand{i}" for i in range(200)]
+QUERIES = ["kalo jacket", "mira", "te", "suno watch", "brand42", "vize mug", "rafe"]
+
+
+def vocabulary(size=3000):
+    rng = random.Random(0)
+    words = {"".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))) for _ in range(size * 2)}
+    return sorted(words)[:size]
+
+
+WORDS = vocabulary()
+# Zipf-ish weights so a few words are common and most are rare, like real product copy.
+WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+
+
+def seed(size, batch=20000):
+    db.drop_all()
+    db.create_all()
+    # The migrations own this table (with its triggers); the benchmark times a full rebuild instead.
+    db.session.execute(text("DROP TABLE IF EXISTS product_fts"))
+    db.session.execute(text("CREATE VIRTUAL TABLE product_fts USING fts5(name, brand, category, description)"))
+    rng = random.Random(size)
+    db.session.execute(User.__table__.insert(), [{"username": "bench", "email": "b@x.io", "password": "-"}])
+    db.session.execute(Category.__table__.insert(), [{"name": noun} for noun in NOUNS])
+    for start in range(0, size, batch):
+        rows = []
+        for _ in range(min(batch, size - start)):
+            noun_index = rng.randrange(len(NOUNS))
+            rows.append({
+                "name": " ".join(rng.choices(WORDS, WEIGHTS, k=2) + [NOUNS[noun_index]]),
+                "price": rng.randrange(100, 50000),
+                "description": " ".join(rng.choices(WORDS, WEIGHTS, k=12)),
+                "user_id": 1,
+                "brand": rng.choice(BRANDS),
+                "category_id": noun_index + 1,
+            })
+        db.session.execute(Product.__table__.insert(), rows)
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def ilike(query, limit):
+    return [p.id for p in Product.query.filter(Product.name.ilike(f"%{query}%")).limit(limit)]
+
+
+def run(size, repeat, limit):
+    seed(size)
+    results = {}
+    backends = {"ilike": None, "memory": MemoryBackend(app, max_age=float("inf")), "sqlite-fts5": SqliteBackend()}
+    for name, backend in backends.items():
+        build_ms = timed(backend.rebuild, 1) if backend else 0.0
+        search = backend.search if backend else ilike
+        per_query = [timed(lambda q=q: search(q, limit), repeat) for q in QUERIES]
+        results[name] = (build_ms, statistics.median(per_query), max(per_query))
+    db.session.remove()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'products':>10} {'backend':>12} {'build ms':>10} {'median ms':>10} {'worst ms':>10}")
+    with app.app_context():
+        for size in (int(s) for s in args.sizes.split(",")):
+            for name, (build_ms, median_ms, worst_ms) in run(size, args.repeat, args.limit).items():
+                print(f"{size:>10} {name:>12} {build_ms:>10.1f} {median_ms:>10.2f} {worst_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Compare concurrent-user capacity per core of the WSGI and ASGI serving modes.
+
+    python benchmarks/serving_benchmark.py --modes wsgi,asgi,asgi-async --users 1,8,32,64 \\
+        --seconds 10 --slo-ms 250 --output serving.json
+
+Each mode runs as its own server process pinned to one CPU (--core), against the
+same seeded database:
+
+    wsgi        the app as deployed today, on Werkzeug's threaded WSGI server
+    asgi        asgi.py under uvicorn (request threads from ASGI_THREADS)
+    asgi-async  asgi.py under uvicorn with ASYNC_VIEWS=1 (async engine views)
+
+For every --users level that many simulated shoppers log in, then loop over
+dashboard -> display_product -> shop on keep-alive connections for --seconds.
+A mode's capacity is the highest level whose p95 stays under --slo-ms without
+errors. By default a temporary SQLite database is used; pass --database-uri to
+point at a throwaway Postgres database (it is migrated and seeded) so time spent
+waiting on the network is part of the picture.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="serving-bench-")
+PASSWORD = "bench-password"
+STEPS = ("dashboard", "display_product", "shop")
+MODES = ("wsgi", "asgi", "asgi-async")
+WORDS = "classic slim leather cotton wireless smart travel vintage sport compact".split()
+NOUNS = "shirt jacket shoes watch headphones lamp mug backpack chair desk kettle speaker".split()
+CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+WSGI_SERVER = """
+import sys
+from werkzeug.serving import make_server
+from app import app
+make_server("127.0.0.1", int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+
+def server_env(database_uri, mode):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URI": database_uri,
+        "SECRET_KEY": env.get("SECRET_KEY", "bench"),
+        "IMAGE_STORAGE": "local",
+        "IMAGE_STORAGE_PATH": os.path.join(WORKDIR, "uploads"),
+        "DB_REPLICA_URIS": "",
+        "ASYNC_VIEWS": "1" if mode == "asgi-async" else "0",
+        # Every simulated shopper logs in from 127.0.0.1.
+        "LOGIN_IP_BURST": "100000",
+        "LOGIN_IP_PER_MINUTE": "100000",
+    })
+    return env
+
+
+def prepare_database(database_uri, products, users):
+    os.environ.update(server_env(database_uri, "wsgi"))
+    from flask_migrate import Migrate, upgrade
+    from werkzeug.security import generate_password_hash
+    from app import app, db
+    from models import Category, Product, ProductImage, User
+
+    Migrate(app, db)
+    rng = random.Random(products)
+    with app.app_context():
+        upgrade()
+        password = generate_password_hash(PASSWORD)
+        db.session.execute(User.__table__.insert(), [
+            {"username": f"shopper{i}", "email": f"shopper{i}@bench.io", "password": password, "is_admin": False}
+            for i in range(users)
+        ])
+        db.session.execute(Category.__table__.insert(), [{"name": noun} for noun in NOUNS])
+        db.session.execute(Product.__table__.insert(), [{
+            "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {NOUNS[i % len(NOUNS)]}",
+            "price": rng.randrange(100, 50000),
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "user_id": rng.randrange(1, users + 1),
+            "brand": f"brand{rng.randrange(200)}",
+            "category_id": i % len(NOUNS) + 1,
+        } for i in range(products)])
+        db.session.execute(ProductImage.__table__.insert(), [{
+            "url": f"https://res.cloudinary.com/bench/image/upload/v1/p{i + 1}_{n}.jpg",
+            "public_id": f"p{i + 1}_{n}",
+            "product_id": i + 1,
+        } for i in range(products) for n in range(2)])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def start_server(mode, port, database_uri, core, threads):
+    env = server_env(database_uri, mode)
+    env["ASGI_THREADS"] = str(threads)
+    if mode == "wsgi":
+        command = [sys.executable, "-c", WSGI_SERVER, str(port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "asgi:application", "--port", str(port),
+                   "--log-level", "warning", "--no-access-log"]
+    pin = (lambda: os.sched_setaffinity(0, {core})) if hasattr(os, "sched_setaffinity") else None
+    process = subprocess.Popen(command, cwd=ROOT, env=env, preexec_fn=pin,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited: {process.stderr.read().decode()[-2000:]}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/login")
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not come up on port {port}")
+
+
+class Shopper:
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.cookies = {}
+
+    def request(self, method, url, body=None):
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())}
+        if body is not None:
+            body = urlencode(body)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        self.connection.request(method, url, body=body, headers=headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, value = header.split(";", 1)[0].partition("=")
+            self.cookies[name] = value
+        return response.status, data
+
+    def login(self, email):
+        status, page = self.request("GET", "/login")
+        token = CSRF.search(page.decode())
+        status, _ = self.request("POST", "/login", {
+            "csrf_token": token.group(1) if token else "", "email": email, "password": PASSWORD,
+        })
+        if status != 302:
+            raise RuntimeError(f"login for {email} answered {status}")
+
+
+def run_level(port, users, seconds, products):
+    shoppers = []
+    for i in range(users):
+        shopper = Shopper(port)
+        shopper.login(f"shopper{i}@bench.io")
+        shoppers.append(shopper)
+
+    samples = {name: [] for name in STEPS}
+    errors = {name: 0 for name in STEPS}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def loop(shopper, rng):
+        while time.perf_counter() < stop_at:
+            for name, url in (("dashboard", "/dashboard"),
+                              ("display_product", f"/display-product/{rng.randrange(1, products + 1)}"),
+                              ("shop", "/shop")):
+                started = time.perf_counter()
+                try:
+                    status, _ = shopper.request("GET", url)
+                except (OSError, http.client.HTTPException):
+                    status = None
+                    shopper.connection.close()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples[name].append(elapsed)
+                    errors[name] += status != 200
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=loop, args=(shopper, random.Random(i))) for i, shopper in enumerate(shoppers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    every = sorted(value for values in samples.values() for value in values)
+    total_errors = sum(errors.values())
+    return {
+        "users": users,
+        "requests": len(every),
+        "errors": total_errors,
+        "rps": round(len(every) / wall, 2),
+        "p50_ms": round(statistics.median(every) * 1000, 2) if every else None,
+        "p95_ms": round(every[int(0.95 * (len(every) - 1))] * 1000, 2) if every else None,
+        "steps": {
+            name: {
+                "requests": len(values),
+                "errors": errors[name],
+                "p95_ms": round(sorted(values)[int(0.95 * (len(values) - 1))] * 1000, 2) if values else None,
+            }
+            for name, values in samples.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--users", default="1,8,32,64", help="concurrency levels")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32, help="ASGI_THREADS for the asgi modes")
+    parser.add_argument("--core", type=int, default=0, help="CPU the server is pinned to")
+    parser.add_argument("--slo-ms", type=float, default=250)
+    parser.add_argument("--database-uri", help="throwaway database to migrate and seed")
+    parser.add_argument("--port", type=int, default=8731)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    modes = args.modes.split(",")
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.users.split(",")]
+    database_uri = args.database_uri or f"sqlite:///{os.path.join(WORKDIR, 'serving.db')}"
+    prepare_database(database_uri, args.products, max(levels))
+
+    results = {}
+    for offset, mode in enumerate(modes):
+        process = start_server(mode, args.port + offset, database_uri, args.core, args.threads)
+        try:
+            runs = [run_level(args.port + offset, users, args.seconds, args.products) for users in levels]
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        within = [run["users"] for run in runs if not run["errors"] and run["p95_ms"] <= args.slo_ms]
+        results[mode] = {"capacity_users_per_core": max(within, default=0), "levels": runs}
+        print(f"\n{mode}: {results[mode]['capacity_users_per_core']} concurrent users per core "
+              f"within p95 {args.slo_ms:g} ms")
+        print(f"{'users':>6} {'reqs':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for run in runs:
+            print(f"{run['users']:>6} {run['requests']:>7} {run['errors']:>6} {run['rps']:>8} "
+                  f"{run['p50_ms']:>8} {run['p95_ms']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "database": database_uri.split(":", 1)[0],
+                    "seconds": args.seconds,
+                    "products": args.products,
+                    "asgi_threads": args.threads,
+                    "slo_ms": args.slo_ms,
+                },
+                "results": results,
+            }, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
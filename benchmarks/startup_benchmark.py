@@ -0,0 +1,86 @@
+"""Measure cold start: importing app.py plus the first request, in fresh processes.
+
+    python benchmarks/startup_benchmark.py --runs 15 --path /shop --max-ms 1500
+
+Every run is a new interpreter, like a serverless cold start. The schema is created
+once up front with `flask db upgrade`, so runs only pay for what create_app does.
+Exits non-zero when the median cold start exceeds --max-ms, so CI can catch regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(path):
+    started = time.perf_counter()
+    from app import app
+    imported = time.perf_counter()
+    response = app.test_client().get(path)
+    finished = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_request_ms": (finished - imported) * 1000,
+        "status": response.status_code,
+        "modules": len(sys.modules),
+    }))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/login")
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        child(args.path)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        SECRET_KEY=os.environ.get("SECRET_KEY", "bench"),
+        FLASK_APP="app",
+    )
+    subprocess.run([sys.executable, "-m", "flask", "db", "upgrade"], cwd=ROOT, env=env,
+                   check=True, capture_output=True)
+
+    results = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, __file__, "--child", "--path", args.path],
+                                cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["process_ms"] = (time.perf_counter() - started) * 1000
+        results.append(result)
+
+    print(f"{args.runs} cold starts of GET {args.path} (status {results[0]['status']}, "
+          f"{results[0]['modules']} modules loaded)")
+    print(f"{'phase':>18} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for phase in ("import_ms", "first_request_ms", "process_ms"):
+        samples = [r[phase] for r in results]
+        print(f"{phase:>18} {statistics.median(samples):>10.1f} {percentile(samples, 95):>10.1f} {max(samples):>10.1f}")
+
+    cold_start = statistics.median(r["import_ms"] + r["first_request_ms"] for r in results)
+    if args.max_ms is not None and cold_start > args.max_ms:
+        print(f"FAIL: median import + first request {cold_start:.1f} ms exceeds {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
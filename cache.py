@@ -0,0 +1,263 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVersions:
+    # Only this process sees the bumps; fine for a single worker. Counters
+    # restart at 0 with the process, so validators built from them carry a
+    # per-process epoch and are never mistaken for another process's.
+    shared = False
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._versions.get(key, 0)
+
+    def bump(self, key):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+
+class FileVersions:
+    # Local stand-in for a shared store: every worker on the host reads the
+    # same files, each holding its key's counter as fixed-width digits. Bumps
+    # serialise on a file lock and overwrite the digits in place, so readers
+    # never need the lock.
+    epoch = ""
+    shared = True
+    WIDTH = 20
+
+    def __init__(self, path):
+        if fcntl is None:
+            raise RuntimeError("CACHE_BACKEND=file needs a POSIX host (fcntl)")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key.replace("/", "_"))
+
+    def _read(self, fd):
+        head = os.pread(fd, self.WIDTH, 0)
+        # Files written before the counters hold one byte per bump.
+        return int(head) if head.isdigit() else os.fstat(fd).st_size
+
+    def get(self, key):
+        try:
+            fd = os.open(self._file(key), os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+        try:
+            return self._read(fd)
+        finally:
+            os.close(fd)
+
+    def bump(self, key):
+        fd = os.open(self._file(key), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            version = self._read(fd) + 1
+            if os.fstat(fd).st_size > self.WIDTH:
+                os.ftruncate(fd, 0)
+            os.pwrite(fd, b"%0*d" % (self.WIDTH, version), 0)
+        finally:
+            os.close(fd)
+
+
+def redis_client(url):
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package installed")
+    return redis.Redis.from_url(url)
+
+
+class RedisVersions:
+    epoch = ""
+    shared = True
+
+    def __init__(self, client, prefix="ecommerce:version:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return int(self.client.get(self.prefix + key) or 0)
+        except Exception:
+            logger.exception("Version lookup failed for %s", key)
+            return None
+
+    def bump(self, key):
+        try:
+            self.client.incr(self.prefix + key)
+        except Exception:
+            logger.exception("Version bump failed for %s", key)
+
+
+class LRUStore:
+    # Entries expire after ttl seconds when one is given.
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and time.monotonic() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisStore:
+    # Keys embed the version, so stale entries are never read and just age out.
+
+    def __init__(self, client, ttl, prefix="ecommerce:fragment:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception:
+            logger.exception("Fragment lookup failed for %s", key)
+            return None
+        return value.decode() if value is not None else None
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+        except Exception:
+            logger.exception("Fragment store failed for %s", key)
+
+
+class VersionedValue:
+    # Serves a loaded value until its TTL expires or the shared version moves.
+
+    def __init__(self, name, versions, ttl):
+        self.name = name
+        self.versions = versions
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._value = None
+        self._version = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, loader):
+        version = self.versions.get(self.name)
+        with self._lock:
+            if version is not None and version == self._version and time.monotonic() < self._expires:
+                self.hits += 1
+                return self._value
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._value = value
+            self._version = version
+            self._expires = time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._expires = 0.0
+        self.versions.bump(self.name)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "version": self._version}
+
+
+class CacheManager:
+    # local_ttl is set when the versions are per-process: other workers' bumps
+    # never arrive, so in-process entries validated against them must expire.
+
+    def __init__(self, versions, fragments, local_ttl=None):
+        self.versions = versions
+        self.fragments = fragments
+        self.local_ttl = local_ttl
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+        self.values = {}
+
+    def value(self, name, ttl):
+        if name not in self.values:
+            self.values[name] = VersionedValue(name, self.versions, ttl)
+        return self.values[name]
+
+    def fragment(self, key, render):
+        value = self.fragments.get(key)
+        if value is not None:
+            self.fragment_hits += 1
+            return value
+        self.fragment_misses += 1
+        value = render()
+        self.fragments.set(key, value)
+        return value
+
+    def stats(self):
+        stats = {name: value.stats() for name, value in self.values.items()}
+        stats["fragments"] = {
+            "hits": self.fragment_hits,
+            "misses": self.fragment_misses,
+            "entries": len(self.fragments) if isinstance(self.fragments, LRUStore) else None,
+        }
+        return stats
+
+
+def create_manager(app):
+    backend = app.config.get("CACHE_BACKEND", "local")
+    size = app.config.get("FRAGMENT_CACHE_SIZE", 2000)
+    ttl = app.config.get("FRAGMENT_CACHE_TTL", 3600)
+    if backend == "redis":
+        client = redis_client(app.config["CACHE_REDIS_URL"])
+        return CacheManager(RedisVersions(client), RedisStore(client, ttl))
+    if backend == "file":
+        path = app.config.get("CACHE_FILE_PATH") or os.path.join(app.instance_path, "cache")
+        return CacheManager(FileVersions(path), LRUStore(size, ttl))
+    if backend != "local":
+        raise RuntimeError(f"Unknown CACHE_BACKEND {backend!r}")
+    local_ttl = app.config.get("LOCAL_CACHE_TTL", 30)
+    return CacheManager(LocalVersions(), LRUStore(size, min(ttl, local_ttl)), local_ttl=local_ttl)
+
+
+def get_cache():
+    return current_app.extensions["cache"]
+
+
+def init_app(app):
+    app.extensions["cache"] = create_manager(app)
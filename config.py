@@ -1,16 +1,116 @@
 import os
 from dotenv import load_dotenv
-import cloudinary
+from pooling import engine_options
+from replicas import replica_binds
 
 load_dotenv()
 
+# Functions are frozen once the response is sent, so nothing may be left
+# running in background threads.
+SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY") 
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-
-cloudinary.config( 
-    cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME"), 
-    api_key = os.getenv("CLOUDINARY_API_KEY"), 
-    api_secret = os.getenv("CLOUDINARY_API_SECRET")
-)
+    # Schema belongs to Flask-Migrate; only enable for throwaway local databases.
+    DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "0") == "1"
+    # "default" keeps a bounded pool per process; "serverless" holds no
+    # connections and expects DATABASE_URI to point at an external pooler.
+    DB_POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "default")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI,
+        profile=DB_POOL_PROFILE,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pre_ping=DB_POOL_PRE_PING,
+    )
+    # Serve the dashboard and product page as async views on an async engine
+    # (asyncpg/aiosqlite); ASYNC_DATABASE_URI defaults to DATABASE_URI.
+    ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+    ASYNC_DATABASE_URI = os.getenv("ASYNC_DATABASE_URI")
+    # Request threads per process when served through asgi.py.
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", 8))
+    # Read-only views go to these when healthy; everything else uses the primary.
+    SQLALCHEMY_BINDS = replica_binds([uri for uri in os.getenv("DB_REPLICA_URIS", "").split(",") if uri])
+    DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 10))
+    DB_REPLICA_CHECK_INTERVAL = int(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))
+    DB_REPLICA_COOLDOWN = int(os.getenv("DB_REPLICA_COOLDOWN", 30))
+    DB_REPLICA_MAX_LAG = int(os.getenv("DB_REPLICA_MAX_LAG", 0))
+    PRODUCTS_PER_PAGE = int(os.getenv("PRODUCTS_PER_PAGE", 24))
+    ORDERS_PER_PAGE = int(os.getenv("ORDERS_PER_PAGE", 50))
+    STREAM_LISTINGS = os.getenv("STREAM_LISTINGS", "0") == "1"
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+    CACHE_FILE_PATH = os.getenv("CACHE_FILE_PATH")
+    # With CACHE_BACKEND=local each worker only sees its own writes, so entries
+    # cached in a worker are dropped after this many seconds.
+    LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL", 30))
+    # Any werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000";
+    # stored hashes made with other parameters are upgraded at the next login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 16))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+    LOGIN_IP_PER_MINUTE = int(os.getenv("LOGIN_IP_PER_MINUTE", 10))
+    LOGIN_EMAIL_BURST = int(os.getenv("LOGIN_EMAIL_BURST", 5))
+    LOGIN_EMAIL_PER_MINUTE = int(os.getenv("LOGIN_EMAIL_PER_MINUTE", 3))
+    # Logged-in users are cached per worker for up to this many seconds. Only
+    # with CACHE_BACKEND=redis or file: with local versions a change made in
+    # another worker can't be seen, so the cache is disabled and every request
+    # loads the user.
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 300))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+    CATEGORY_CACHE_TTL = int(os.getenv("CATEGORY_CACHE_TTL", 60))
+    # The dashboard grid is rebuilt in the background once older than the TTL,
+    # and never served older than MAX_STALE.
+    DASHBOARD_SNAPSHOT_TTL = int(os.getenv("DASHBOARD_SNAPSHOT_TTL", 60))
+    DASHBOARD_SNAPSHOT_MAX_STALE = int(os.getenv("DASHBOARD_SNAPSHOT_MAX_STALE", 300))
+    FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "1") == "1"
+    FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", 2000))
+    FRAGMENT_CACHE_TTL = int(os.getenv("FRAGMENT_CACHE_TTL", 3600))
+    PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 5000))
+    RELATED_PRODUCTS = int(os.getenv("RELATED_PRODUCTS", 4))
+    # How often each worker picks up products changed by other workers.
+    RELATED_SYNC_INTERVAL = int(os.getenv("RELATED_SYNC_INTERVAL", 60))
+    IMAGE_STORAGE = os.getenv("IMAGE_STORAGE", "cloudinary")
+    CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
+    CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
+    CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
+    IMAGE_STORAGE_PATH = os.getenv("IMAGE_STORAGE_PATH")
+    IMAGE_UPLOAD_MODE = os.getenv("IMAGE_UPLOAD_MODE", "inline" if SERVERLESS else "background")
+    IMAGE_UPLOAD_WORKERS = int(os.getenv("IMAGE_UPLOAD_WORKERS", 4))
+    IMAGE_UPLOAD_RETRIES = int(os.getenv("IMAGE_UPLOAD_RETRIES", 2))
+    IMAGE_UPLOAD_BACKOFF = float(os.getenv("IMAGE_UPLOAD_BACKOFF", 0.5))
+    IMAGE_UPLOAD_TIMEOUT = int(os.getenv("IMAGE_UPLOAD_TIMEOUT", 30))
+    # Uploads still pending after this long were lost with a restarted worker.
+    IMAGE_UPLOAD_STALE_AFTER = int(os.getenv("IMAGE_UPLOAD_STALE_AFTER", 600))
+    # Deleted images are removed from storage in the background, in batches
+    # gathered for up to IMAGE_CLEANUP_LINGER seconds.
+    IMAGE_CLEANUP_WORKERS = int(os.getenv("IMAGE_CLEANUP_WORKERS", 4))
+    IMAGE_CLEANUP_LINGER = float(os.getenv("IMAGE_CLEANUP_LINGER", 2.0))
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+    HTTP_CACHE_EDGE_TTL = int(os.getenv("HTTP_CACHE_EDGE_TTL", 60))
+    HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", 300))
+    # Part of every ETag so a deploy with new templates never answers 304.
+    HTTP_CACHE_VERSION = os.getenv("HTTP_CACHE_VERSION", os.getenv("VERCEL_GIT_COMMIT_SHA", ""))
+    HTTP_PURGE_URL = os.getenv("HTTP_PURGE_URL")
+    HTTP_PURGE_TOKEN = os.getenv("HTTP_PURGE_TOKEN")
+    INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "0") == "1"
+    INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = int(os.getenv("INSTRUMENTATION_N_PLUS_ONE_THRESHOLD", 5))
+    # Bearer token for Prometheus; without one /metrics is admin-only.
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # Copies of each sales rollup row that checkouts spread their updates over.
+    SALES_ROLLUP_SHARDS = int(os.getenv("SALES_ROLLUP_SHARDS", 8))
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory")
+    SEARCH_INDEX_MAX_AGE = int(os.getenv("SEARCH_INDEX_MAX_AGE", 300))
+    SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 500))
@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from flask import (
+    abort, before_render_template, current_app, g, has_app_context, has_request_context, request,
+    template_rendered,
+)
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.external = defaultdict(float)
+        self.statements = Counter()
+        self._render_started = []
+
+
+class Metrics:
+    # Per-process totals; each worker exposes its own series.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.queries = Counter()
+        self.db_seconds = Counter()
+        self.render_seconds = Counter()
+        self.n_plus_one = Counter()
+        self.external_calls = Counter()
+        self.external_seconds = Counter()
+        self.duration_buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration_sum = Counter()
+
+    def observe_request(self, endpoint, timings, duration, n_plus_one):
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.queries[endpoint] += timings.queries
+            self.db_seconds[endpoint] += timings.db
+            self.render_seconds[endpoint] += timings.render
+            self.n_plus_one[endpoint] += n_plus_one
+            self.duration_sum[endpoint] += duration
+            buckets = self.duration_buckets[endpoint]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+
+    def observe_external(self, service, duration):
+        with self._lock:
+            self.external_calls[service] += 1
+            self.external_seconds[service] += duration
+
+
+def _timings():
+    if has_request_context():
+        return g.get("request_timings")
+    return None
+
+
+@contextmanager
+def external_call(service):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        timings = _timings()
+        if timings is not None:
+            timings.external[service] += duration
+        metrics = current_app.extensions.get("instrumentation") if has_app_context() else None
+        if metrics is not None:
+            metrics.observe_external(service, duration)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _timings() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _timings()
+    started = conn.info.get("query_started")
+    if timings is None or not started:
+        return
+    timings.db += time.perf_counter() - started.pop()
+    timings.queries += 1
+    timings.statements[statement] += 1
+
+
+def _before_render(app, template, context, **kwargs):
+    timings = _timings()
+    if timings is not None:
+        timings._render_started.append(time.perf_counter())
+
+
+def _template_rendered(app, template, context, **kwargs):
+    timings = _timings()
+    if timings is not None and timings._render_started:
+        timings.render += time.perf_counter() - timings._render_started.pop()
+
+
+def _start_request():
+    g.request_timings = RequestTimings()
+
+
+def _server_timing(response):
+    timings = _timings()
+    if timings is None:
+        return response
+    parts = [
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+        f"render;dur={timings.render * 1000:.1f}",
+    ]
+    parts += [f"{service.replace('.', '-')};dur={seconds * 1000:.1f}" for service, seconds in timings.external.items()]
+    parts.append(f"total;dur={(time.perf_counter() - timings.started) * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(parts)
+    return response
+
+
+def _finish_request(exception=None):
+    timings = g.pop("request_timings", None)
+    if timings is None:
+        return
+    endpoint = request.endpoint or "unmatched"
+    threshold = current_app.config.get("INSTRUMENTATION_N_PLUS_ONE_THRESHOLD", 5)
+    repeated = [(statement, count) for statement, count in timings.statements.items() if count > threshold]
+    for statement, count in repeated:
+        logger.warning("Possible N+1 in %s: statement ran %s times: %s",
+                       endpoint, count, " ".join(statement.split())[:300])
+    current_app.extensions["instrumentation"].observe_request(
+        endpoint, timings, time.perf_counter() - timings.started, len(repeated),
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+
+def render_metrics(app):
+    from app import db
+    from cache import get_cache
+    from pooling import pool_stats
+
+    metrics = app.extensions["instrumentation"]
+    lines = []
+    with metrics._lock:
+        _series(lines, "app_requests_total", "counter", "Requests handled.",
+                [({"endpoint": e}, n) for e, n in metrics.requests.items()])
+        _series(lines, "app_db_queries_total", "counter", "SQL statements executed.",
+                [({"endpoint": e}, n) for e, n in metrics.queries.items()])
+        _series(lines, "app_db_seconds_total", "counter", "Time spent in SQL statements.",
+                [({"endpoint": e}, round(s, 6)) for e, s in metrics.db_seconds.items()])
+        _series(lines, "app_render_seconds_total", "counter", "Time spent rendering templates.",
+                [({"endpoint": e}, round(s, 6)) for e, s in metrics.render_seconds.items()])
+        _series(lines, "app_n_plus_one_total", "counter", "Statements repeated past the N+1 threshold.",
+                [({"endpoint": e}, n) for e, n in metrics.n_plus_one.items()])
+        _series(lines, "app_external_calls_total", "counter", "Calls to external services.",
+                [({"service": s}, n) for s, n in metrics.external_calls.items()])
+        _series(lines, "app_external_seconds_total", "counter", "Time spent calling external services.",
+                [({"service": s}, round(t, 6)) for s, t in metrics.external_seconds.items()])
+        samples = []
+        for endpoint, buckets in metrics.duration_buckets.items():
+            samples += [({"endpoint": endpoint, "le": bound}, count) for bound, count in zip(DURATION_BUCKETS, buckets)]
+            samples.append(({"endpoint": endpoint, "le": "+Inf"}, metrics.requests[endpoint]))
+        lines.append("# HELP app_request_duration_seconds Request latency.")
+        lines.append("# TYPE app_request_duration_seconds histogram")
+        for labels, value in samples:
+            lines.append(f'app_request_duration_seconds_bucket{{endpoint="{_escape(labels["endpoint"])}",'
+                         f'le="{labels["le"]}"}} {value}')
+        for endpoint, total in metrics.duration_sum.items():
+            lines.append(f'app_request_duration_seconds_sum{{endpoint="{_escape(endpoint)}"}} {round(total, 6)}')
+            lines.append(f'app_request_duration_seconds_count{{endpoint="{_escape(endpoint)}"}} {metrics.requests[endpoint]}')
+
+    cache_stats = get_cache().stats()
+    fragments = cache_stats.pop("fragments")
+    _series(lines, "app_cache_hits_total", "counter", "Cache hits.",
+            [({"cache": name}, stats["hits"]) for name, stats in cache_stats.items()]
+            + [({"cache": "fragments"}, fragments["hits"])])
+    _series(lines, "app_cache_misses_total", "counter", "Cache misses.",
+            [({"cache": name}, stats["misses"]) for name, stats in cache_stats.items()]
+            + [({"cache": "fragments"}, fragments["misses"])])
+
+    pools = {name or "default": pool_stats(engine) for name, engine in db.engines.items()}
+    _series(lines, "app_db_pool_checkouts_total", "counter", "Connection checkouts.",
+            [({"engine": name}, stats["checkouts"]) for name, stats in pools.items()])
+    _series(lines, "app_db_pool_timeouts_total", "counter", "Checkouts that timed out.",
+            [({"engine": name}, stats["timeouts"]) for name, stats in pools.items()])
+    _series(lines, "app_db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.",
+            [({"engine": name}, stats["wait_seconds_total"]) for name, stats in pools.items()])
+    _series(lines, "app_db_pool_checked_out", "gauge", "Connections currently checked out.",
+            [({"engine": name}, stats["checked_out"]) for name, stats in pools.items() if "checked_out" in stats])
+    _series(lines, "app_db_pool_saturation", "gauge", "Checked out connections over pool capacity.",
+            [({"engine": name}, stats["saturation"]) for name, stats in pools.items()
+             if stats.get("saturation") is not None])
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        if request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+    elif not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    return current_app.response_class(render_metrics(current_app._get_current_object()),
+                                      mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    if not app.config.get("INSTRUMENTATION_ENABLED"):
+        return
+    app.extensions["instrumentation"] = Metrics()
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_server_timing)
+    app.teardown_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,98 @@
+"""baseline schema
+
+Revision ID: 1d4f7a2c9e03
+Revises:
+Create Date: 2026-10-18 08:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d4f7a2c9e03'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The original tables were created by db.create_all(); databases that came
+    # from there already have them, so only missing tables are created.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=255), nullable=False),
+            sa.Column('password', sa.String(length=255), nullable=False),
+            sa.Column('email', sa.String(length=255), nullable=False),
+            sa.Column('is_admin', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+        )
+    if 'category' not in existing:
+        op.create_table(
+            'category',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'product' not in existing:
+        op.create_table(
+            'product',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('price', sa.Integer(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('brand', sa.String(length=255), nullable=False),
+            sa.Column('category_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['category_id'], ['category.id'], name='fk_category_id', ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'product_image' not in existing:
+        op.create_table(
+            'product_image',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('url', sa.String(length=255), nullable=False),
+            sa.Column('public_id', sa.String(length=255), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'cart' not in existing:
+        op.create_table(
+            'cart',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['product.id'], name='fk_cart_product_id', ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_cart_user_id', ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'checkout' not in existing:
+        op.create_table(
+            'checkout',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('checkout_time', sa.DateTime(), nullable=True),
+            sa.Column('address', sa.String(length=255), nullable=False),
+            sa.Column('contact_no', sa.String(length=255), nullable=False),
+            sa.Column('message', sa.Text(), nullable=False),
+            sa.Column('total_price', sa.Integer(), nullable=False),
+            sa.Column('cart_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['cart_id'], ['cart.id'], name='fk_cart_id', ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('checkout')
+    op.drop_table('cart')
+    op.drop_table('product_image')
+    op.drop_table('product')
+    op.drop_table('category')
+    op.drop_table('user')
@@ -0,0 +1,29 @@
+"""product image created_at
+
+Revision ID: 2b8f6d4c1e97
+Revises: 7f2c4e8a6b31
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8f6d4c1e97'
+down_revision = '7f2c4e8a6b31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows from before this have no time; pending ones among them are stale.
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_product_image_status_created_at', ['status', 'created_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_image_status_created_at')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,33 @@
+"""product search index
+
+Revision ID: 3f1c9a7d2b10
+Revises: 1d4f7a2c9e03
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b10'
+down_revision = '1d4f7a2c9e03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only the Postgres search backend uses this; SQLite keeps its own FTS5 table.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_product_search_document ON product USING gin ("
+        "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(brand, '') "
+        "|| ' ' || coalesce(description, '')))"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_product_search_document")
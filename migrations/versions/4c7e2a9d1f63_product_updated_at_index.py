@@ -0,0 +1,25 @@
+"""product updated_at index
+
+Revision ID: 4c7e2a9d1f63
+Revises: b6d2e8f4a190
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c7e2a9d1f63'
+down_revision = 'b6d2e8f4a190'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The related-products index syncs the products changed since its last pass.
+    op.create_index('ix_product_updated_at', 'product', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_product_updated_at', table_name='product')
@@ -0,0 +1,50 @@
+"""cart unique user/product
+
+Revision ID: 5e8a0c3f7d14
+Revises: c41d7e9b5a22
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a0c3f7d14'
+down_revision = 'c41d7e9b5a22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Point checkouts at the surviving row before duplicates are removed, since
+    # checkout.cart_id cascades on delete.
+    op.execute("""
+        UPDATE checkout SET cart_id = (
+            SELECT MIN(keep.id) FROM cart keep
+            JOIN cart dup ON dup.user_id = keep.user_id AND dup.product_id = keep.product_id
+            WHERE dup.id = checkout.cart_id
+        )
+    """)
+    # The surviving row carries the quantity of all its duplicates.
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(dup.quantity) FROM cart dup
+            WHERE dup.user_id = cart.user_id AND dup.product_id = cart.product_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart GROUP BY user_id, product_id HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM cart WHERE id NOT IN (
+            SELECT MIN(id) FROM cart GROUP BY user_id, product_id
+        )
+    """)
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_cart_user_product', ['user_id', 'product_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_cart_user_product', type_='unique')
@@ -0,0 +1,33 @@
+"""catalog import checkpoint
+
+Revision ID: 6a1d9e3c5f28
+Revises: 2b8f6d4c1e97
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a1d9e3c5f28'
+down_revision = '2b8f6d4c1e97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'catalog_import_checkpoint',
+        sa.Column('name', sa.String(length=1024), nullable=False),
+        sa.Column('source', sa.String(length=1024), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('products', sa.Integer(), nullable=False),
+        sa.Column('images', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name', name='pk_catalog_import_checkpoint'),
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_import_checkpoint')
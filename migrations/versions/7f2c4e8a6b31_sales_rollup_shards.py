@@ -0,0 +1,62 @@
+"""sales rollup shards and rebuild table
+
+Revision ID: 7f2c4e8a6b31
+Revises: e5a9c3b7d201
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f2c4e8a6b31'
+down_revision = 'e5a9c3b7d201'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "grain, dimension, bucket, key, label, revenue, units, orders"
+
+
+def _rollup_table(name, sharded=True):
+    columns = [
+        sa.Column('grain', sa.String(length=8), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+    ]
+    key = ['grain', 'dimension', 'bucket', 'key']
+    if sharded:
+        columns.append(sa.Column('shard', sa.Integer(), nullable=False))
+        key.append('shard')
+    op.create_table(
+        name,
+        *columns,
+        sa.Column('label', sa.String(length=255), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint(*key, name=f'pk_{name}'),
+    )
+
+
+def upgrade():
+    # The primary key gains the shard, so the table is rebuilt with the
+    # existing rows as shard 0.
+    _rollup_table('sales_rollup_sharded')
+    op.execute(f"INSERT INTO sales_rollup_sharded ({COLUMNS}, shard) SELECT {COLUMNS}, 0 FROM sales_rollup")
+    op.drop_table('sales_rollup')
+    op.rename_table('sales_rollup_sharded', 'sales_rollup')
+    _rollup_table('sales_rollup_rebuild')
+
+
+def downgrade():
+    op.drop_table('sales_rollup_rebuild')
+    _rollup_table('sales_rollup_unsharded', sharded=False)
+    op.execute(
+        f"INSERT INTO sales_rollup_unsharded ({COLUMNS}) "
+        f"SELECT grain, dimension, bucket, key, max(label), sum(revenue), sum(units), sum(orders) "
+        f"FROM sales_rollup GROUP BY grain, dimension, bucket, key"
+    )
+    op.drop_table('sales_rollup')
+    op.rename_table('sales_rollup_unsharded', 'sales_rollup')
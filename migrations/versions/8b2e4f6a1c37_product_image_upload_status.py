@@ -0,0 +1,28 @@
+"""product image upload status
+
+Revision ID: 8b2e4f6a1c37
+Revises: 3f1c9a7d2b10
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4f6a1c37'
+down_revision = '3f1c9a7d2b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False, server_default='ready'))
+        batch_op.add_column(sa.Column('error', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_column('error')
+        batch_op.drop_column('status')
@@ -0,0 +1,25 @@
+"""checkout cart_id index
+
+Revision ID: 9d4b1f7e3a25
+Revises: 4c7e2a9d1f63
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b1f7e3a25'
+down_revision = '4c7e2a9d1f63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deleting products removes the checkouts of their cart rows by cart_id.
+    op.create_index('ix_checkout_cart_id', 'checkout', ['cart_id'])
+
+
+def downgrade():
+    op.drop_index('ix_checkout_cart_id', table_name='checkout')
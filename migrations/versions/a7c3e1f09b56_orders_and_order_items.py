@@ -0,0 +1,96 @@
+"""orders and order items
+
+Revision ID: a7c3e1f09b56
+Revises: 5e8a0c3f7d14
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e1f09b56'
+down_revision = '5e8a0c3f7d14'
+branch_labels = None
+depends_on = None
+
+# Each checkout row with the order it belongs to. The old checkout wrote one
+# row per cart item, each repeating the order's fields, and checkout_time
+# defaulted to one value per process, so those fields alone merge distinct
+# orders. An order is a run of consecutive rows (in id order) by the same user
+# with the same fields: the difference of the two row numbers is constant
+# within such a run. Its first checkout id becomes the order id.
+CHECKOUT_ROWS = """
+    SELECT runs.*, MIN(runs.id) OVER (
+        PARTITION BY runs.user_id, runs.checkout_time, runs.address, runs.contact_no, runs.message,
+                     runs.total_price, runs.run
+    ) AS order_id
+    FROM (
+        SELECT checkout.id, checkout.checkout_time, checkout.address, checkout.contact_no,
+               checkout.message, checkout.total_price, cart.user_id, cart.product_id, cart.quantity,
+               ROW_NUMBER() OVER (ORDER BY checkout.id) - ROW_NUMBER() OVER (
+                   PARTITION BY cart.user_id, checkout.checkout_time, checkout.address, checkout.contact_no,
+                                checkout.message, checkout.total_price
+                   ORDER BY checkout.id
+               ) AS run
+        FROM checkout LEFT JOIN cart ON cart.id = checkout.cart_id
+    ) runs
+"""
+
+
+def upgrade():
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='placed'),
+        sa.Column('checkout_time', sa.DateTime(), nullable=False),
+        sa.Column('address', sa.String(length=255), nullable=False),
+        sa.Column('contact_no', sa.String(length=255), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('total_price', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_order_user_id', ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'order_item',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=True),
+        sa.Column('product_name', sa.String(length=255), nullable=False),
+        sa.Column('price', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], name='fk_order_item_order_id', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], name='fk_order_item_product_id', ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_order_item_order_id', 'order_item', ['order_id'])
+    backfill(op.get_bind())
+
+
+def backfill(conn):
+    # Cart rows are usually gone by now; items are kept when they survive.
+    conn.execute(sa.text(f"""
+        INSERT INTO orders (id, user_id, status, checkout_time, address, contact_no, message, total_price)
+        SELECT order_id, user_id, 'placed', COALESCE(checkout_time, CURRENT_TIMESTAMP), address, contact_no,
+               COALESCE(message, ''), total_price
+        FROM ({CHECKOUT_ROWS}) checkout_rows
+        WHERE id = order_id
+    """))
+    conn.execute(sa.text(f"""
+        INSERT INTO order_item (order_id, product_id, product_name, price, quantity)
+        SELECT checkout_rows.order_id, checkout_rows.product_id, product.name, product.price, checkout_rows.quantity
+        FROM ({CHECKOUT_ROWS}) checkout_rows JOIN product ON product.id = checkout_rows.product_id
+    """))
+    if conn.dialect.name == 'postgresql':
+        # Ids were given explicitly, so move the sequence past them.
+        conn.execute(sa.text(
+            "SELECT setval(pg_get_serial_sequence('orders', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM orders"
+        ))
+
+
+def downgrade():
+    op.drop_index('ix_order_item_order_id', table_name='order_item')
+    op.drop_table('order_item')
+    op.drop_table('orders')
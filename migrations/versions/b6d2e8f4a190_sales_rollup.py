@@ -0,0 +1,37 @@
+"""sales rollup
+
+Revision ID: b6d2e8f4a190
+Revises: f3a8d6e2b714
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2e8f4a190'
+down_revision = 'f3a8d6e2b714'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by `flask analytics backfill` after the deploy, not here: a
+    # migration that scans the whole order history would hold up the rollout.
+    op.create_table(
+        'sales_rollup',
+        sa.Column('grain', sa.String(length=8), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('label', sa.String(length=255), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('grain', 'dimension', 'bucket', 'key'),
+    )
+
+
+def downgrade():
+    op.drop_table('sales_rollup')
@@ -0,0 +1,27 @@
+"""product image derivatives
+
+Revision ID: c41d7e9b5a22
+Revises: 8b2e4f6a1c37
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9b5a22'
+down_revision = '8b2e4f6a1c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows are filled in by `flask images backfill`.
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('derivatives', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_column('derivatives')
@@ -0,0 +1,28 @@
+"""order console indexes
+
+Revision ID: d92f5b8c4e61
+Revises: a7c3e1f09b56
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92f5b8c4e61'
+down_revision = 'a7c3e1f09b56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_orders_checkout_time_id', 'orders', ['checkout_time', 'id'])
+    op.create_index('ix_orders_status_checkout_time', 'orders', ['status', 'checkout_time'])
+    op.create_index('ix_orders_user_id_checkout_time', 'orders', ['user_id', 'checkout_time'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_user_id_checkout_time', table_name='orders')
+    op.drop_index('ix_orders_status_checkout_time', table_name='orders')
+    op.drop_index('ix_orders_checkout_time_id', table_name='orders')
@@ -0,0 +1,65 @@
+"""product full-text table for SQLite
+
+Revision ID: e5a9c3b7d201
+Revises: 9d4b1f7e3a25
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3b7d201'
+down_revision = '9d4b1f7e3a25'
+branch_labels = None
+depends_on = None
+
+CATEGORY_NAME = "coalesce((SELECT name FROM category WHERE id = new.category_id), '')"
+
+
+def _has_fts5(bind):
+    return bind.dialect.name == 'sqlite' and bind.exec_driver_sql(
+        "SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar() == 1
+
+
+def upgrade():
+    # Backs SEARCH_BACKEND=sqlite. Triggers keep it in step with product and
+    # category inside each writing transaction; Postgres uses
+    # ix_product_search_document instead.
+    if not _has_fts5(op.get_bind()):
+        return
+    # Earlier releases created the table on first search.
+    op.execute("DROP TABLE IF EXISTS product_fts")
+    op.execute("CREATE VIRTUAL TABLE product_fts USING fts5(name, brand, category, description)")
+    op.execute(
+        "INSERT INTO product_fts (rowid, name, brand, category, description) "
+        "SELECT p.id, p.name, p.brand, coalesce(c.name, ''), p.description "
+        "FROM product p LEFT JOIN category c ON c.id = p.category_id"
+    )
+    insert = (
+        "INSERT INTO product_fts (rowid, name, brand, category, description) "
+        f"VALUES (new.id, new.name, new.brand, {CATEGORY_NAME}, new.description);"
+    )
+    op.execute(f"CREATE TRIGGER product_fts_insert AFTER INSERT ON product BEGIN {insert} END")
+    op.execute(
+        "CREATE TRIGGER product_fts_update AFTER UPDATE OF name, brand, category_id, description ON product "
+        f"BEGIN DELETE FROM product_fts WHERE rowid = old.id; {insert} END"
+    )
+    op.execute(
+        "CREATE TRIGGER product_fts_delete AFTER DELETE ON product "
+        "BEGIN DELETE FROM product_fts WHERE rowid = old.id; END"
+    )
+    op.execute(
+        "CREATE TRIGGER category_fts_rename AFTER UPDATE OF name ON category BEGIN "
+        "UPDATE product_fts SET category = new.name "
+        "WHERE rowid IN (SELECT id FROM product WHERE category_id = new.id); END"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ('product_fts_insert', 'product_fts_update', 'product_fts_delete', 'category_fts_rename'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS product_fts")
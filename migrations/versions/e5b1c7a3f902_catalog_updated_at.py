@@ -0,0 +1,33 @@
+"""catalog updated_at
+
+Revision ID: e5b1c7a3f902
+Revises: d92f5b8c4e61
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1c7a3f902'
+down_revision = 'd92f5b8c4e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Added nullable, filled, then tightened: SQLite cannot add a column with a
+    # non-constant default.
+    for table in ('category', 'product'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in ('product', 'category'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
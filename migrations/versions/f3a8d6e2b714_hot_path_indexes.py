@@ -0,0 +1,38 @@
+"""hot path indexes
+
+Revision ID: f3a8d6e2b714
+Revises: e5b1c7a3f902
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d6e2b714'
+down_revision = 'e5b1c7a3f902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (x, id) pairs serve both the filter and the keyset ORDER BY of the listings.
+    # cart.user_id is already covered by uq_cart_user_product (user_id, product_id).
+    op.create_index('ix_product_category_id_id', 'product', ['category_id', 'id'])
+    op.create_index('ix_product_user_id_id', 'product', ['user_id', 'id'])
+    op.create_index('ix_product_price_id', 'product', ['price', 'id'])
+    op.create_index('ix_product_image_product_id', 'product_image', ['product_id'])
+    op.create_index('ix_cart_product_id', 'cart', ['product_id'])
+    op.create_index('ix_checkout_checkout_time', 'checkout', ['checkout_time'])
+    op.create_index('ix_order_item_product_id', 'order_item', ['product_id'])
+
+
+def downgrade():
+    op.drop_index('ix_order_item_product_id', table_name='order_item')
+    op.drop_index('ix_checkout_checkout_time', table_name='checkout')
+    op.drop_index('ix_cart_product_id', table_name='cart')
+    op.drop_index('ix_product_image_product_id', table_name='product_image')
+    op.drop_index('ix_product_price_id', table_name='product')
+    op.drop_index('ix_product_user_id_id', table_name='product')
+    op.drop_index('ix_product_category_id_id', table_name='product')
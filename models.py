@@ -18,18 +18,34 @@ class User(db.Model, UserMixin):
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)  
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     
 
 class ProductImage(db.Model):
+    __table_args__ = (
+        db.Index('ix_product_image_status_created_at', 'status', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(255), nullable=False)
     public_id = db.Column(db.String(255), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    error = db.Column(db.String(255))
+    derivatives = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
 
     product = db.relationship('Product', backref=db.backref('images', lazy=True, cascade='all, delete-orphan'))
 
 
 class Product(db.Model):
+    __table_args__ = (
+        db.Index('ix_product_category_id_id', 'category_id', 'id'),
+        db.Index('ix_product_user_id_id', 'user_id', 'id'),
+        db.Index('ix_product_price_id', 'price', 'id'),
+        db.Index('ix_product_updated_at', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     price = db.Column(db.Integer, nullable=False)
@@ -37,6 +53,7 @@ class Product(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     brand = db.Column(db.String(255), nullable=False)
     category_id = db.Column( db.Integer, db.ForeignKey('category.id', name='fk_category_id', ondelete='CASCADE'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     
     user = db.relationship('User', backref='products')
     category = db.relationship('Category', backref='products', lazy=True)
@@ -44,17 +61,29 @@ class Product(db.Model):
     def __repr__(self):
         return f"<Product {self.name}>"
     
+    @property
+    def ready_images(self):
+        return [image for image in self.images if image.status == 'ready']
+
+    @property
+    def cover(self):
+        for image in self.images:
+            if image.status == 'ready':
+                return image
+        return None
+
     @property
     def first_image(self):
-        if self.images:
-            return self.images[0].url
-        return None 
+        cover = self.cover
+        return cover.url if cover else None
 
 
 class Cart(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='uq_cart_user_product'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_cart_user_id', ondelete="CASCADE"), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id', name='fk_cart_product_id', ondelete="CASCADE"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', name='fk_cart_product_id', ondelete="CASCADE"), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     
     checkouts = db.relationship('Checkout', backref='cart', lazy=True)    
@@ -64,9 +93,84 @@ class Cart(db.Model):
     
 class Checkout(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    checkout_time = db.Column(db.DateTime, default=datetime.now())
+    checkout_time = db.Column(db.DateTime, default=datetime.now(), index=True)
     address = db.Column(db.String(255), nullable=False)
     contact_no = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
     total_price = db.Column(db.Integer, nullable=False)
-    cart_id = db.Column(db.Integer, db.ForeignKey('cart.id', name='fk_cart_id', ondelete='CASCADE'), nullable=False)
+    cart_id = db.Column(db.Integer, db.ForeignKey('cart.id', name='fk_cart_id', ondelete='CASCADE'), nullable=False, index=True)
+
+
+class Order(db.Model):
+    __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_checkout_time_id', 'checkout_time', 'id'),
+        db.Index('ix_orders_status_checkout_time', 'status', 'checkout_time'),
+        db.Index('ix_orders_user_id_checkout_time', 'user_id', 'checkout_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_order_user_id', ondelete='SET NULL'))
+    status = db.Column(db.String(20), nullable=False, default='placed', server_default='placed')
+    checkout_time = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    address = db.Column(db.String(255), nullable=False)
+    contact_no = db.Column(db.String(255), nullable=False)
+    message = db.Column(db.Text, nullable=False, default='')
+    total_price = db.Column(db.Integer, nullable=False)
+
+    user = db.relationship('User', backref='orders')
+    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+
+    @property
+    def customer_name(self):
+        return self.user.username if self.user else None
+
+    @property
+    def customer_email(self):
+        return self.user.email if self.user else None
+
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', name='fk_order_item_order_id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', name='fk_order_item_product_id', ondelete='SET NULL'), index=True)
+    product_name = db.Column(db.String(255), nullable=False)
+    price = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+
+class SalesRollupColumns:
+    grain = db.Column(db.String(8), primary_key=True)
+    dimension = db.Column(db.String(16), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, default=0)
+    label = db.Column(db.String(255), nullable=False, default='')
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SalesRollup(SalesRollupColumns, db.Model):
+    # Pre-aggregated sales per hour/day bucket. `dimension` is "product",
+    # "category", "brand" or "total" (key ""), so order counts stay exact for
+    # the store as a whole. Checkouts spread over `shard` copies of each row;
+    # readers sum them.
+    __tablename__ = 'sales_rollup'
+
+
+class SalesRollupRebuild(SalesRollupColumns, db.Model):
+    # Where `flask analytics backfill` builds the replacement rows.
+    __tablename__ = 'sales_rollup_rebuild'
+
+
+class CatalogImportCheckpoint(db.Model):
+    # How far `flask catalog import` got, written in the same transaction as
+    # each batch. `name` is the source path unless --checkpoint names it.
+    __tablename__ = 'catalog_import_checkpoint'
+    name = db.Column(db.String(1024), primary_key=True)
+    source = db.Column(db.String(1024), nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    products = db.Column(db.Integer, nullable=False, default=0)
+    images = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
@@ -0,0 +1,114 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class PoolMetrics:
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, waited, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+class MeteredPoolMixin:
+    # Times how long callers block in pool checkout (for NullPool that is the
+    # connect itself), which is what users feel when the pool is saturated.
+
+    def _do_get(self):
+        if not hasattr(self, "metrics"):
+            self.metrics = PoolMetrics()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.metrics.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredNullPool(MeteredPoolMixin, NullPool):
+    pass
+
+
+def engine_options(uri, profile="default", pool_size=5, max_overflow=10, pool_timeout=30,
+                   pool_recycle=1800, pre_ping=True):
+    if not uri or uri.startswith("sqlite"):
+        return {}
+    if profile == "serverless":
+        # Every instance may be frozen or discarded at any time; leave pooling to
+        # an external pooler (PgBouncer, Supabase/Neon poolers) and hold nothing.
+        return {"poolclass": MeteredNullPool}
+    if profile != "default":
+        raise RuntimeError(f"Unknown DB_POOL_PROFILE {profile!r}")
+    return {
+        "poolclass": MeteredQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pre_ping,
+    }
+
+
+def install_statement_timeout(engine, timeout_ms):
+    # A session setting, run outside the driver's implicit transaction so the
+    # pool's rollback on checkin doesn't undo it. Transaction-mode poolers hand
+    # each transaction a different server session, so behind one set it on the
+    # role instead (ALTER ROLE ... SET statement_timeout).
+    if not timeout_ms or engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_timeout(dbapi_connection, connection_record):
+        autocommit = dbapi_connection.autocommit
+        dbapi_connection.autocommit = True
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        cursor.close()
+        dbapi_connection.autocommit = autocommit
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    metrics = getattr(pool, "metrics", None) or PoolMetrics()
+    stats = {
+        "pool": type(pool).__name__,
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "wait_seconds_total": round(metrics.wait_total, 6),
+        "wait_seconds_max": round(metrics.wait_max, 6),
+        "wait_seconds_avg": round(metrics.wait_total / metrics.checkouts, 6) if metrics.checkouts else 0.0,
+    }
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + pool._max_overflow
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "capacity": capacity,
+            "saturation": round(pool.checkedout() / capacity, 3) if capacity > 0 else None,
+        })
+    return stats
+
+
+def init_app(app, db):
+    with app.app_context():
+        for engine in db.engines.values():
+            install_statement_timeout(engine, app.config.get("DB_STATEMENT_TIMEOUT_MS"))
@@ -0,0 +1,168 @@
+import functools
+import itertools
+import logging
+import threading
+import time
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, session as user_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_UNTIL = "db_primary_until"
+
+
+class ReplicaSet:
+    # Round-robins over healthy replicas. A replica is probed at most once per
+    # check interval; one that fails or lags too far sits out for the cooldown.
+
+    def __init__(self, keys, check_interval, cooldown, max_lag):
+        self.keys = keys
+        self.check_interval = check_interval
+        self.cooldown = cooldown
+        self.max_lag = max_lag
+        self._down_until = {}
+        self._checked_at = {}
+        self._cycle = itertools.cycle(keys)
+        self._lock = threading.Lock()
+
+    def mark_down(self, key, reason):
+        logger.warning("Replica %s unavailable, using primary for %ss: %s", key, self.cooldown, reason)
+        with self._lock:
+            self._down_until[key] = time.monotonic() + self.cooldown
+
+    def _lag(self, connection):
+        if connection.dialect.name != "postgresql":
+            return 0
+        lag = connection.execute(text(
+            "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+        )).scalar()
+        return lag or 0
+
+    def _healthy(self, key, engine):
+        now = time.monotonic()
+        if self._down_until.get(key, 0) > now:
+            return False
+        if now - self._checked_at.get(key, 0) < self.check_interval:
+            return True
+        self._checked_at[key] = now
+        try:
+            with engine.connect() as connection:
+                lag = self._lag(connection)
+        except sa.exc.DBAPIError as e:
+            self.mark_down(key, e)
+            return False
+        if self.max_lag and lag > self.max_lag:
+            self.mark_down(key, f"replication lag {lag:.1f}s")
+            return False
+        return True
+
+    def pick(self, engines):
+        for _ in range(len(self.keys)):
+            with self._lock:
+                key = next(self._cycle)
+            if self._healthy(key, engines[key]):
+                return key
+        return None
+
+    def choose(self, engines):
+        key = self.pick(engines)
+        return engines[key] if key is not None else None
+
+    def stats(self):
+        now = time.monotonic()
+        return {key: "down" if self._down_until.get(key, 0) > now else "up" for key in self.keys}
+
+
+def read_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return current_app.ensure_sync(view)(*args, **kwargs)
+    return wrapper
+
+
+def read_replica(engines):
+    # The replica key a read-only request may read from, or None for the primary.
+    replicas = current_app.extensions.get("replicas")
+    if replicas is None or not g.get("db_read_only") or _primary_pinned():
+        return None
+    return replicas.pick(engines)
+
+
+def _is_write(clause):
+    if isinstance(clause, sa.sql.dml.UpdateBase):
+        return True
+    if isinstance(clause, sa.TextClause):
+        return not clause.text.lstrip().upper().startswith("SELECT")
+    return getattr(clause, "_for_update_arg", None) is not None
+
+
+def _primary_pinned():
+    return user_session.get(PRIMARY_UNTIL, 0) > time.time()
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            if _is_write(clause):
+                self.info["wrote"] = True
+            elif g.get("db_read_only") and not self.info.get("wrote") and not _primary_pinned():
+                engine = self._replica()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        # One replica per request so every read in it sees the same snapshot.
+        if "replica" not in self.info:
+            replicas = current_app.extensions.get("replicas")
+            self.info["replica"] = replicas.choose(self._db.engines) if replicas else None
+        return self.info["replica"]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    # Read-your-writes: the user who just wrote reads from the primary until
+    # the replicas have had time to catch up.
+    if session.info.pop("wrote", False) and has_request_context():
+        sticky = current_app.config.get("DB_REPLICA_STICKY_SECONDS", 0)
+        if sticky:
+            user_session[PRIMARY_UNTIL] = time.time() + sticky
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("wrote", None)
+
+
+def replica_binds(uris):
+    return {f"replica_{i}": uri for i, uri in enumerate(uris)}
+
+
+def init_app(app, db):
+    keys = [key for key in app.config.get("SQLALCHEMY_BINDS") or {} if key and key.startswith("replica_")]
+    if not keys:
+        return
+    replicas = ReplicaSet(
+        keys,
+        check_interval=app.config.get("DB_REPLICA_CHECK_INTERVAL", 5),
+        cooldown=app.config.get("DB_REPLICA_COOLDOWN", 30),
+        max_lag=app.config.get("DB_REPLICA_MAX_LAG", 0),
+    )
+    app.extensions["replicas"] = replicas
+
+    with app.app_context():
+        for key in keys:
+            def handle_error(context, key=key):
+                if context.is_disconnect or context.connection is None:
+                    replicas.mark_down(key, context.original_exception)
+            event.listen(db.engines[key], "handle_error", handle_error)
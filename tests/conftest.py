@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py builds the default app on import, so the environment has to be in
+# place first; every test builds its own app on top of it with make_app.
+WORKDIR = tempfile.mkdtemp(prefix="shop-tests-")
+os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(WORKDIR, 'default.db')}"
+os.environ["SECRET_KEY"] = "tests"
+os.environ["DB_REPLICA_URIS"] = ""
+os.environ["CACHE_BACKEND"] = "local"
+os.environ["SEARCH_BACKEND"] = "memory"
+os.environ["IMAGE_STORAGE"] = "local"
+os.environ["IMAGE_STORAGE_PATH"] = os.path.join(WORKDIR, "uploads")
+
+import pytest  # noqa: E402
+from flask import has_request_context, request  # noqa: E402
+from flask_migrate import Migrate, upgrade  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app import create_app, db  # noqa: E402
+from config import Config  # noqa: E402
+
+Statement = namedtuple("Statement", "engine endpoint sql parameters executemany")
+
+
+@pytest.fixture(scope="session")
+def make_app(tmp_path_factory):
+    # The schema always comes from the migrations, as in production.
+    def make(database_uri=None, **settings):
+        if database_uri is None:
+            database_uri = f"sqlite:///{tmp_path_factory.mktemp('db') / 'shop.db'}"
+        config = type("TestConfig", (Config,), {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "SQLALCHEMY_DATABASE_URI": database_uri,
+            **settings,
+        })
+        app = create_app(config)
+        Migrate(app, db, directory=os.path.join(ROOT, "migrations"))
+        with app.app_context():
+            upgrade()
+        return app
+    return make
+
+
+@pytest.fixture(scope="session")
+def login():
+    def client_for(app, user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+        return client
+    return client_for
+
+
+@pytest.fixture(scope="session")
+def record_statements():
+    # Statements issued while handling a request, on any of the app's engines;
+    # background rebuilds run outside a request and are left out.
+    @contextmanager
+    def record(app):
+        captured = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context():
+                captured.append(Statement(conn.engine, request.endpoint, statement, parameters, executemany))
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield captured
+        finally:
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", listener)
+    return record
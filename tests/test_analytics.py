@@ -0,0 +1,100 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import func, select
+from app import db
+from models import Category, Order, OrderItem, Product, SalesRollup, User
+
+REPORT = "/admin/analytics?date_from=2026-01-01&date_to=2026-01-31&dimension=brand"
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([
+            User(username="admin", email="admin@example.com", password="-", is_admin=True),
+            User(username="shopper", email="shopper@example.com", password="-"),
+            Category(name="home"),
+        ])
+        db.session.flush()
+        db.session.add_all([
+            Product(name="lamp", price=10, description="", brand="acme", category_id=1, user_id=1),
+            Product(name="rug", price=25, description="", brand="weave", category_id=1, user_id=1),
+        ])
+        db.session.flush()
+        # Written straight to the tables, as orders from before the rollups were.
+        for checkout_time, lines in (
+            (datetime(2026, 1, 10, 9, 30), [(1, "lamp", 10, 2), (2, "rug", 25, 1)]),
+            (datetime(2026, 1, 10, 17, 5), [(1, "lamp", 10, 1)]),
+            (datetime(2026, 1, 12, 12, 0), [(2, "rug", 25, 2)]),
+            (datetime(2025, 12, 31, 23, 59), [(2, "rug", 25, 1)]),
+        ):
+            order = Order(user_id=2, address="a", contact_no="1", checkout_time=checkout_time,
+                          total_price=sum(price * quantity for _, _, price, quantity in lines))
+            db.session.add(order)
+            db.session.flush()
+            db.session.add_all([
+                OrderItem(order_id=order.id, product_id=product_id, product_name=name, price=price, quantity=quantity)
+                for product_id, name, price, quantity in lines
+            ])
+        db.session.commit()
+    return app
+
+
+def backfill(app, *args):
+    result = app.test_cli_runner().invoke(args=["analytics", "backfill", "--batch-size", "2", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_backfill_builds_the_report(app, login):
+    assert "Done: 4 orders rolled up" in backfill(app)
+    report = login(app, 1).get(REPORT).get_json()
+    assert report["totals"] == {"revenue": 105, "units": 6, "orders": 3}
+    assert [(row["bucket"], row["revenue"], row["orders"]) for row in report["series"]] == [
+        ("2026-01-10T00:00:00", 55, 2), ("2026-01-12T00:00:00", 50, 1),
+    ]
+    assert [(row["key"], row["revenue"], row["units"], row["orders"]) for row in report["top"]] == [
+        ("weave", 75, 3, 2), ("acme", 30, 3, 2),
+    ]
+
+    hourly = login(app, 1).get("/admin/analytics?date_from=2026-01-10&date_to=2026-01-10&grain=hour").get_json()
+    assert [(row["bucket"], row["revenue"]) for row in hourly["series"]] == [
+        ("2026-01-10T09:00:00", 45), ("2026-01-10T17:00:00", 10),
+    ]
+
+
+def test_backfill_replaces_rows_instead_of_adding_to_them(app, login):
+    client = login(app, 2)
+    client.post("/cart/1", data={"quantity": 3})
+    client.post("/checkout", data={"address": "a", "contact": "1"})
+    with app.app_context():
+        live = db.session.scalar(select(func.sum(SalesRollup.revenue)).where(
+            SalesRollup.grain == "day", SalesRollup.dimension == "total"))
+    assert live == 30
+
+    backfill(app)
+    backfill(app, "--since", "2026-01-11")
+    with app.app_context():
+        totals = dict(db.session.execute(
+            select(SalesRollup.bucket, func.sum(SalesRollup.revenue))
+            .where(SalesRollup.grain == "day", SalesRollup.dimension == "total")
+            .group_by(SalesRollup.bucket)
+        ).all())
+    assert sum(totals.values()) == 105 + 25 + 30
+    assert totals[datetime(2026, 1, 10)] == 55
+    assert totals[datetime(2025, 12, 31)] == 25
+
+
+@pytest.mark.parametrize("query, status, error", [
+    ("?date_from=2026-02-01&date_to=2026-01-01", 400, "date_from is after date_to"),
+    ("?dimension=colour", 400, "dimension must be one of product, category, brand"),
+    ("?grain=hour&date_from=2026-01-01&date_to=2026-03-01", 400, "Hourly series cover at most 31 days"),
+])
+def test_report_rejects_bad_arguments(app, login, query, status, error):
+    response = login(app, 1).get("/admin/analytics" + query)
+    assert (response.status_code, response.get_json()["error"]) == (status, error)
+
+
+def test_report_is_for_admins_only(app, login):
+    assert login(app, 2).get(REPORT).status_code == 403
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import select
+from app import db
+from models import Cart, Category, Product, User
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(User(username="shopper", email="shopper@example.com", password="-"))
+        db.session.add(Category(name="home"))
+        db.session.flush()
+        db.session.add_all([
+            Product(name="lamp", price=10, description="", brand="acme", category_id=1, user_id=1),
+            Product(name="rug", price=25, description="", brand="acme", category_id=1, user_id=1),
+        ])
+        db.session.commit()
+    return app
+
+
+def cart(app):
+    with app.app_context():
+        return dict(db.session.execute(select(Cart.product_id, Cart.quantity).order_by(Cart.product_id)).all())
+
+
+def post(client, *operations):
+    return client.post("/api/cart", json={"operations": list(operations)})
+
+
+def test_operations_collapse_into_one_effect_per_product(app, login):
+    client = login(app, 1)
+    response = post(
+        client,
+        {"op": "add", "product_id": 1, "quantity": 2},
+        {"op": "add", "product_id": 1, "quantity": 3},
+        {"op": "add", "product_id": 2},
+    )
+    assert response.status_code == 200
+    assert response.get_json() == {"items": 2, "quantity": 6, "total": 75}
+    assert cart(app) == {1: 5, 2: 1}
+
+    # Adds land on top of the stored quantity; an update then an add sets it.
+    post(client, {"op": "add", "product_id": 1, "quantity": 1},
+         {"op": "update", "product_id": 2, "quantity": 4}, {"op": "add", "product_id": 2, "quantity": 1})
+    assert cart(app) == {1: 6, 2: 5}
+
+    # A remove followed by an add starts the product over.
+    post(client, {"op": "remove", "product_id": 1}, {"op": "add", "product_id": 1, "quantity": 2},
+         {"op": "remove", "product_id": 2})
+    assert cart(app) == {1: 2}
+
+
+@pytest.mark.parametrize("body, message", [
+    ({}, "A non-empty operations list is required"),
+    ({"operations": []}, "A non-empty operations list is required"),
+    ({"operations": ["add"]}, "Each operation must be an object"),
+    ({"operations": [{"op": "clear", "product_id": 1}]}, "Unknown operation 'clear'"),
+    ({"operations": [{"op": "add", "product_id": "1"}]}, "product_id and quantity must be integers"),
+    ({"operations": [{"op": "add", "product_id": 1, "quantity": True}]}, "product_id and quantity must be integers"),
+    ({"operations": [{"op": "update", "product_id": 1, "quantity": 0}]}, "quantity must be at least 1"),
+    ({"operations": [{"op": "add", "product_id": 1}, {"op": "add", "product_id": 99}]}, "Unknown products: [99]"),
+])
+def test_rejected_batches_change_nothing(app, login, body, message):
+    client = login(app, 1)
+    post(client, {"op": "add", "product_id": 2, "quantity": 3})
+    response = client.post("/api/cart", json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": message}
+    assert cart(app) == {2: 3}
@@ -0,0 +1,102 @@
+import json
+import pytest
+from sqlalchemy import select
+from app import db
+from cache import get_cache
+from models import CatalogImportCheckpoint, Category, Product, ProductImage, User
+from apps.products import catalog_io, search
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(User(username="owner", email="owner@example.com", password="-"))
+        db.session.commit()
+    return app
+
+
+def write_ndjson(path, rows):
+    path.write_text("".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows))
+    return str(path)
+
+
+def run_import(app, *args):
+    return app.test_cli_runner().invoke(args=["catalog", "import", *args, "--owner", "owner@example.com"])
+
+
+def products(app):
+    with app.app_context():
+        return dict(db.session.execute(select(Product.name, Product.price)).all())
+
+
+def test_bad_lines_are_rejected_without_ending_the_import(app, tmp_path):
+    source = write_ndjson(tmp_path / "catalog.ndjson", [
+        {"name": "lamp", "price": 10, "category": "home"},
+        "{not json",
+        "[1, 2]",
+        {"name": "half", "price": 12.5, "category": "home"},
+        {"name": "flag", "price": True, "category": "home"},
+        {"name": "pictures", "price": 5, "category": "home", "images": {"a": 1}},
+        {"name": 42, "price": "7.0", "category": "home", "brand": 3},
+    ])
+    result = run_import(app, source, "--batch-size", "2")
+    assert result.exit_code == 0, result.output
+    assert "Row 2: not valid JSON" in result.output
+    assert "Row 3: not a JSON object" in result.output
+    assert "5 rows rejected" in result.output
+    assert products(app) == {"lamp": 10, "42": 7}
+
+
+def test_resume_continues_after_the_last_committed_batch(app, tmp_path, monkeypatch):
+    source = write_ndjson(tmp_path / "catalog.ndjson", [
+        {"name": f"item {n}", "price": n, "category": "home"} for n in range(6)
+    ])
+    import_batch = catalog_io.CatalogImporter.import_batch
+    calls = []
+
+    def crash_on_third(importer, rows):
+        calls.append(rows)
+        if len(calls) == 3:
+            raise RuntimeError("import died")
+        return import_batch(importer, rows)
+
+    monkeypatch.setattr(catalog_io.CatalogImporter, "import_batch", crash_on_third)
+    with app.app_context():
+        version = get_cache().versions.get(search.VERSION_KEY)
+    assert run_import(app, source, "--batch-size", "2").exit_code != 0
+    with app.app_context():
+        checkpoint = db.session.get(CatalogImportCheckpoint, source)
+        assert (checkpoint.rows, checkpoint.products) == (4, 4)
+        # Announced per committed batch, not only once the import is done.
+        assert get_cache().versions.get(search.VERSION_KEY) == version + 2
+    assert len(products(app)) == 4
+
+    monkeypatch.setattr(catalog_io.CatalogImporter, "import_batch", import_batch)
+    assert "--resume to continue it" in run_import(app, source).output
+    result = run_import(app, source, "--resume")
+    assert result.exit_code == 0, result.output
+    assert products(app) == {f"item {n}": n for n in range(6)}
+    with app.app_context():
+        assert db.session.scalar(select(db.func.count()).select_from(CatalogImportCheckpoint)) == 0
+
+
+def test_uploads_run_outside_the_batch_transaction(app, tmp_path, monkeypatch):
+    (tmp_path / "a.jpg").write_bytes(b"jpeg")
+    source = write_ndjson(tmp_path / "catalog.ndjson", [
+        {"name": "lamp", "price": 10, "category": "new category", "images": ["a.jpg"]},
+    ])
+    upload_all = catalog_io.ImageUploader.upload_all
+    open_transactions = []
+
+    def observed(uploader, sources):
+        open_transactions.append(db.session().in_transaction())
+        return upload_all(uploader, sources)
+
+    monkeypatch.setattr(catalog_io.ImageUploader, "upload_all", observed)
+    result = run_import(app, source, "--upload", "--image-root", str(tmp_path))
+    assert result.exit_code == 0, result.output
+    assert open_transactions == [False]
+    with app.app_context():
+        assert db.session.scalar(select(Category.name)) == "new category"
+        assert db.session.scalar(select(ProductImage.status)) == "ready"
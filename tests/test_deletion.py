@@ -0,0 +1,92 @@
+import os
+import pytest
+from sqlalchemy import func, select
+from app import db
+from models import Cart, Category, Checkout, Order, OrderItem, Product, ProductImage, User
+from apps.products.uploads import get_cleanup, get_storage
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([
+            User(username="owner", email="owner@example.com", password="-"),
+            User(username="other", email="other@example.com", password="-"),
+            User(username="admin", email="admin@example.com", password="-", is_admin=True),
+            Category(name="home"),
+        ])
+        db.session.flush()
+        db.session.add_all([
+            Product(name="lamp", price=10, description="", brand="acme", category_id=1, user_id=1),
+            Product(name="rug", price=25, description="", brand="acme", category_id=1, user_id=1),
+            Product(name="vase", price=15, description="", brand="acme", category_id=1, user_id=2),
+        ])
+        db.session.flush()
+        for product_id in (1, 1, 3):
+            url, public_id = get_storage().upload(b"jpeg", "photo.jpg")
+            db.session.add(ProductImage(url=url, public_id=public_id, product_id=product_id))
+        cart = Cart(user_id=2, product_id=2, quantity=1)
+        order = Order(user_id=2, address="a", contact_no="1", total_price=25)
+        db.session.add_all([cart, order])
+        db.session.flush()
+        db.session.add_all([
+            Checkout(address="a", contact_no="1", message="", total_price=25, cart_id=cart.id),
+            OrderItem(order_id=order.id, product_id=2, product_name="rug", price=25, quantity=1),
+        ])
+        db.session.commit()
+    return app
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.get("_flashes", [])]
+
+
+def asset_exists(public_id):
+    return os.path.exists(os.path.join(get_storage().root, public_id))
+
+
+def test_bulk_delete_removes_only_what_the_user_owns(app, login):
+    with app.app_context():
+        public_ids = dict(db.session.execute(select(ProductImage.public_id, ProductImage.product_id)).all())
+    client = login(app, 1)
+    response = client.post("/delete-products", data={"product_ids": ["1", "2", "3", "99"]})
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/user-products/1")
+    assert flashes(client) == [
+        "Deleted 2 products",
+        "1 selected product was not found.",
+        "You are not authorized to delete 1 of the selected products.",
+    ]
+
+    with app.app_context():
+        assert db.session.scalars(select(Product.id)).all() == [3]
+        assert db.session.scalars(select(ProductImage.product_id)).all() == [3]
+        assert db.session.scalar(select(func.count()).select_from(Cart)) == 0
+        assert db.session.scalar(select(func.count()).select_from(Checkout)) == 0
+        # Order history keeps the line, detached from the product.
+        assert db.session.execute(select(OrderItem.product_id, OrderItem.product_name)).all() == [(None, "rug")]
+        get_cleanup().wait()
+        assert {public_id: asset_exists(public_id) for public_id in public_ids} == {
+            public_id: product_id == 3 for public_id, product_id in public_ids.items()
+        }
+
+
+def test_admins_can_delete_any_product(app, login):
+    client = login(app, 3)
+    client.post("/delete-products", data={"product_ids": ["3"]})
+    assert flashes(client) == ["Deleted 1 product"]
+    with app.app_context():
+        assert db.session.scalars(select(Product.id).order_by(Product.id)).all() == [1, 2]
+
+
+def test_nothing_selected_deletes_nothing(app, login):
+    client = login(app, 2)
+    client.post("/delete-products", data={"product_ids": ["1"]})
+    assert flashes(client) == [
+        "No products were deleted.",
+        "You are not authorized to delete 1 of the selected products.",
+    ]
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Product)) == 3
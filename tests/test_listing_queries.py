@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import insert
+from app import db
+from models import Category, Product, ProductImage, User
+
+
+# Statements per request, whatever the number of products on the page.
+MAX_STATEMENTS = {
+    "/shop": 3,
+    "/shop?sort=price": 3,
+    "/category/1": 3,
+    "/search?q=widget": 3,
+    "/dashboard": 3,
+    "/user-products/1": 3,
+}
+
+
+def add_products(count, categories=3):
+    start = db.session.query(db.func.count(Product.id)).scalar()
+    db.session.execute(insert(Product), [{
+        "name": f"widget {n}", "price": 100 + n, "description": "", "user_id": 1,
+        "brand": f"brand {n % 5}", "category_id": n % categories + 1,
+    } for n in range(start, start + count)])
+    db.session.execute(insert(ProductImage), [{
+        "url": f"https://example.com/{n}-{i}.jpg", "public_id": "", "product_id": n + 1,
+    } for n in range(start, start + count) for i in range(2)])
+    db.session.commit()
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    # Fragment and HTTP caching would hide the listing queries themselves, and
+    # the dashboard is rebuilt on every request instead of served from memory.
+    # The versions are shared, as in production, so the logged-in user is cached.
+    app = make_app(
+        FRAGMENT_CACHE_ENABLED=False, HTTP_CACHE_ENABLED=False, DASHBOARD_SNAPSHOT_MAX_STALE=-1,
+        CACHE_BACKEND="file", CACHE_FILE_PATH=str(tmp_path / "versions"),
+    )
+    with app.app_context():
+        db.session.add(User(username="owner", email="owner@example.com", password="-"))
+        db.session.execute(insert(Category), [{"name": f"category {n}"} for n in range(3)])
+        add_products(3)
+    return app
+
+
+@pytest.mark.parametrize("url", MAX_STATEMENTS)
+def test_listing_statements_do_not_grow_with_the_page(app, login, record_statements, url):
+    client = login(app, 1)
+    # Warm the category list and the search index, which are loaded once per worker.
+    assert client.get(url).status_code == 200
+
+    counts = []
+    for _ in range(2):
+        with record_statements(app) as captured:
+            response = client.get(url)
+        assert response.status_code == 200
+        counts.append(len(captured))
+        with app.app_context():
+            add_products(20)
+    assert counts[0] <= MAX_STATEMENTS[url]
+    assert counts[1] == counts[0]
@@ -0,0 +1,6 @@
+def test_models_match_the_migrations(make_app):
+    # `flask db check` autogenerates against the migrated schema; any
+    # difference, such as tables a migration made by hand, fails it.
+    app = make_app()
+    result = app.test_cli_runner().invoke(args=["db", "check"])
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import func, select
+from app import db
+from models import Cart, Category, Order, OrderItem, Product, SalesRollup, User
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add(User(username="shopper", email="shopper@example.com", password="-"))
+        db.session.add(Category(name="home"))
+        db.session.flush()
+        db.session.add_all([
+            Product(name="lamp", price=10, description="", brand="acme", category_id=1, user_id=1),
+            Product(name="rug", price=25, description="", brand="weave", category_id=1, user_id=1),
+        ])
+        db.session.add_all([Cart(user_id=1, product_id=1, quantity=2), Cart(user_id=1, product_id=2, quantity=1)])
+        db.session.commit()
+    return app
+
+
+def checkout(client):
+    return client.post("/checkout", data={"address": "1 Main St", "contact": "555", "message": "ring twice"})
+
+
+def test_checkout_writes_the_order_its_items_and_rollups_together(app, login):
+    client = login(app, 1)
+    response = checkout(client)
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/order-confirmation/1")
+
+    with app.app_context():
+        order = db.session.get(Order, 1)
+        assert (order.user_id, order.total_price, order.address, order.message) == (1, 45, "1 Main St", "ring twice")
+        items = db.session.execute(
+            select(OrderItem.product_id, OrderItem.product_name, OrderItem.price, OrderItem.quantity)
+            .order_by(OrderItem.product_id)
+        ).all()
+        assert items == [(1, "lamp", 10, 2), (2, "rug", 25, 1)]
+        assert db.session.scalar(select(func.count()).select_from(Cart)) == 0
+        totals = db.session.execute(
+            select(SalesRollup.grain, func.sum(SalesRollup.revenue), func.sum(SalesRollup.units),
+                   func.sum(SalesRollup.orders))
+            .where(SalesRollup.dimension == "total")
+            .group_by(SalesRollup.grain)
+            .order_by(SalesRollup.grain)
+        ).all()
+        assert totals == [("day", 45, 3, 1), ("hour", 45, 3, 1)]
+        brands = dict(db.session.execute(
+            select(SalesRollup.key, SalesRollup.revenue)
+            .where(SalesRollup.grain == "day", SalesRollup.dimension == "brand")
+        ).all())
+        assert brands == {"acme": 20, "weave": 25}
+
+    assert client.get("/order-confirmation/1").status_code == 200
+
+
+def test_resubmitting_an_emptied_cart_places_no_second_order(app, login):
+    client = login(app, 1)
+    checkout(client)
+    response = checkout(client)
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/dashboard")
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Order)) == 1
@@ -0,0 +1,76 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from app import db
+from models import User
+from apps.auth.ratelimit import TokenBucket
+
+# Cheap enough for tests; the stored hash uses fewer rounds, so it is upgraded.
+METHOD = "pbkdf2:sha256:2000"
+
+
+@pytest.fixture
+def make_shop(make_app):
+    def make(stored_method="pbkdf2:sha256:1000", **settings):
+        app = make_app(PASSWORD_HASH_METHOD=METHOD, **settings)
+        with app.app_context():
+            db.session.add(User(username="shopper", email="shopper@example.com",
+                                password=generate_password_hash("secret", stored_method)))
+            db.session.commit()
+        return app
+    return make
+
+
+def stored_hash(app):
+    with app.app_context():
+        return db.session.get(User, 1).password
+
+
+def log_in(client, password):
+    return client.post("/login", data={"email": "shopper@example.com", "password": password})
+
+
+def test_login_upgrades_an_outdated_hash(make_shop):
+    app = make_shop()
+    client = app.test_client()
+    assert log_in(client, "not-the-password").status_code == 200
+    assert stored_hash(app).startswith("pbkdf2:sha256:1000$")
+
+    assert log_in(client, "secret").status_code == 302
+    upgraded = stored_hash(app)
+    assert upgraded.startswith(f"{METHOD}$")
+
+    client.get("/logout")
+    assert log_in(client, "secret").status_code == 302
+    assert stored_hash(app) == upgraded
+
+
+def test_login_attempts_per_email_are_limited(make_shop):
+    app = make_shop(LOGIN_EMAIL_BURST=2, LOGIN_EMAIL_PER_MINUTE=1)
+    client = app.test_client()
+    assert [log_in(client, "not-the-password").status_code for _ in range(2)] == [200, 200]
+    response = log_in(client, "secret")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_a_hash_that_outlives_its_timeout_is_a_503(make_shop):
+    # Checking this hash takes far longer than the zero timeout.
+    app = make_shop(stored_method="pbkdf2:sha256:600000", PASSWORD_HASH_TIMEOUT=0)
+    response = log_in(app.test_client(), "secret")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_bucket_refills_and_evicts_the_least_recently_used_key():
+    bucket = TokenBucket(capacity=2, per_minute=60, max_keys=3)
+    assert [bucket.take("a", now=0) for _ in range(3)] == [0, 0, 1]
+    assert bucket.take("a", now=1) == 0
+
+    for key in "bcd":
+        bucket.take(key, now=1)
+    assert list(bucket._buckets) == ["b", "c", "d"]
+    bucket.take("b", now=1)
+    bucket.take("e", now=1)
+    assert list(bucket._buckets) == ["d", "b", "e"]
+    # An evicted key starts over with a full bucket.
+    assert bucket.take("a", now=1) == 0
@@ -0,0 +1,58 @@
+import pytest
+from app import db
+from models import User
+
+
+@pytest.fixture
+def database(tmp_path):
+    return f"sqlite:///{tmp_path / 'shop.db'}"
+
+
+def make_worker(make_app, database, tmp_path, backend="file"):
+    # Workers share the database and, with the file backend, the versions.
+    app = make_app(database, CACHE_BACKEND=backend, CACHE_FILE_PATH=str(tmp_path / "versions"))
+    with app.app_context():
+        if db.session.get(User, 1) is None:
+            db.session.add(User(username="admin", email="admin@example.com", password="-", is_admin=True))
+            db.session.commit()
+    return app
+
+
+def user_loads(app, client, record_statements):
+    with record_statements(app) as captured:
+        assert client.get("/dashboard").status_code == 200
+    return sum('FROM "user"' in statement.sql or "FROM user" in statement.sql for statement in captured)
+
+
+def test_principal_is_cached_until_another_worker_changes_the_user(make_app, database, tmp_path, login,
+                                                                   record_statements):
+    first = make_worker(make_app, database, tmp_path)
+    second = make_worker(make_app, database, tmp_path)
+    client = login(first, 1)
+    assert user_loads(first, client, record_statements) == 1
+    assert user_loads(first, client, record_statements) == 0
+
+    with second.app_context():
+        db.session.get(User, 1).is_admin = False
+        db.session.commit()
+    assert user_loads(first, client, record_statements) == 1
+    assert first.extensions["principals"].get(1)[-1] is False
+
+
+def test_principal_stays_out_of_the_session_cookie(make_app, database, tmp_path, login):
+    app = make_worker(make_app, database, tmp_path)
+    client = login(app, 1)
+    with client.session_transaction() as session:
+        session["principal"] = {"id": 1, "email": "admin@example.com"}
+    client.get("/dashboard")
+    with client.session_transaction() as session:
+        assert "principal" not in session
+        assert "admin@example.com" not in repr(dict(session))
+
+
+def test_principal_is_not_cached_with_per_process_versions(make_app, database, tmp_path, login,
+                                                           record_statements):
+    app = make_worker(make_app, database, tmp_path, backend="local")
+    client = login(app, 1)
+    assert user_loads(app, client, record_statements) == 1
+    assert user_loads(app, client, record_statements) == 1
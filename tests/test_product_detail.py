@@ -0,0 +1,130 @@
+import pytest
+from app import db
+from models import Category, Product, User
+
+
+@pytest.fixture
+def make_worker(make_app, tmp_path):
+    # Workers share the database and, through the file backend, the versions.
+    database = f"sqlite:///{tmp_path / 'shop.db'}"
+
+    def make():
+        app = make_app(database, CACHE_BACKEND="file", CACHE_FILE_PATH=str(tmp_path / "versions"),
+                       HTTP_CACHE_ENABLED=False, FRAGMENT_CACHE_ENABLED=False)
+        with app.app_context():
+            if db.session.get(User, 1) is None:
+                db.session.add_all([
+                    User(username="owner", email="owner@example.com", password="-"),
+                    Category(name="home"),
+                    Category(name="garden"),
+                ])
+                db.session.flush()
+                db.session.add_all([
+                    Product(name=name, price=price, brand=brand, category_id=category_id, description="", user_id=1)
+                    for name, price, brand, category_id in (
+                        ("lamp", 10, "acme", 1),
+                        ("desk lamp", 12, "acme", 1),
+                        ("rug", 15, "weave", 1),
+                        ("chandelier", 100, "acme", 1),
+                        ("hose", 11, "green", 2),
+                    )
+                ])
+                db.session.commit()
+        return app
+    return make
+
+
+def edit(client, product_id, **changes):
+    form = {"name": "rug", "price": 15, "brand": "weave", "category": 1, "description": "-", **changes}
+    return client.post(f"/edit-product/{product_id}", data=form)
+
+
+def test_detail_is_cached_until_the_product_or_its_owner_changes(make_worker, login, record_statements):
+    app = make_worker()
+    repository = app.extensions["product_repository"]
+    client = login(app, 1)
+    assert b"rug" in client.get("/display-product/3").data
+    with record_statements(app) as captured:
+        assert b"rug" in client.get("/display-product/3").data
+    assert repository.stats()["hits"] == 1
+    assert not [statement for statement in captured if "FROM product" in statement.sql]
+
+    assert edit(client, 3, name="wool rug").status_code == 302
+    assert b"wool rug" in client.get("/display-product/3").data
+
+    # The owner's name is on the page; renaming them reaches every cached product.
+    with app.app_context():
+        db.session.get(User, 1).username = "renamed owner"
+        db.session.commit()
+    assert b"renamed owner" in client.get("/display-product/3").data
+    assert repository.stats()["misses"] == 3
+
+
+def test_related_products_follow_writes_in_this_and_other_workers(make_worker, login):
+    first, second = make_worker(), make_worker()
+    index = first.extensions["related"]
+    with first.app_context():
+        index.build()
+    # Same category and brand first, then the closest price; the chandelier is
+    # outside the price band and the hose shares neither.
+    assert index.ids(1) == (2, 3)
+
+    client = login(first, 1)
+    edit(client, 3, price=100)
+    assert index.ids(1) == (2,)
+    edit(client, 3, price=14)
+    assert index.ids(1) == (2, 3)
+
+    with first.app_context():
+        index.sync()
+        assert [card.name for card in index.for_product(1)] == ["desk lamp", "rug"]
+    # Changed in another worker: the card no longer matches the shared
+    # version, so it is held back until it has been reloaded.
+    edit(login(second, 1), 2, name="desk lamp", brand="acme", price=13)
+    with first.app_context():
+        assert [card.name for card in index.for_product(1)] == ["rug"]
+        index.sync()
+        assert [card.price for card in index.for_product(1)] == [13, 14]
+
+    client.post("/delete-product/2")
+    assert index.ids(1) == (3,)
+
+
+def test_async_view_reads_through_the_same_cache(make_app, tmp_path, login, record_statements):
+    app = make_app(f"sqlite:///{tmp_path / 'shop.db'}", ASYNC_VIEWS=True, HTTP_CACHE_ENABLED=True)
+    try:
+        with app.app_context():
+            db.session.add_all([User(username="owner", email="owner@example.com", password="-"), Category(name="home")])
+            db.session.flush()
+            db.session.add(Product(name="rug", price=15, brand="weave", category_id=1, description="", user_id=1))
+            db.session.commit()
+        repository = app.extensions["product_repository"]
+        client = login(app, 1)
+        # The miss is loaded on the async engine, the hit from the cache.
+        with record_statements(app) as captured:
+            first = client.get("/display-product/1")
+            assert b"rug" in first.data
+            assert b"rug" in client.get("/display-product/1").data
+        assert repository.stats() == {"hits": 1, "misses": 1, "entries": 1}
+        assert not [statement for statement in captured if "FROM product" in statement.sql]
+        assert client.get("/display-product/1", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+        assert edit(client, 1, name="wool rug").status_code == 302
+        assert b"wool rug" in client.get("/display-product/1").data
+        assert client.get("/display-product/2").status_code == 404
+    finally:
+        app.extensions["async_db"].dispose()
+
+
+def test_product_page_revalidates_by_etag_only(make_worker, login):
+    app = make_worker()
+    app.config["HTTP_CACHE_ENABLED"] = True
+    with app.app_context():
+        app.extensions["related"].build()
+    client = login(app, 1)
+    first = client.get("/display-product/3")
+    assert "Last-Modified" not in first.headers
+    assert client.get("/display-product/3", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    edit(client, 3, name="wool rug")
+    assert client.get("/display-product/3", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
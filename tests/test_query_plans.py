@@ -0,0 +1,158 @@
+"""Every route's SQL is served by indexes: each captured statement is EXPLAINed.
+
+A realistic catalog is seeded on a temporary SQLite file, or on the empty database
+in QUERY_PLANS_DATABASE_URI (e.g. postgresql://localhost/shop_plans). A full scan
+of a large table fails the route unless ALLOWED_SCANS lists it with the reason it
+is expected. QUERY_PLANS_PRODUCTS sets the catalog size.
+"""
+import os
+import random
+import re
+import pytest
+from sqlalchemy import text
+from app import db
+from models import Cart, Category, Order, OrderItem, Product, ProductImage, User
+
+
+PRODUCTS = int(os.getenv("QUERY_PLANS_PRODUCTS", 5000))
+
+# Tables big enough in production that a full scan is a bug.
+LARGE_TABLES = {"product", "product_image", "cart", "orders", "order_item", "checkout", "user"}
+
+# (endpoint, table, SQL fragment, why the scan is intended)
+ALLOWED_SCANS = [
+    ("product.dashboard", "product", "row_number() OVER",
+     "top-N per category ranks over the (category_id, id) index in one pass"),
+    ("product.search", "product", "FROM product",
+     "the in-memory search index is built from the whole catalog on first use"),
+    ("product.search", "product_image", "FROM product_image",
+     "the in-memory search index is built from the whole catalog on first use"),
+    ("product.user_product", "product", "ORDER BY product.id",
+     "admins list every product"),
+    ("product.user_product", "product_image", "FROM product_image",
+     "admins list every product"),
+    ("product.admin_checkout", "orders", "count(orders.id)",
+     "the summary totals every order in the filtered range"),
+    ("product.admin_checkout", "user", ".username) LIKE",
+     "customer name filter is a substring match"),
+]
+
+ADMIN_ID, CUSTOMER_ID = 1, 2
+
+
+def routes(product_id, user_id):
+    return [
+        ("GET", "/dashboard", None),
+        ("GET", "/shop", None),
+        ("GET", "/shop?sort=price", None),
+        ("GET", "/category/3", None),
+        ("GET", "/search?q=product 12", None),
+        ("GET", f"/display-product/{product_id}", None),
+        ("GET", f"/products/{product_id}/images/status", None),
+        ("GET", f"/user-products/{user_id}", None),
+        ("GET", f"/cart-items/{user_id}", None),
+        ("GET", "/api/cart", None),
+        ("POST", "/api/cart", {"operations": [{"op": "add", "product_id": product_id, "quantity": 2}]}),
+        ("GET", "/checkout", None),
+        ("GET", "/admin-checkout", None),
+        ("GET", "/admin-checkout?status=shipped&date_from=2020-01-01", None),
+        ("GET", "/admin-checkout?customer=user4", None),
+        ("POST", f"/delete-product/{product_id}", None),
+    ]
+
+
+REQUESTS = [
+    (role, user_id) + route
+    for role, user_id, product_id in (("customer", CUSTOMER_ID, 7), ("admin", ADMIN_ID, 8))
+    for route in routes(product_id, user_id)
+]
+
+
+def seed(products):
+    rng = random.Random(0)
+    users = [{"username": f"user{i}", "email": f"user{i}@example.com", "password": "-", "is_admin": i == 0}
+             for i in range(500)]
+    db.session.execute(User.__table__.insert(), users)
+    db.session.execute(Category.__table__.insert(), [{"name": f"category {i}"} for i in range(25)])
+    for start in range(0, products, 5000):
+        batch = range(start, min(products, start + 5000))
+        db.session.execute(Product.__table__.insert(), [{
+            "name": f"product {i}", "price": rng.randrange(100, 50000), "description": "lorem ipsum",
+            "user_id": rng.randrange(1, 501), "brand": f"brand {i % 300}", "category_id": rng.randrange(1, 26),
+        } for i in batch])
+        db.session.execute(ProductImage.__table__.insert(), [{
+            "url": f"https://res.cloudinary.com/demo/image/upload/v1/p{i}_{n}.jpg", "public_id": f"p{i}_{n}",
+            "product_id": i + 1,
+        } for i in batch for n in range(2)])
+    db.session.execute(Cart.__table__.insert(), [
+        {"user_id": user_id, "product_id": product_id, "quantity": 1}
+        for user_id in range(1, 501) for product_id in rng.sample(range(1, products + 1), 5)
+    ])
+    for start in range(0, 20000, 5000):
+        db.session.execute(Order.__table__.insert(), [{
+            "user_id": rng.randrange(1, 501), "status": rng.choice(["placed", "shipped", "delivered"]),
+            "address": "street", "contact_no": "123", "message": "", "total_price": 100,
+        } for _ in range(5000)])
+    db.session.execute(OrderItem.__table__.insert(), [{
+        "order_id": order_id, "product_id": rng.randrange(1, products + 1), "product_name": "p",
+        "price": 100, "quantity": 1,
+    } for order_id in range(1, 20001) for _ in range(2)])
+    db.session.commit()
+    # Plans should reflect real statistics, not the empty-table defaults.
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+def explain(connection, statement, parameters):
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        plan = [row[-1] for row in rows]
+        # A scan already in ORDER BY order under a LIMIT stops after a page of rows.
+        if re.search(r"\bLIMIT\b", statement) and not any("TEMP B-TREE" in line for line in plan):
+            return []
+        return [m.group(1) for line in plan if (m := re.match(r"SCAN (\w+)", line)) and "USING" not in line]
+    rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+    return [m.group(1) for row in rows if (m := re.search(r"Seq Scan on (\w+)", row[0]))]
+
+
+def allowed(endpoint, table, statement):
+    return any(endpoint == e and table == t and fragment.lower() in statement.lower()
+               for e, t, fragment, _ in ALLOWED_SCANS)
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    app = make_app(os.getenv("QUERY_PLANS_DATABASE_URI"))
+    with app.app_context():
+        seed(PRODUCTS)
+        assert db.session.get(User, ADMIN_ID).is_admin
+    return app
+
+
+@pytest.fixture(scope="module")
+def clients(app, login):
+    return {user_id: login(app, user_id) for user_id in (ADMIN_ID, CUSTOMER_ID)}
+
+
+# Runs in order: the POST routes change what later routes read.
+@pytest.mark.parametrize("role, user_id, method, url, payload", REQUESTS,
+                         ids=[f"{role} {method} {url}" for role, _, method, url, _ in REQUESTS])
+def test_route_uses_indexes(app, clients, record_statements, role, user_id, method, url, payload):
+    with record_statements(app) as captured:
+        response = clients[user_id].open(url, method=method, json=payload)
+    assert response.status_code < 500
+
+    problems = []
+    with app.app_context():
+        connection = db.session.connection()
+        for statement in captured:
+            if statement.executemany or not statement.sql.lstrip().upper().startswith(
+                    ("SELECT", "UPDATE", "DELETE", "WITH")):
+                continue
+            problems += [
+                f"full scan of {table}: {' '.join(statement.sql.split())[:160]}"
+                for table in explain(connection, statement.sql, statement.parameters)
+                if table in LARGE_TABLES and not allowed(statement.endpoint, table, statement.sql)
+            ]
+        db.session.rollback()
+    assert not problems, "\n".join(problems)
@@ -0,0 +1,101 @@
+import shutil
+import sqlite3
+import pytest
+from flask import g
+from sqlalchemy import select
+from app import db
+from models import Cart, Category, Product, User
+
+
+def seed(app):
+    with app.app_context():
+        db.session.add(User(username="shopper", email="shopper@example.com", password="-"))
+        db.session.add(Category(name="lighting"))
+        db.session.flush()
+        db.session.add(Product(name="desk lamp", price=100, description="", user_id=1, brand="acme", category_id=1))
+        db.session.commit()
+
+
+@pytest.fixture
+def databases(tmp_path):
+    return tmp_path / "primary.db", tmp_path / "replica.db"
+
+
+@pytest.fixture
+def app(make_app, databases):
+    # The replica starts as a copy of the primary; renaming its product shows
+    # which database answered.
+    primary, replica = databases
+    app = make_app(
+        f"sqlite:///{primary}",
+        SQLALCHEMY_BINDS={"replica_0": f"sqlite:///{replica}"},
+        DB_REPLICA_STICKY_SECONDS=10,
+        FRAGMENT_CACHE_ENABLED=False,
+        HTTP_CACHE_ENABLED=False,
+    )
+    seed(app)
+    with app.app_context():
+        db.engines["replica_0"].dispose()
+    shutil.copy(primary, replica)
+    with sqlite3.connect(replica) as connection:
+        connection.execute("UPDATE product SET name = 'replica lamp'")
+    return app
+
+
+def databases_used(captured):
+    return {statement.engine.url.database.rsplit("/", 1)[-1] for statement in captured}
+
+
+def test_read_only_views_read_from_the_replica(app, login, record_statements):
+    client = login(app, 1)
+    with record_statements(app) as captured:
+        response = client.get("/shop")
+    assert b"replica lamp" in response.data
+    assert databases_used(captured) == {"replica.db"}
+
+
+def test_other_views_use_the_primary(app, login, record_statements):
+    client = login(app, 1)
+    with record_statements(app) as captured:
+        response = client.post("/api/cart", json={"operations": [{"op": "add", "product_id": 1, "quantity": 1}]})
+    assert response.status_code == 200
+    assert databases_used(captured) == {"primary.db"}
+
+
+def test_writes_and_flushes_go_to_the_primary(app, record_statements):
+    with record_statements(app) as captured, app.test_request_context():
+        g.db_read_only = True
+        assert db.session.scalar(select(Product.name)) == "replica lamp"
+        assert databases_used(captured) == {"replica.db"}
+        captured.clear()
+
+        db.session.add(Cart(user_id=1, product_id=1, quantity=1))
+        db.session.flush()
+        # Once the request has written, its reads see its own writes.
+        assert db.session.scalar(select(Product.name)) == "desk lamp"
+        db.session.commit()
+    assert databases_used(captured) == {"primary.db"}
+
+
+def test_reads_stay_on_the_primary_after_a_write(app, login):
+    client = login(app, 1)
+    assert b"replica lamp" in client.get("/shop").data
+    client.post("/api/cart", json={"operations": [{"op": "add", "product_id": 1, "quantity": 1}]})
+    assert b"desk lamp" in client.get("/shop").data
+    assert b"replica lamp" in login(app, 1).get("/shop").data
+
+
+def test_falls_back_to_the_primary_when_the_replica_is_down(make_app, login, record_statements, databases, tmp_path):
+    primary, _ = databases
+    app = make_app(
+        f"sqlite:///{primary}",
+        SQLALCHEMY_BINDS={"replica_0": f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"},
+        FRAGMENT_CACHE_ENABLED=False,
+        HTTP_CACHE_ENABLED=False,
+    )
+    seed(app)
+    with record_statements(app) as captured:
+        response = login(app, 1).get("/shop")
+    assert b"desk lamp" in response.data
+    assert databases_used(captured) == {"primary.db"}
+    assert app.extensions["replicas"].stats() == {"replica_0": "down"}
@@ -0,0 +1,61 @@
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO
+import pytest
+from sqlalchemy import select
+from app import db
+from models import Category, Product, ProductImage, User
+from apps.products import uploads
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(IMAGE_UPLOAD_MODE="inline", IMAGE_UPLOAD_STALE_AFTER=60)
+    with app.app_context():
+        db.session.add_all([User(username="owner", email="owner@example.com", password="-"), Category(name="home")])
+        db.session.flush()
+        product = Product(name="lamp", price=10, description="-", brand="acme", category_id=1, user_id=1)
+        db.session.add(product)
+        db.session.flush()
+        # Left pending by a worker that died an hour ago.
+        db.session.add(ProductImage(url="", public_id="", status="pending", product_id=product.id,
+                                    created_at=datetime.now() - timedelta(hours=1)))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def sweeps(monkeypatch):
+    # Names of the threads the sweeps ran on.
+    threads = []
+    fail_stale_uploads = uploads.fail_stale_uploads
+
+    def recorded(stale_after):
+        threads.append(threading.current_thread().name)
+        return fail_stale_uploads(stale_after)
+
+    monkeypatch.setattr(uploads, "fail_stale_uploads", recorded)
+    return threads
+
+
+def statuses(app):
+    with app.app_context():
+        return db.session.scalars(select(ProductImage.status).order_by(ProductImage.id)).all()
+
+
+def test_inline_mode_finishes_uploads_and_sweeps_before_responding(app, login, sweeps):
+    client = login(app, 1)
+    response = client.post("/edit-product/1", data={
+        "name": "lamp", "price": 10, "brand": "acme", "category": 1, "description": "-",
+        "images": (BytesIO(b"jpeg"), "photo.jpg"),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 302
+    assert statuses(app) == ["failed", "ready"]
+    assert sweeps == [threading.current_thread().name]
+
+
+def test_status_poll_sweeps_interrupted_uploads_inline(app, login, sweeps):
+    response = login(app, 1).get("/products/1/images/status")
+    assert response.get_json()["pending"] == 1
+    assert statuses(app) == ["failed"]
+    assert sweeps == [threading.current_thread().name]